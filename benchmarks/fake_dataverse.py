@@ -0,0 +1,275 @@
+"""
+An in-process fake Dataverse server for the benchmarks. It answers the endpoints used by the batch commands from
+generated data, with a configurable latency and error rate:
+
+    /api/datasets/:persistentId[/versions/{version}[/files]]   dataset and version documents
+    /api/datasets/:persistentId/assignments                     role assignments on a dataset
+    /api/datasets/:persistentId/locks, /lock/{type}             locks (always none)
+    /api/datasets/:persistentId/actions/:publish                publishes a draft
+    /api/datasets/:persistentId/storagesize                     the size of the files of a dataset
+    /api/datasets/export                                        the dataverse_json or ddi export of a dataset
+    /api/admin/index/dataset                                    reindex
+    /api/search                                                 paged search over all datasets
+    /api/info/metrics/tree                                      the collection tree
+    /api/dataverses/{alias}/storagesize|contents|groups|roles|assignments
+
+Datasets with an even number are drafts. Collections form a two-level tree below root, and datasets are spread
+over them round robin.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+PID_PREFIX = 'doi:10.5072/FK2/BENCH'
+
+
+def pid_of(number):
+    return f'{PID_PREFIX}{number:07d}'
+
+
+class FakeDataverse:
+
+    def __init__(self, datasets=1000, collections=50, files_per_dataset=5, latency=0.0, error_rate=0.0, seed=0):
+        """
+        Args:
+            datasets:          the number of datasets
+            collections:       the number of collections below root
+            files_per_dataset: the number of files in each dataset version
+            latency:           the mean time in seconds the server takes to answer a request; the actual time is
+                               uniformly distributed between half and one and a half times this value
+            error_rate:        the fraction of requests answered with 503 Service Unavailable (and Retry-After: 0)
+            seed:              the seed of the random generator for latency and errors
+        """
+        self.files_per_dataset = files_per_dataset
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.error_count = 0
+        self.aliases = [f'coll{i:04d}' for i in range(collections)]
+        self.tree = self._build_tree()
+        self.datasets = {}
+        for i in range(datasets):
+            self.datasets[pid_of(i)] = {'id': 1000 + i, 'number': i,
+                                        'state': 'DRAFT' if i % 2 == 0 else 'RELEASED',
+                                        'owner': self.aliases[i % collections] if collections > 0 else 'root'}
+        self.pids = list(self.datasets.keys())
+        self.sizes = self._compute_sizes()
+        self.server = None
+
+    @property
+    def server_url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def start(self):
+        fake = self
+
+        class Handler(FakeDataverseHandler):
+            dataverse = fake
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _build_tree(self):
+        top_level = max(1, len(self.aliases) // 5)
+        self.nodes = {alias: {'id': 10 + i, 'alias': alias, 'name': f'Collection {alias}'}
+                      for i, alias in enumerate(self.aliases)}
+        root = {'id': 1, 'alias': 'root', 'name': 'Root', 'children': []}
+        self.nodes['root'] = root
+        for i, alias in enumerate(self.aliases):
+            parent = root if i < top_level else self.nodes[self.aliases[i % top_level]]
+            parent.setdefault('children', []).append(self.nodes[alias])
+        return root
+
+    def next_delay_and_error(self):
+        with self.lock:
+            self.request_count += 1
+            delay = self.latency * self.random.uniform(0.5, 1.5)
+            error = self.random.random() < self.error_rate
+            if error:
+                self.error_count += 1
+            return delay, error
+
+    def version(self, dataset):
+        number = dataset['number']
+        return {
+            'id': 5000 + number,
+            'versionState': dataset['state'],
+            'versionNumber': None if dataset['state'] == 'DRAFT' else 1,
+            'versionMinorNumber': None if dataset['state'] == 'DRAFT' else 0,
+            'license': {'name': 'CC0 1.0', 'uri': 'http://creativecommons.org/publicdomain/zero/1.0'},
+            'metadataBlocks': {'citation': {'fields': [
+                {'typeName': 'title', 'value': f'Dataset {number}'}]}},
+            'files': [{'label': f'file{j}.txt', 'directoryLabel': 'data', 'restricted': False,
+                       'dataFile': {'id': 100000 + number * self.files_per_dataset + j, 'filesize': 1024}}
+                      for j in range(self.files_per_dataset)],
+        }
+
+    def _compute_sizes(self):
+        """ The size of a collection is that of its own datasets and those of all its descendants. """
+        own = {}
+        for dataset in self.datasets.values():
+            own[dataset['owner']] = own.get(dataset['owner'], 0) + 1024 * self.files_per_dataset
+        sizes = {}
+
+        def collect(node):
+            sizes[node['alias']] = own.get(node['alias'], 0) + sum(collect(c) for c in node.get('children', []))
+            return sizes[node['alias']]
+
+        collect(self.tree)
+        return sizes
+
+
+class FakeDataverseHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+    dataverse: FakeDataverse = None
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def handle_request(self, method):
+        length = int(self.headers.get('Content-Length', 0))
+        if length > 0:
+            self.rfile.read(length)
+        delay, error = self.dataverse.next_delay_and_error()
+        if delay > 0:
+            time.sleep(delay)
+        if error:
+            self.send_json(503, {'status': 'ERROR', 'message': 'Service Unavailable'}, {'Retry-After': '0'})
+            return
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        try:
+            status, body = self.route(method, url.path, params)
+        except KeyError:
+            status, body = 404, {'status': 'ERROR', 'message': 'Not found'}
+        self.send_json(status, body)
+
+    def route(self, method, path, params):
+        parts = path.strip('/').split('/')
+        if parts[:3] == ['api', 'datasets', ':persistentId']:
+            return self.route_dataset(method, parts[3:], self.dataverse.datasets[params['persistentId']])
+        if path == '/api/datasets/export':
+            return self.export(params['exporter'], self.dataverse.datasets[params['persistentId']])
+        if path == '/api/admin/index/dataset':
+            if params['persistentId'] not in self.dataverse.datasets:
+                raise KeyError(params['persistentId'])
+            return 200, ok({'message': f"starting reindex of dataset {params['persistentId']}"})
+        if path == '/api/search':
+            return 200, ok(self.search(int(params.get('start', 0)), int(params.get('per_page', 10))))
+        if path == '/api/info/metrics/tree':
+            return 200, ok(self.dataverse.tree)
+        if parts[:2] == ['api', 'dataverses'] and len(parts) == 4:
+            return self.route_dataverse(parts[2], parts[3])
+        raise KeyError(path)
+
+    def route_dataset(self, method, parts, dataset):
+        if parts == [] and method == 'GET':
+            return 200, ok({'id': dataset['id'], 'latestVersion': self.dataverse.version(dataset)})
+        if len(parts) == 2 and parts[0] == 'versions':
+            return 200, ok(self.dataverse.version(dataset))
+        if len(parts) == 3 and parts[0] == 'versions' and parts[2] == 'files':
+            return 200, ok(self.dataverse.version(dataset)['files'])
+        if parts == ['assignments']:
+            return 200, ok([{'id': 1, 'assignee': '@dataverseAdmin', '_roleAlias': 'admin'},
+                            {'id': 2, 'assignee': f"@user{dataset['number'] % 10}", '_roleAlias': 'contributor'}])
+        if parts == ['locks'] or parts[:1] == ['lock']:
+            return 200, ok([] if method == 'GET' else {'message': 'ok'})
+        if parts == ['storagesize']:
+            size = 1024 * self.dataverse.files_per_dataset
+            return 200, ok({'message': f'Total size of the files stored in this dataset: {size:,} bytes'})
+        if parts == ['actions', ':publish'] and method == 'POST':
+            if dataset['state'] != 'DRAFT':
+                return 403, {'status': 'ERROR', 'message': 'Dataset is already published'}
+            dataset['state'] = 'RELEASED'
+            return 200, ok({'id': dataset['id'], 'versionState': 'RELEASED'})
+        raise KeyError(parts)
+
+    def route_dataverse(self, alias, resource):
+        size = self.dataverse.sizes.get(alias)
+        if size is None:
+            raise KeyError(alias)
+        if resource == 'storagesize':
+            return 200, ok({'message': f'Total size of the files stored in this dataverse: {size:,} bytes'})
+        if resource == 'contents':
+            node = self.dataverse.nodes[alias]
+            contents = [{'type': 'dataverse', 'id': child['id'], 'title': child['name']}
+                        for child in node.get('children', [])]
+            for pid, dataset in self.dataverse.datasets.items():
+                if dataset['owner'] == alias:
+                    protocol, _, rest = pid.partition(':')
+                    authority, _, identifier = rest.partition('/')
+                    contents.append({'type': 'dataset', 'id': dataset['id'], 'protocol': protocol,
+                                     'authority': authority, 'identifier': identifier})
+            return 200, ok(contents)
+        if resource == 'groups':
+            return 200, ok([{'identifier': f'{alias}-group', 'containedRoleAssignees': ['@user1', '@user2']}])
+        if resource == 'roles':
+            return 200, ok([{'alias': 'curator', 'permissions': ['ViewUnpublishedDataset', 'EditDataset']}])
+        if resource == 'assignments':
+            return 200, ok([{'id': 1, 'assignee': '@dataverseAdmin', '_roleAlias': 'admin'}])
+        raise KeyError(resource)
+
+    def export(self, exporter, dataset):
+        """ Returns the export as the raw document, like Dataverse does. """
+        version = self.dataverse.version(dataset)
+        if exporter == 'ddi':
+            files = ''.join(f'<fileDscr ID="f{f["dataFile"]["id"]}"><fileTxt><fileName>{f["label"]}</fileName>'
+                            f'</fileTxt></fileDscr>' for f in version['files'])
+            return 200, f'<codeBook><stdyDscr><citation><titlStmt><titl>Dataset {dataset["number"]}</titl>' \
+                        f'</titlStmt></citation></stdyDscr>{files}</codeBook>'
+        return 200, {'datasetVersion': version}
+
+    def search(self, start, per_page):
+        items = []
+        for pid in self.dataverse.pids[start:start + per_page]:
+            dataset = self.dataverse.datasets[pid]
+            items.append({'type': 'dataset', 'global_id': pid, 'entity_id': dataset['id'],
+                          'versionState': dataset['state'], 'identifier_of_dataverse': dataset['owner'],
+                          'updatedAt': '2024-01-01T00:00:00Z'})
+        return {'q': '*', 'total_count': len(self.dataverse.pids), 'start': start, 'count_in_response': len(items),
+                'items': items}
+
+    def send_json(self, status, body, headers=None):
+        is_text = isinstance(body, str)
+        data = body.encode('utf-8') if is_text else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/xml' if is_text else 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def ok(data):
+    return {'status': 'OK', 'data': data}
@@ -0,0 +1,231 @@
+"""
+Runs the batch commands against a local fake Dataverse server and reports their throughput, the latency of the HTTP
+requests they send, and their peak memory use, as JSON. Keep the output of runs to compare them over time, e.g.:
+
+    poetry run python benchmarks/run.py --datasets 2000 --latency 0.02 --workers 4 -o benchmarks/results/main.json
+
+Each scenario runs in a fresh Python process, with the fake server in that same process, and calls the main function
+of the command with the arguments a user would give it. Scenarios:
+
+    reindex               dv-dataset-reindex on all datasets
+    publish               dv-dataset-publish on all datasets (half of them are drafts)
+    get-attributes        dv-dataset-get-attributes --all --storage --user-with-role contributor
+    storage-usage         dv-dataverse-root-collect-storage-usage over the whole tree, with the grand total
+    storage-usage-bottom-up  the same with --bottom-up --size-mixed-dataverses
+    permission-overview   dv-dataverse-root-collect-permission-overview over the whole tree
+    export-archive        dv-dataset-get-metadata-export -e ddi of all datasets into one tar.gz archive
+
+For the dataset scenarios an item is a dataset, for the collection scenarios a collection. The latency is measured
+in the client, per HTTP request (including its retries), from sending the request until the response is read.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+import yaml
+
+from fake_dataverse import FakeDataverse
+
+SCENARIOS = ['reindex', 'publish', 'get-attributes', 'storage-usage', 'storage-usage-bottom-up', 'permission-overview',
+             'export-archive']
+
+
+def scenario_command(scenario, args, pids_file):
+    """ Returns the main function of the command of the scenario, its arguments and the number of items it processes. """
+    batch_args = ['--workers', str(args.workers), '-w', str(args.wait)]
+    if scenario == 'reindex':
+        from datastation.dv_dataset_reindex import main
+        return main, [pids_file, '-r', 'report.csv'] + batch_args, args.datasets
+    if scenario == 'publish':
+        from datastation.dv_dataset_publish import main
+        return main, [pids_file, '-r', 'report.csv'] + batch_args, args.datasets
+    if scenario == 'get-attributes':
+        from datastation.dv_dataset_get_attributes import main
+        return main, ['--all', '--storage', '--user-with-role', 'contributor'] + batch_args, args.datasets
+    if scenario in ('storage-usage', 'storage-usage-bottom-up'):
+        from datastation.dv_dataverse_root_collect_storage_usage import main
+        mode = ['--bottom-up', '--size-mixed-dataverses'] if scenario == 'storage-usage-bottom-up' else []
+        return main, ['-m', '10', '-g', '-f', 'csv', '-o', 'storage-usage.csv', '--workers', str(args.workers)] + \
+            mode, args.collections + 1
+    if scenario == 'permission-overview':
+        from datastation.dv_dataverse_root_collect_permission_overview import main
+        return main, ['-f', 'csv', '-o', 'permission-overview.csv', '--workers', str(args.workers)], \
+            args.collections + 1
+    if scenario == 'export-archive':
+        from datastation.dv_dataset_get_metadata_export import main
+        return main, [pids_file, '-e', 'ddi', '-a', 'exports.tar.gz'] + batch_args, args.datasets
+    raise ValueError(f'Unknown scenario: {scenario}')
+
+
+class RequestTimer:
+    """ Records the duration of every request sent by any requests.Session in this process. """
+
+    def __init__(self):
+        self.durations = []
+        self.lock = threading.Lock()
+        self.original_send = requests.Session.send
+
+    def install(self):
+        timer = self
+
+        def timed_send(session, request, **kwargs):
+            start = time.perf_counter()
+            try:
+                return timer.original_send(session, request, **kwargs)
+            finally:
+                with timer.lock:
+                    timer.durations.append(time.perf_counter() - start)
+
+        requests.Session.send = timed_send
+
+    def uninstall(self):
+        requests.Session.send = self.original_send
+
+
+def percentile(values, fraction):
+    if len(values) == 0:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[int(fraction * 100) - 1]
+
+
+def write_config(server_url, args):
+    config = {
+        'dataverse': {
+            'server_url': server_url,
+            'api_token': 'benchmark',
+            'safety_latch': 'ON',
+            'http_pool_maxsize': max(16, args.workers),
+            'db': {},
+        },
+        'logging': {
+            'version': 1,
+            'root': {'handlers': ['console'], 'level': 'ERROR'},
+            'handlers': {'console': {'class': 'logging.StreamHandler', 'level': 'ERROR'}},
+        },
+    }
+    with open('.dans-datastation-tools.yml', 'w') as f:
+        yaml.safe_dump(config, f)
+
+
+def run_scenario(scenario, args):
+    """ Runs one scenario in this process, in a temporary working directory, and returns its measurements. """
+    with tempfile.TemporaryDirectory(prefix=f'benchmark-{scenario}-') as work_dir:
+        os.chdir(work_dir)
+        try:
+            return measure_scenario(scenario, args)
+        finally:
+            os.chdir(os.path.dirname(work_dir))
+
+
+def measure_scenario(scenario, args):
+    fake = FakeDataverse(datasets=args.datasets, collections=args.collections, latency=args.latency,
+                         error_rate=args.error_rate, seed=args.seed).start()
+    try:
+        write_config(fake.server_url, args)
+        with open('pids.txt', 'w') as f:
+            f.writelines(f'{pid}\n' for pid in fake.pids)
+        main, argv, items = scenario_command(scenario, args, 'pids.txt')
+        sys.argv = [scenario] + argv
+        timer = RequestTimer()
+        timer.install()
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            main()
+        elapsed = time.perf_counter() - start
+        timer.uninstall()
+    finally:
+        fake.stop()
+    durations = sorted(timer.durations)
+    return {
+        'scenario': scenario,
+        'items': items,
+        'seconds': round(elapsed, 3),
+        'items_per_second': round(items / elapsed, 1),
+        'requests': len(durations),
+        'server_errors': fake.error_count,
+        'latency_p50_ms': round(percentile(durations, 0.50) * 1000, 2) if durations else None,
+        'latency_p95_ms': round(percentile(durations, 0.95) * 1000, 2) if durations else None,
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the batch commands against a local fake Dataverse server')
+    parser.add_argument('-s', '--scenario', dest='scenarios', action='append', choices=SCENARIOS,
+                        help='the scenario to run, can be repeated (default: all)')
+    parser.add_argument('--datasets', type=int, default=1000, help='the number of datasets (default: 1000)')
+    parser.add_argument('--collections', type=int, default=50,
+                        help='the number of collections below root (default: 50)')
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='the mean server latency per request in seconds (default: 0.005)')
+    parser.add_argument('--error-rate', dest='error_rate', type=float, default=0.0,
+                        help='the fraction of requests answered with 503 (default: 0)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='the --workers argument of the batch commands (default: 1)')
+    parser.add_argument('--wait', type=float, default=0.0,
+                        help='the --wait-between-items argument of the batch commands (default: 0)')
+    parser.add_argument('--seed', type=int, default=0, help='the seed for the latency and errors of the server')
+    parser.add_argument('-o', '--output-file', dest='output_file',
+                        help='the JSON file to write the results to (default: stdout)')
+    parser.add_argument('--in-process', dest='in_process', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    scenarios = args.scenarios or SCENARIOS
+    if args.in_process:
+        print(json.dumps(run_scenario(scenarios[0], args)))
+        return
+
+    parameters = {'datasets': args.datasets, 'collections': args.collections, 'latency': args.latency,
+                  'error_rate': args.error_rate, 'workers': args.workers, 'wait': args.wait, 'seed': args.seed}
+    results = []
+    for scenario in scenarios:
+        # A fresh process per scenario, so that the peak RSS is that of the scenario alone
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), '--in-process', '-s', scenario]
+                               + [f'--{name.replace("_", "-")}={value}' for name, value in parameters.items()],
+                               capture_output=True, text=True)
+        if child.returncode != 0:
+            sys.stderr.write(child.stderr)
+            raise SystemExit(f'Scenario {scenario} failed')
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        print(f"{scenario:<20} {result['items_per_second']:>10} items/s  p50 {result['latency_p50_ms']} ms  "
+              f"p95 {result['latency_p95_ms']} ms  peak RSS {result['peak_rss_mb']} MB", file=sys.stderr)
+        results.append(result)
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'parameters': parameters,
+        'results': results,
+    }
+    if args.output_file is None:
+        print(json.dumps(report, indent=2))
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output_file)), exist_ok=True)
+        with open(args.output_file, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Compares the request rate of one new connection per call (the module level requests functions) with the pooled session
+of DataverseClient, against a local stub server.
+
+    poetry run python benchmarks/session_reuse.py --calls 2000
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from datastation.dataverse.dataset_api import DatasetApi
+from datastation.dataverse.dataverse_client import DataverseClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = json.dumps({'status': 'OK', 'data': {'message': 'indexed'}}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(label, dataset_api_factory, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        dataset_api_factory(f'doi:10.5072/FK2/{i}').reindex()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<20} {calls / elapsed:10.1f} requests/s')
+    return calls / elapsed
+
+
+class _NoReuse:
+    """ Stands in for a session, but like the module level functions opens a new connection for every call. """
+
+    def get(self, *args, **kwargs):
+        return requests.get(*args, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark connection reuse of the Dataverse API classes')
+    parser.add_argument('--calls', type=int, default=1000, help='the number of requests per run')
+    args = parser.parse_args()
+
+    server = start_stub_server()
+    server_url = f'http://127.0.0.1:{server.server_address[1]}'
+    config = {'server_url': server_url, 'api_token': 'xxx', 'safety_latch': 'ON', 'db': {}}
+    client = DataverseClient(config)
+    try:
+        unpooled = measure('new connection', lambda pid: DatasetApi(pid, server_url, 'xxx', None, True,
+                                                                   session=_NoReuse()), args.calls)
+        pooled = measure('pooled session', client.dataset, args.calls)
+        print(f'speedup: {pooled / unpooled:.2f}x')
+    finally:
+        client.close()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,15 @@
 import logging
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait as wait_for_futures
 
-from datastation.common.csv import CsvReport
+from datastation.common.checkpoint import CheckpointJournal, OK, FAILED
+from datastation.common.csv import open_report, FSYNC_NEVER
+
+_end_of_entries = object()
+
+# The wait between items when processing one item at a time without a given wait
+default_sequential_wait = 2.0
 
 
 def get_pids(pid_or_pids_file):
@@ -32,9 +39,23 @@ def get_entries(entries):
 
 
 class BatchProcessor:
-    def __init__(self, wait=0.1, fail_on_first_error=True):
+    def __init__(self, wait=0.1, fail_on_first_error=True, workers=1, journal_file=None, resume=False, dry_run=False):
+        """
+        Args:
+            wait:    the number of seconds between items; None means default_sequential_wait with one worker and no
+                     wait with more, as a global wait would cap the throughput of the workers
+            dry_run: nothing is recorded in the journal, so that a later real run does not skip the entries
+        """
+        if resume and journal_file is None:
+            raise ValueError("Cannot resume without a journal file")
+        if wait is None:
+            wait = default_sequential_wait if workers == 1 else 0
         self.wait = wait
         self.fail_on_first_error = fail_on_first_error
+        self.workers = workers
+        self.journal_file = journal_file
+        self.resume = resume
+        self.dry_run = dry_run
 
     def process_pids(self, entries, callback):
         """ kept for backward compatibility"""
@@ -51,16 +72,60 @@ class BatchProcessor:
 
         If an entry is a string or a dictionary with key 'PID',
         the value is used for progress logging.
+
+        If a journal file is configured, the outcome of each entry is recorded in it: FAILED if the callback raises an
+        exception or returns FAILED (e.g. after writing an error to the report), otherwise OK. When resuming, the
+        entries recorded as OK are skipped.
+
+        If more than one worker is configured, the callbacks run on a thread pool with at most that many
+        entries in flight. The wait is then a global minimum interval between the start of two entries.
         """
         if entries is None:
             logging.info("Nothing to process")
             return
-        elif type(entries) is list:
-            num_entries = len(entries)
-            logging.info(f"Start batch processing on {num_entries} entries")
-        else:
-            logging.info(f"Start batch processing on unknown number of entries")
-            num_entries = -1
+        journal = None
+        if self.journal_file is not None:
+            journal = CheckpointJournal(os.path.expanduser(self.journal_file), resume=self.resume,
+                                        read_only=self.dry_run)
+            entries, callback = self._with_journal(entries, callback, journal)
+        try:
+            if type(entries) is list:
+                num_entries = len(entries)
+                logging.info(f"Start batch processing on {num_entries} entries")
+            else:
+                logging.info(f"Start batch processing on unknown number of entries")
+                num_entries = -1
+            if self.workers > 1:
+                i = self._process_entries_concurrently(entries, callback, num_entries)
+            else:
+                i = self._process_entries_sequentially(entries, callback, num_entries)
+            logging.info(f"Batch processing ended: {i} entries processed")
+        finally:
+            if journal is not None:
+                journal.close()
+
+    @staticmethod
+    def _with_journal(entries, callback, journal):
+        """ Skips the entries that the journal has as completed, and records the outcome of the other ones. """
+        if len(journal.completed) > 0:
+            if type(entries) is list:
+                num_entries = len(entries)
+                entries = [obj for obj in entries if not journal.is_completed(obj)]
+                logging.info(f"Skipping {num_entries - len(entries)} entries completed in a previous run")
+            else:
+                entries = filter(lambda obj: not journal.is_completed(obj), entries)
+
+        def journaled_callback(obj):
+            try:
+                outcome = callback(obj)
+            except Exception:
+                journal.record(obj, FAILED)
+                raise
+            journal.record(obj, FAILED if outcome == FAILED else OK)
+
+        return entries, journaled_callback
+
+    def _process_entries_sequentially(self, entries, callback, num_entries):
         i = 0
         for obj in entries:
             i += 1
@@ -68,19 +133,7 @@ class BatchProcessor:
                 if self.wait > 0 and i > 1:
                     logging.debug(f"Waiting {self.wait} seconds before processing next entry")
                     time.sleep(self.wait)
-                if num_entries > 1:
-                    progress_message = f"Processing {i} of {num_entries} entries"
-                elif num_entries == -1:
-                    progress_message = f"Processing entry number {i}"
-                else:
-                    progress_message = None
-                if progress_message is not None:
-                    if type(obj) is str:
-                        logging.info(f"{progress_message}: {obj}")
-                    elif type(obj) is dict and 'PID' in obj.keys():
-                        logging.info(f"{progress_message}: {obj['PID']}")
-                    else:
-                        logging.info(progress_message)
+                self._log_progress(i, num_entries, obj)
                 callback(obj)
             except Exception as e:
                 logging.exception(f"Exception occurred on entry nr {i}", exc_info=True)
@@ -88,22 +141,107 @@ class BatchProcessor:
                     logging.error(f"Stop processing because of an exception: {e}")
                     break
                 logging.debug("fail_on_first_error is False, continuing...")
-        logging.info(f"Batch processing ended: {i} entries processed")
+        return i
+
+    def _process_entries_concurrently(self, entries, callback, num_entries):
+        logging.info(f"Processing with {self.workers} workers")
+        i = 0
+        in_flight = {}  # future -> entry number
+        next_start = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='batch-worker')
+        try:
+            entries = iter(entries)
+            while True:
+                # Keep at most self.workers entries in flight, and only read the next entry when a worker is free,
+                # so that lazy streams are not read ahead
+                if self._harvest(in_flight, block=len(in_flight) >= self.workers):
+                    return i
+                obj = next(entries, _end_of_entries)
+                if obj is _end_of_entries:
+                    break
+                delay = next_start - time.monotonic()
+                if delay > 0:
+                    logging.debug(f"Waiting {delay:.3f} seconds before processing next entry")
+                    time.sleep(delay)
+                next_start = time.monotonic() + self.wait
+                i += 1
+                self._log_progress(i, num_entries, obj)
+                in_flight[executor.submit(callback, obj)] = i
+            while in_flight:
+                if self._harvest(in_flight, block=True):
+                    break
+            return i
+        finally:
+            # Pending entries are cancelled, running ones are allowed to finish
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _harvest(self, in_flight, block):
+        """ Collects the completed entries in flight and logs their exceptions.
+
+        Args:
+            in_flight: a dictionary from future to entry number, completed entries are removed from it
+            block:     wait until at least one entry has completed
+        Returns:
+            True if processing must stop because of an exception
+        """
+        if block:
+            done, _ = wait_for_futures(in_flight.keys(), return_when=FIRST_COMPLETED)
+        else:
+            done = [future for future in in_flight.keys() if future.done()]
+        must_stop = False
+        for future in sorted(done, key=lambda f: in_flight[f]):
+            i = in_flight.pop(future)
+            e = future.exception()
+            if e is not None:
+                logging.error(f"Exception occurred on entry nr {i}", exc_info=e)
+                if self.fail_on_first_error:
+                    logging.error(f"Stop processing because of an exception: {e}")
+                    must_stop = True
+                else:
+                    logging.debug("fail_on_first_error is False, continuing...")
+        return must_stop
+
+    @staticmethod
+    def _log_progress(i, num_entries, obj):
+        if num_entries > 1:
+            progress_message = f"Processing {i} of {num_entries} entries"
+        elif num_entries == -1:
+            progress_message = f"Processing entry number {i}"
+        else:
+            progress_message = None
+        if progress_message is not None:
+            if type(obj) is str:
+                logging.info(f"{progress_message}: {obj}")
+            elif type(obj) is dict and 'PID' in obj.keys():
+                logging.info(f"{progress_message}: {obj['PID']}")
+            else:
+                logging.info(progress_message)
 
 
 class BatchProcessorWithReport(BatchProcessor):
 
-    def __init__(self, report_file=None, headers=None, wait=0.1, fail_on_first_error=True):
-        super().__init__(wait, fail_on_first_error)
+    def __init__(self, report_file=None, headers=None, wait=0.1, fail_on_first_error=True, workers=1,
+                 journal_file=None, resume=False, async_report=None, report_fsync=FSYNC_NEVER, dry_run=False):
+        """
+        Args:
+            async_report: write the report on a thread of its own (see AsyncReport), so that the workers never wait
+                          for it; by default only with more than one worker
+            report_fsync: the fsync policy of an asynchronous report
+        """
+        super().__init__(wait, fail_on_first_error, workers, journal_file, resume, dry_run)
         if headers is None:
             headers = ["DOI", "Modified", "Change"]
         self.report_file = report_file
         self.headers = headers
+        self.async_report = async_report if async_report is not None else workers > 1
+        self.report_fsync = report_fsync
 
     def process_pids(self, entries, callback):
         """ kept for backward compatibility"""
         return self.process_entries(entries, callback)
 
     def process_entries(self, entries, callback):
-        with CsvReport(os.path.expanduser(self.report_file), self.headers) as csv_report:
+        # When resuming, the rows of the previous run are kept. A report file ending with .parquet is written as Parquet
+        with open_report(os.path.expanduser(self.report_file), self.headers, append=self.resume,
+                         asynchronous=self.async_report, fsync=self.report_fsync) as csv_report:
             super().process_entries(entries, lambda entry: callback(entry, csv_report))
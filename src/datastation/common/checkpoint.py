@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import threading
+import time
+
+OK = 'OK'
+FAILED = 'FAILED'
+
+
+def entry_key(entry):
+    """ The key under which an entry is recorded in the journal: the entry itself if it is a string (e.g. a PID),
+    otherwise its JSON representation. """
+    if type(entry) is str:
+        return entry
+    return json.dumps(entry, sort_keys=True, default=str)
+
+
+class CheckpointJournal:
+    """ An append-only journal of the entries of a batch that have been processed, and with what outcome.
+
+    Each line holds the outcome and the key of one entry, separated by a tab. Lines are written through a buffer and
+    the file is flushed and fsync-ed after every `sync_every` records or `sync_interval` seconds, whichever comes first,
+    and on close. A crash can therefore lose at most the last batch of records, in which case those entries are
+    processed again on resume.
+
+    A read-only journal, e.g. for a dry run, knows the completed entries of a previous run but does not record anything.
+    """
+
+    def __init__(self, filename, resume: bool = False, sync_every: int = 100, sync_interval: float = 1.0,
+                 read_only: bool = False):
+        self.filename = filename
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.completed = self.read_completed() if resume else set()
+        self.file = None if read_only else open(filename, 'a' if resume else 'w', buffering=64 * 1024)
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def read_completed(self):
+        """ Returns the keys of the entries of which the last recorded outcome is OK. """
+        completed = set()
+        if not os.path.exists(self.filename):
+            return completed
+        with open(self.filename, 'r') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # torn write at the end of the journal
+                outcome, _, key = line[:-1].partition('\t')
+                if outcome == OK:
+                    completed.add(key)
+                else:
+                    completed.discard(key)
+        logging.info(f"Found {len(completed)} completed entries in journal {self.filename}")
+        return completed
+
+    def is_completed(self, entry):
+        return entry_key(entry) in self.completed
+
+    def record(self, entry, outcome):
+        key = entry_key(entry)
+        if '\n' in key:
+            raise ValueError(f"Cannot record entry with a newline in the journal: {key}")
+        if self.file is None:
+            return
+        with self.lock:
+            self.file.write(f"{outcome}\t{key}\n")
+            self.unsynced += 1
+            if self.unsynced >= self.sync_every or time.monotonic() - self.last_sync >= self.sync_interval:
+                self._sync()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.file is None:
+            return
+        with self.lock:
+            self._sync()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,70 @@
+import gzip
+import io
+import sys
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+
+suffixes = {'.gz': GZIP, '.zst': ZSTD}
+default_levels = {GZIP: 6, ZSTD: 3}
+
+
+def get_compression(filename, compress=None):
+    """ Returns the compression of an output file: the given compress if it is not None, otherwise the one that
+    belongs to the suffix of the filename (.gz or .zst), or None for an uncompressed file. Standard output ('-') is
+    only compressed if compress is given. """
+    if compress is not None:
+        if compress not in default_levels:
+            raise ValueError(f"Unknown compression: {compress}")
+        return compress
+    if filename == '-':
+        return None
+    for suffix, compression in suffixes.items():
+        if str(filename).endswith(suffix):
+            return compression
+    return None
+
+
+def get_suffix(compression):
+    """ Returns the suffix of a file with the given compression, or an empty string if compression is None. """
+    if compression is None:
+        return ''
+    return next(suffix for suffix, c in suffixes.items() if c == compression)
+
+
+def open_output(filename, mode='w', compress=None, level=None):
+    """ Opens a file, or standard output if filename is '-', for writing. The output is compressed as it is written if
+    get_compression says so. Closing the returned stream finishes the compressed stream, but does not close standard
+    output. zstd compression needs the zstandard package, from the zstd extra.
+
+    Args:
+        filename: the file to write, or '-' for standard output
+        mode:     'w' or 'a' for text, 'wb' or 'ab' for bytes; appending to a compressed file adds a new gzip member
+                  or zstd frame, which readers treat as one stream
+        compress: GZIP or ZSTD to compress regardless of the suffix of the filename
+        level:    the compression level, by default 6 for gzip and 3 for zstd
+    """
+    compression = get_compression(filename, compress)
+    is_binary = 'b' in mode
+    if compression is None:
+        if filename == '-':
+            return sys.stdout.buffer if is_binary else sys.stdout
+        return open(filename, mode)
+    level = level if level is not None else default_levels[compression]
+    raw_mode = mode.replace('b', '') + 'b'
+    is_stdout = filename == '-'
+    if compression == GZIP:
+        # A GzipFile does not close the file object it is given
+        stream = gzip.GzipFile(fileobj=sys.stdout.buffer, mode=raw_mode, compresslevel=level) if is_stdout \
+            else gzip.open(filename, raw_mode, compresslevel=level)
+    else:
+        try:
+            import zstandard  # optional dependency, only needed for zstd compression
+        except ImportError as e:
+            raise ImportError("zstd compression needs the zstandard package; install dans-datastation-tools with the "
+                              "zstd extra: pip3 install 'dans-datastation-tools[zstd]'") from e
+        raw = sys.stdout.buffer if is_stdout else open(filename, raw_mode)
+        stream = zstandard.ZstdCompressor(level=level).stream_writer(raw, closefd=not is_stdout)
+    if is_binary:
+        return stream
+    return io.TextIOWrapper(stream, encoding='utf-8')
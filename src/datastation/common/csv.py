@@ -1,24 +1,68 @@
 import csv
 import logging
+import os
+import queue
 import sys
+import threading
+import time
+
+from datastation.common.compression import open_output
+from datastation.common.result_writer import ParquetResultWriter
+
+# The type of the columns of a ParquetReport that are not strings
+report_column_types = {'Modified': 'timestamp'}
+
+# When an AsyncReport asks the operating system to write its report file to disk
+FSYNC_NEVER = 'never'
+FSYNC_ON_CLOSE = 'close'
+FSYNC_ON_FLUSH = 'flush'
+
+
+def open_report(filename, headers, append=False, asynchronous=False, fsync=FSYNC_NEVER):
+    """ Opens a ParquetReport if the filename ends with .parquet, and a CsvReport otherwise. If asynchronous is True,
+    the report is wrapped in an AsyncReport with the given fsync policy. """
+    if filename.endswith('.parquet'):
+        report = ParquetReport(filename, headers, append)
+    else:
+        report = CsvReport(filename, headers, append)
+    return AsyncReport(report, fsync=fsync) if asynchronous else report
 
 
 class CsvReport:
-    """A simple, self-closing wrapper around csv.DictWriter to make it easier to use."""
+    """A simple, self-closing wrapper around csv.DictWriter to make it easier to use. Rows may be written from
+    several threads; each row is written as a whole. A report file ending with .gz or .zst is compressed, as is
+    standard output if compress is given (see open_output)."""
 
-    def __init__(self, filename, headers):
+    def __init__(self, filename, headers, append=False, compress=None, compression_level=None):
         self.filename = filename
         self.headers = headers
-        self.csv_file = sys.stdout if filename == '-' else open(filename, 'w')
+        self.lock = threading.Lock()
+        is_continuation = append and filename != '-' and os.path.isfile(filename) and os.path.getsize(filename) > 0
+        self.csv_file = open_output(filename, 'a' if append else 'w', compress, compression_level)
         self.csv_writer = csv.DictWriter(self.csv_file, headers, lineterminator='\n')
-        self.csv_writer.writeheader()
+        if not is_continuation:
+            self.csv_writer.writeheader()
 
     def write(self, row):
-        logging.debug(f"Writing row: {row}")
-        self.csv_writer.writerow(row)
+        logging.debug("Writing row: %s", row)
+        with self.lock:
+            self.csv_writer.writerow(row)
 
-    def close(self):
+    def write_rows(self, rows):
+        with self.lock:
+            self.csv_writer.writerows(rows)
+
+    def flush(self):
+        with self.lock:
+            self.csv_file.flush()
+
+    def fsync(self):
+        self.flush()
         if self.filename != '-':
+            os.fsync(self.csv_file.fileno())
+
+    def close(self):
+        if self.csv_file is not sys.stdout:
             self.csv_file.close()
 
     def __enter__(self):
@@ -28,6 +72,172 @@ class CsvReport:
         self.close()
 
 
+class ParquetReport:
+    """A report with the same interface as CsvReport, that is written to a Parquet file with typed columns. Needs the
+    pyarrow package, from the parquet extra. Rows may be written from several threads."""
+
+    def __init__(self, filename, headers, append=False, column_types=None, row_group_size=10000):
+        if append:
+            raise ValueError(f"Cannot append to Parquet report {filename}")
+        column_types = column_types if column_types is not None else report_column_types
+        self.filename = filename
+        self.headers = headers
+        self.lock = threading.Lock()
+        self.writer = ParquetResultWriter([(header, column_types.get(header, 'string')) for header in headers],
+                                          filename, row_group_size=row_group_size)
+
+    def write(self, row):
+        logging.debug("Writing row: %s", row)
+        with self.lock:
+            self.writer.write(row, False)
+
+    def write_rows(self, rows):
+        with self.lock:
+            for row in rows:
+                self.writer.write(row, False)
+
+    def flush(self):
+        pass  # the rows are written a row group at a time; the file is only readable once it is closed
+
+    def fsync(self):
+        pass
+
+    def close(self):
+        with self.lock:
+            self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class AsyncReport:
+    """Wraps a CsvReport or ParquetReport, and writes its rows on a thread of its own, so that writing the report never
+    holds up the threads that produce the rows. Rows are put in a queue of at most queue_size rows, from which the
+    writer thread takes them batch_size at a time; write only blocks if the queue is full. Rows are written in the
+    order in which they are put in the queue.
+
+    The writer thread flushes the report file at most every flush_interval seconds, so that readers of the file see
+    the rows without a compressed report being flushed, which ends a compressed block, for nearly every row.
+
+    flush() returns when all rows written before it are in the report file. The fsync policy determines whether the
+    file is also forced to disk then (FSYNC_ON_FLUSH), only when the report is closed (FSYNC_ON_CLOSE), or never
+    (FSYNC_NEVER). An error in the writer thread is raised by the next call of write, flush or close. Writing or
+    flushing after close raises a ValueError, as the writer thread is gone."""
+
+    _close = object()
+
+    def __init__(self, report, queue_size=1000, batch_size=100, fsync=FSYNC_NEVER, flush_interval=1.0):
+        if fsync not in (FSYNC_NEVER, FSYNC_ON_CLOSE, FSYNC_ON_FLUSH):
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.report = report
+        self.filename = report.filename
+        self.headers = report.headers
+        self.batch_size = batch_size
+        self.fsync_policy = fsync
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        self.is_flushed = True
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.closed = False
+        self.close_lock = threading.Lock()  # a flush must not put its marker after the one of close
+        self.thread = threading.Thread(target=self._write_rows, name='report-writer', daemon=True)
+        self.thread.start()
+
+    def write(self, row):
+        self._raise_error()
+        self._check_open()
+        self.queue.put(row)
+
+    def flush(self):
+        self._raise_error()
+        done = threading.Event()
+        with self.close_lock:
+            self._check_open()
+            self.queue.put(done)
+        done.wait()
+        self._raise_error()
+
+    def close(self):
+        with self.close_lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.put(self._close)
+        self.thread.join()
+        try:
+            if self.error is None and self.fsync_policy != FSYNC_NEVER:
+                self.report.fsync()
+        finally:
+            self.report.close()
+        self._raise_error()
+
+    def _write_rows(self):
+        while True:
+            rows = []
+            marker = None  # a flush event, or _close
+            try:
+                # Wake up to flush the rows written so far when the flush interval has passed
+                timeout = None if self.is_flushed \
+                    else max(0.0, self.last_flush + self.flush_interval - time.monotonic())
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            while item is not None:
+                if item is self._close or isinstance(item, threading.Event):
+                    marker = item
+                    break
+                rows.append(item)
+                if len(rows) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                if self.error is None:
+                    self._write_batch(rows, marker)
+            except Exception as e:
+                logging.exception("Error writing report %s", self.filename)
+                self.error = e
+                self.is_flushed = True  # nothing more is written
+            if marker is self._close:
+                return
+            if marker is not None:
+                marker.set()
+
+    def _write_batch(self, rows, marker):
+        if len(rows) > 0:
+            self.report.write_rows(rows)
+            self.is_flushed = False
+        if marker is self._close:
+            return
+        # Make the rows visible to readers of the file, on request or when the flush interval has passed
+        if marker is not None or (not self.is_flushed and time.monotonic() >= self.last_flush + self.flush_interval):
+            self.report.flush()
+            self.is_flushed = True
+            self.last_flush = time.monotonic()
+        if marker is not None and self.fsync_policy == FSYNC_ON_FLUSH:
+            self.report.fsync()
+
+    def _check_open(self):
+        if self.closed:
+            raise ValueError(f"Report {self.filename} is closed")
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
 class CsvInput:
     """A simple, self-closing wrapper around csv.DictReader to make it easier to use."""
 
@@ -1,39 +1,147 @@
+import itertools
+from contextlib import contextmanager
 from typing import Union
 import psycopg
-from psycopg.rows import TupleRow
+from psycopg.rows import TupleRow, dict_row
 
 
 class Database:
+    """ Access to the Dataverse database.
+
+    With a `pool_size` greater than one in the configuration, connections are taken from a pool of at most that size,
+    so that several threads can use the database at the same time; each call then commits when it is done. This needs
+    the psycopg-pool package, from the pool extra. Otherwise all calls share a single connection.
+    """
+
     def __init__(self, config):
         self.host = config["host"]
         self.dbname = config["dbname"]
         self.user = config["user"]
         self.password = config["password"]
+        self.pool_size = config.get("pool_size", 1)
+        self.commit_batch_size = config.get("commit_batch_size", 1000)
+        self.fetch_size = config.get("fetch_size", 1000)
         self.connection: psycopg.Connection[TupleRow] | None = None
+        self.pool = None
+        self.cursor_numbers = itertools.count()
 
     def connect(self):
-        self.connection = psycopg.connect(
-            f"host={self.host} dbname={self.dbname} user={self.user} password={self.password}"
-        )
+        conninfo = f"host={self.host} dbname={self.dbname} user={self.user} password={self.password}"
+        if self.pool_size > 1:
+            try:
+                from psycopg_pool import ConnectionPool  # optional dependency, only needed for a pool
+            except ImportError as e:
+                raise ImportError("A pool_size greater than one needs the psycopg-pool package; install "
+                                  "dans-datastation-tools with the pool extra: pip3 install "
+                                  "'dans-datastation-tools[pool]'") from e
+            self.pool = ConnectionPool(conninfo, min_size=1, max_size=self.pool_size, open=True)
+        else:
+            self.connection = psycopg.connect(conninfo)
 
-    def query(self, query):
-        if self.connection is None:
+    @contextmanager
+    def get_connection(self):
+        if self.pool is not None:
+            with self.pool.connection() as connection:
+                yield connection
+        elif self.connection is not None:
+            yield self.connection
+        else:
             raise Exception("No connection to database")
 
-        with self.connection.cursor() as cursor:
-            cursor.execute(query)
-            return cursor.fetchall()
+    def query(self, query, params=None, prepare=None):
+        """ Returns all the rows of a query. With prepare=True the statement is prepared on the server, which pays off
+        when the same query is executed many times with different parameters. By default psycopg prepares a statement
+        after it has been executed a few times. """
+        with self.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, params, prepare=prepare)
+                return cursor.fetchall()
 
-    def update(self, query, *args):
-        if self.connection is None:
-            raise Exception("No connection to database")
+    def stream_query(self, query, params=None, fetch_size=None, as_dicts=False):
+        """ Yields the rows of the query one at a time, so that memory use does not depend on the size of the result.
+        A named (server-side) cursor is used, from which the rows are fetched fetch_size at a time (by default the
+        configured fetch_size, or 1000).
+
+        Args:
+            query:     the query, with %s or %(name)s placeholders for the parameters
+            params:    the parameters
+            fetch_size: the number of rows per round trip to the server
+            as_dicts:  yield each row as a dictionary from column name to value, instead of a tuple
+        """
+        row_factory = dict_row if as_dicts else None
+        with self.get_connection() as connection:
+            with connection.cursor(name=f"stream_query_{next(self.cursor_numbers)}", row_factory=row_factory) as cursor:
+                cursor.itersize = fetch_size if fetch_size is not None else self.fetch_size
+                cursor.execute(query, params)
+                yield from cursor
+
+    def update(self, query, *args, prepare=None):
+        with self.get_connection() as connection:
+            with connection.cursor() as cursor:
+                result = cursor.execute(query, *args, prepare=prepare)
+                connection.commit()
+                return result.rowcount
+
+    def execute_outside_transaction(self, statement):
+        """ Executes a statement that cannot run inside a transaction block, such as VACUUM. """
+        with self.get_connection() as connection:
+            connection.commit()
+            connection.autocommit = True
+            try:
+                connection.execute(statement)
+            finally:
+                connection.autocommit = False
+
+    def update_many(self, query, params_seq, batch_size=None):
+        """ Executes a parameterized statement once for every set of parameters in params_seq, which may be a generator.
+        The sets are sent to the server in batches of batch_size (by default the configured commit_batch_size), in
+        pipeline mode, and each batch is committed as one transaction.
+
+        Returns:
+            the total number of affected rows
+        """
+        batch_size = batch_size if batch_size is not None else self.commit_batch_size
+        params_seq = iter(params_seq)
+        total = 0
+        with self.get_connection() as connection:
+            with connection.cursor() as cursor:
+                while True:
+                    batch = list(itertools.islice(params_seq, batch_size))
+                    if len(batch) == 0:
+                        break
+                    cursor.executemany(query, batch)
+                    connection.commit()
+                    total += cursor.rowcount
+        return total
+
+    def update_from_rows(self, query, table, columns, rows):
+        """ Copies the rows into a temporary table, and executes a statement that uses that table, e.g. to update many
+        rows with a single UPDATE ... FROM. The rows are sent with COPY, which is much faster than an INSERT per row,
+        and everything happens in one transaction; the temporary table is dropped when it is committed.
+
+        Args:
+            query:   the statement to execute, which refers to the temporary table
+            table:   the name of the temporary table
+            columns: the column definitions of the temporary table, e.g. "username text, encryptedpassword text"
+            rows:    the rows to copy into the table, as tuples with a value per column; may be a generator
 
-        with self.connection.cursor() as cursor:
-            result = cursor.execute(query, *args)
-            self.connection.commit()
-            return result.rowcount
+        Returns:
+            the number of rows affected by the statement
+        """
+        with self.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(f"CREATE TEMPORARY TABLE {table} ({columns}) ON COMMIT DROP")
+                with cursor.copy(f"COPY {table} FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+                cursor.execute(query)
+                rowcount = cursor.rowcount
+            connection.commit()
+            return rowcount
 
     def close(self):
+        if self.pool is not None:
+            self.pool.close()
         if self.connection is not None:
             self.connection.close()
 
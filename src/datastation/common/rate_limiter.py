@@ -0,0 +1,113 @@
+import fcntl
+import logging
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+
+
+class TokenBucket:
+    """ A token bucket that limits the rate of requests of all threads in this process.
+
+    The bucket holds at most `burst` tokens and is refilled at `rate` tokens per second. A caller that finds the bucket
+    empty reserves its token anyway and sleeps until the token would have been available, so that waiting callers are
+    served in the order in which they arrived.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be a number greater than zero")
+        self.rate = rate
+        self.configured_rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.timestamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1):
+        """ Takes tokens from the bucket, sleeping as long as needed to stay within the rate. """
+        delay = self._reserve(tokens)
+        if delay > 0:
+            logging.debug(f"Rate limit reached, waiting {delay:.3f} seconds")
+            time.sleep(delay)
+
+    def slow_down(self, factor: float = 0.5, min_fraction: float = 1 / 16):
+        """ Lowers the rate, e.g. because the server signals that it is overloaded. """
+        with self.lock:
+            self.rate = max(self.rate * factor, self.configured_rate * min_fraction)
+            logging.info(f"Slowed down to {self.rate:.2f} requests per second")
+
+    def recover(self, step: float = 0.05):
+        """ Raises a lowered rate by a fraction of the configured rate, until it is back at the configured rate. """
+        if self.rate < self.configured_rate:
+            with self.lock:
+                self.rate = min(self.rate + self.configured_rate * step, self.configured_rate)
+
+    def _reserve(self, tokens):
+        """ Returns the number of seconds to wait before the reserved tokens may be used. """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.timestamp) * self.rate) - tokens
+            self.timestamp = now
+            return -self.tokens / self.rate if self.tokens < 0 else 0
+
+
+class FileTokenBucket(TokenBucket):
+    """ A token bucket that is shared by all processes on this host that use the same state file.
+
+    The state (tokens and the wall clock time they were counted) is kept in a small text file and updated under an
+    exclusive lock, so that several admin scripts running against the same Dataverse stay together within the rate.
+    """
+
+    def __init__(self, state_file: str, rate: float, burst: int = 1):
+        super().__init__(rate, burst)
+        self.state_file = state_file
+
+    def _reserve(self, tokens):
+        with open(self.state_file, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                state = f.read().split()
+                now = time.time()
+                if len(state) == 2:
+                    available, timestamp = float(state[0]), float(state[1])
+                else:
+                    available, timestamp = float(self.burst), now
+                available = min(self.burst, available + max(now - timestamp, 0) * self.rate) - tokens
+                f.seek(0)
+                f.truncate()
+                f.write(f"{available} {now}\n")
+                f.flush()
+                return -available / self.rate if available < 0 else 0
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def create_rate_limiter(config: dict):
+    """ Creates a rate limiter from a `rate_limit` configuration section, or returns None if there is none.
+
+    Args:
+        config: a dictionary with the keys `requests_per_second`, and optionally `burst` and `shared_state_file`.
+                If `shared_state_file` is given, the rate is shared with other processes using the same file.
+    """
+    if config is None:
+        return None
+    rate = float(config['requests_per_second'])
+    burst = int(config.get('burst', 1))
+    if config.get('shared_state_file'):
+        return FileTokenBucket(config['shared_state_file'], rate, burst)
+    return TokenBucket(rate, burst)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """ An HTTPAdapter that takes a token from the rate limiter, if any, before sending each request. """
+
+    def __init__(self, rate_limiter: TokenBucket = None, **kwargs):
+        self.rate_limiter = rate_limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        return super().send(request, **kwargs)
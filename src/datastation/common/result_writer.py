@@ -1,7 +1,9 @@
 # module for result writer classes
 import csv
 import json
+import time
 import typing
+from datetime import datetime, timezone
 
 import yaml
 
@@ -36,6 +38,34 @@ class JsonResultWriter(ResultWriter):
         self.out_stream.write("]")
 
 
+# Writes each result as a JSON object on a line of its own (JSON Lines), so that the output can be processed while it
+# is being written, e.g. with `tail -f | jq`
+class JsonLinesResultWriter(ResultWriter):
+    def __init__(self, out_stream: typing.TextIO, flush_interval: float = 1.0):
+        """
+        Args:
+            out_stream:     the stream to write to; its own buffering is used between flushes
+            flush_interval: the minimum number of seconds between two flushes of the stream; 0 flushes after every
+                            result, None only when the writer is closed
+        """
+        self.out_stream = out_stream
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+
+    def write(self, result: dict, is_first: bool):
+        self.out_stream.write(json.dumps(result))
+        self.out_stream.write("\n")
+        if self.flush_interval is not None and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.out_stream.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+
+
 class YamlResultWriter(ResultWriter):
     def __init__(self, out_stream: typing.TextIO):
         self.out_stream = out_stream
@@ -63,3 +93,79 @@ class CsvResultWriter(ResultWriter):
 
     def close(self):
         pass
+
+
+# Writes the results to a Parquet file, a row group at a time, with a typed column per field. Analysis tools can then
+# read only the columns they need, without parsing text. Needs the pyarrow package, from the parquet extra.
+class ParquetResultWriter(ResultWriter):
+    column_types = ['string', 'int64', 'float64', 'bool', 'timestamp']
+
+    def __init__(self, columns: typing.List[typing.Tuple[str, str]], out_file, row_group_size: int = 10000,
+                 compression: str = 'zstd'):
+        """
+        Args:
+            columns:        the name and type of each column, in order; the type is one of column_types
+            out_file:       the path of the file to write to, or a binary stream
+            row_group_size: the number of results that are kept in memory and then written as one row group
+            compression:    the compression codec of the column chunks, e.g. 'zstd', 'snappy', 'gzip' or 'none'
+        """
+        try:
+            import pyarrow  # optional dependency, only needed for Parquet output
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet output needs the pyarrow package; install dans-datastation-tools with the "
+                              "parquet extra: pip3 install 'dans-datastation-tools[parquet]'") from e
+
+        for name, column_type in columns:
+            if column_type not in self.column_types:
+                raise ValueError(f"Unknown type {column_type} of column {name}")
+        arrow_types = {'string': pyarrow.string(), 'int64': pyarrow.int64(), 'float64': pyarrow.float64(),
+                       'bool': pyarrow.bool_(), 'timestamp': pyarrow.timestamp('us')}
+        self.pyarrow = pyarrow
+        self.columns = columns
+        self.row_group_size = row_group_size
+        self.schema = pyarrow.schema([(name, arrow_types[column_type]) for name, column_type in columns])
+        self.parquet_writer = pyarrow.parquet.ParquetWriter(out_file, self.schema, compression=compression)
+        self.values = {name: [] for name, _ in columns}
+        self.row_count = 0
+
+    def write(self, result: dict, is_first: bool):
+        if len(result.keys()) == 0:
+            return
+        unknown = set(result.keys()) - set(self.values.keys())
+        if len(unknown) > 0:
+            raise ValueError(f"Result keys do not match columns: {sorted(unknown)}")
+        for name, column_type in self.columns:
+            self.values[name].append(to_column_value(result.get(name), column_type))
+        self.row_count += 1
+        if self.row_count >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self.row_count > 0:
+            self.parquet_writer.write_table(self.pyarrow.Table.from_pydict(self.values, schema=self.schema))
+            self.values = {name: [] for name in self.values.keys()}
+            self.row_count = 0
+
+    def close(self):
+        self.flush()
+        self.parquet_writer.close()
+
+
+def to_column_value(value, column_type):
+    """ Converts a value, which may be a string as written to a CSV file, to the Python type of a Parquet column. """
+    if value is None or (value == '' and column_type != 'string'):
+        return None
+    if column_type == 'int64':
+        return int(value)
+    if column_type == 'float64':
+        return float(value)
+    if column_type == 'bool':
+        return value if isinstance(value, bool) else str(value).lower() == 'true'
+    if column_type == 'timestamp':
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    return str(value)
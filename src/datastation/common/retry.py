@@ -0,0 +1,146 @@
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from requests.exceptions import ConnectionError
+
+from datastation.common.rate_limiter import RateLimitedAdapter
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+OVERLOAD_STATUSES = frozenset([429, 503])
+
+
+class RetryPolicy:
+    """ Decides which requests are retried, and how long to wait before the next attempt.
+
+    Only idempotent requests are retried: requests with an idempotent method, and POST requests to the endpoints in
+    `idempotent_post_paths` (e.g. modifyRegistrationMetadata, which only re-sends the current metadata to DataCite).
+    The wait is exponential with full jitter, unless the server sends a Retry-After header, which is then honored.
+    """
+
+    def __init__(self, max_retries: int = 5, backoff_factor: float = 1.0, max_backoff: float = 60.0,
+                 retry_statuses=(429, 500, 502, 503, 504), idempotent_post_paths=('/modifyRegistrationMetadata',)):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_statuses = frozenset(retry_statuses)
+        self.idempotent_post_paths = tuple(idempotent_post_paths)
+
+    def is_retryable_request(self, request):
+        if request.method in IDEMPOTENT_METHODS:
+            return True
+        return request.method == 'POST' and urlparse(request.url).path.endswith(self.idempotent_post_paths)
+
+    def is_retryable_status(self, status_code):
+        return status_code in self.retry_statuses
+
+    def get_backoff(self, attempt, retry_after=None):
+        """ Returns the number of seconds to wait before retry number `attempt` (starting at 0). """
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+
+def parse_retry_after(value):
+    """ Parses a Retry-After header, which is either a number of seconds or an HTTP date. Returns None if absent or
+    invalid. """
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryStatistics:
+    """ Thread-safe counters of the retries done in one run. """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.retries = Counter()  # reason -> number of retries
+        self.gave_up = 0
+
+    def count_retry(self, reason):
+        with self.lock:
+            self.retries[reason] += 1
+
+    def count_gave_up(self):
+        with self.lock:
+            self.gave_up += 1
+
+    def total_retries(self):
+        with self.lock:
+            return sum(self.retries.values())
+
+    def log_summary(self):
+        with self.lock:
+            if len(self.retries) == 0 and self.gave_up == 0:
+                return
+            reasons = ', '.join(f"{reason}: {count}" for reason, count in sorted(self.retries.items()))
+            logging.info(f"Retried {sum(self.retries.values())} requests ({reasons}); gave up on {self.gave_up}")
+
+
+def create_retry_policy(config: dict):
+    """ Creates a retry policy from a `retry` configuration section; the defaults are used if there is none. """
+    if config is None:
+        return RetryPolicy()
+    return RetryPolicy(max_retries=int(config.get('max_retries', 5)),
+                       backoff_factor=float(config.get('backoff_factor', 1.0)),
+                       max_backoff=float(config.get('max_backoff', 60.0)))
+
+
+class RetryingAdapter(RateLimitedAdapter):
+    """ An HTTPAdapter that retries idempotent requests after transient errors (connection errors, 5xx and 429).
+
+    Every attempt takes a token from the rate limiter. When the server signals overload (429 or 503), the rate limiter
+    is also slowed down, and it recovers gradually with the successful requests that follow.
+    """
+
+    def __init__(self, retry_policy: RetryPolicy, statistics: RetryStatistics, rate_limiter=None, **kwargs):
+        self.retry_policy = retry_policy
+        self.statistics = statistics
+        super().__init__(rate_limiter, **kwargs)
+
+    def send(self, request, **kwargs):
+        retryable = self.retry_policy.is_retryable_request(request)
+        attempt = 0
+        while True:
+            try:
+                response = super().send(request, **kwargs)
+            except ConnectionError as e:
+                if not retryable or attempt >= self.retry_policy.max_retries:
+                    if retryable:
+                        self.statistics.count_gave_up()
+                    raise
+                self._wait_before_retry(request, attempt, type(e).__name__)
+                attempt += 1
+                continue
+            if retryable and self.retry_policy.is_retryable_status(response.status_code):
+                if response.status_code in OVERLOAD_STATUSES and self.rate_limiter is not None:
+                    self.rate_limiter.slow_down()
+                if attempt >= self.retry_policy.max_retries:
+                    self.statistics.count_gave_up()
+                    return response
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                response.close()
+                self._wait_before_retry(request, attempt, str(response.status_code), retry_after)
+                attempt += 1
+                continue
+            if self.rate_limiter is not None and response.status_code < 400:
+                self.rate_limiter.recover()
+            return response
+
+    def _wait_before_retry(self, request, attempt, reason, retry_after=None):
+        backoff = self.retry_policy.get_backoff(attempt, retry_after)
+        self.statistics.count_retry(reason)
+        logging.warning(f"{reason} on {request.method} {urlparse(request.url).path}, retry {attempt + 1} of "
+                        f"{self.retry_policy.max_retries} in {backoff:.1f} seconds")
+        time.sleep(backoff)
@@ -2,25 +2,62 @@ import json as jsonlib
 import logging
 import os
 import shutil
+import sys
+import threading
 import argparse
 import requests
 
+_print_lock = threading.Lock()
+
 
 def add_dry_run_arg(parser):
     parser.add_argument('-d', '--dry-run', action='store_true',
                         help='Do not perform the action, but show what would be done.')
 
 
-def add_batch_processor_args(parser, report: bool = True):
-    parser.add_argument('-w', '--wait-between-items', default=2.0, type=float,
-                        help="number of seconds to wait between processing items",
+def add_flush_interval_arg(parser):
+    parser.add_argument('--flush-interval', dest='flush_interval', type=float, default=1.0,
+                        help='with the jsonl format, the minimum number of seconds between writing buffered results '
+                             'to the output; 0 writes every result immediately (default: 1.0)')
+
+
+def add_compression_args(parser):
+    parser.add_argument('--compress', dest='compress', choices=['gzip', 'zstd'], default=None,
+                        help='compress the output; output files ending with .gz or .zst are compressed accordingly '
+                             'without this option. zstd needs the zstd extra')
+    parser.add_argument('--compression-level', dest='compression_level', type=int, default=None,
+                        help='the compression level (default: 6 for gzip, 3 for zstd)')
+
+
+def add_batch_processor_args(parser, report: bool = True, config: dict = None):
+    """ Adds the options of a BatchProcessor. With the configuration, the wait between items defaults to 0 if the
+    request rate is limited with dataverse.rate_limit. """
+    rate_limited = config is not None and config.get('dataverse', {}).get('rate_limit') is not None
+    parser.add_argument('-w', '--wait-between-items', default=0.0 if rate_limited else None, type=float,
+                        help="number of seconds to wait between processing items (default: 2 with one worker, "
+                             "0 with more than one worker or with dataverse.rate_limit in the configuration file, "
+                             "which paces the requests instead)",
                         dest='wait')
+    parser.add_argument('--workers', default=1, type=positive_int_argument_converter,
+                        help="number of items to process concurrently; a wait given with -w is then the minimum "
+                             "time between the start of two items (default: 1)",
+                        dest='workers')
     parser.add_argument('-f', '--fail-fast', dest='fail_fast', action='store_true', help='fail on first error ')
+    parser.add_argument('-j', '--journal-file', dest='journal_file', default=None,
+                        help="a file in which to record the outcome of each processed item, to be able to resume")
+    parser.add_argument('--resume', dest='resume', action='store_true',
+                        help="skip the items that the journal file records as completed, and append to the report")
     if report:
         parser.add_argument('-r', '--report-file', default='-', help="the report file, or - for stdout",
                             dest='report_file')
 
 
+def check_batch_processor_args(parser, args):
+    """ Reports invalid combinations of the options added by add_batch_processor_args as a usage error. """
+    if getattr(args, 'resume', False) and getattr(args, 'journal_file', None) is None:
+        parser.error("--resume needs --journal-file")
+
+
 def raise_for_status_after_log(r: requests.Response):
     if r.status_code >= 400:
         logging.error(f"{r.status_code} {r.reason} -- {r.content}")
@@ -39,6 +76,14 @@ def positive_int_argument_converter(value):
         raise argparse.ArgumentTypeError("value must be a number greater than zero")
 
 
+def print_synchronized(text, out_stream=None):
+    """ Writes text and a newline to out_stream (by default standard output) in a single write under a lock, so that
+    lines printed by concurrent workers do not interleave. """
+    out_stream = out_stream if out_stream is not None else sys.stdout
+    with _print_lock:
+        out_stream.write(f'{text}\n')
+
+
 def print_dry_run_message(method, url, params=None, headers=None, data=None, json=None):
     print("DRY-RUN: only printing command, not sending it...")
     print(f"{method} {url}")
@@ -1,21 +1,26 @@
 import argparse
 import sys
 
-from datastation.common.result_writer import CsvResultWriter, JsonResultWriter, YamlResultWriter
-from datastation.common.utils import add_dry_run_arg
+from datastation.common.result_writer import CsvResultWriter, JsonResultWriter, JsonLinesResultWriter, \
+    YamlResultWriter
+from datastation.common.compression import open_output
+from datastation.common.utils import add_dry_run_arg, add_flush_interval_arg, add_compression_args
 from datastation.common.config import init
 from datastation.dans_bag.validate_dans_bag import ValidateDansBag
 
 
-def create_result_writer(file_format):
+def create_result_writer(file_format, flush_interval=1.0, out_stream=None):
+    out_stream = out_stream if out_stream is not None else sys.stdout
     if file_format == 'csv':
         return CsvResultWriter(headers=['Bag location', 'Information package type', 'Is compliant',
                                         'Name', 'Profile version', 'Rule violations'],
-                               out_stream=sys.stdout)
+                               out_stream=out_stream)
     elif file_format == 'yaml':
-        return YamlResultWriter(out_stream=sys.stdout)
+        return YamlResultWriter(out_stream=out_stream)
+    elif file_format == 'jsonl':
+        return JsonLinesResultWriter(out_stream=out_stream, flush_interval=flush_interval)
     else:
-        return JsonResultWriter(out_stream=sys.stdout)
+        return JsonResultWriter(out_stream=out_stream)
 
 
 def main():
@@ -32,7 +37,10 @@ def main():
                         choices=['DEPOSIT', 'MIGRATION'],
                         default=default_information_package_type)
     parser.add_argument('-f', '--format', dest='format',
-                        help='Output format, one of: csv, json, yaml (default: json)')
+                        help='Output format, one of: csv, json, jsonl, yaml (default: json). With jsonl every result '
+                             'is a JSON object on a line of its own, which can be processed while bags are validated')
+    add_flush_interval_arg(parser)
+    add_compression_args(parser)
     parser.add_argument('-a', '--accept', dest='accept', default='application/json',
                         help='Accept header to send to server. Note that the server only supports application/json and'
                              'text/plain, the latter will return YAML. This option is only useful for debugging '
@@ -41,8 +49,13 @@ def main():
 
     args = parser.parse_args()
     validate_dans_bag = ValidateDansBag(config['validate_dans_bag'], args.accept)
-    validate_dans_bag.validate(args.path, args.info_package_type, create_result_writer(args.format),
-                               dry_run=args.dry_run)
+    out_stream = open_output('-', 'w', args.compress, args.compression_level)
+    try:
+        result_writer = create_result_writer(args.format, args.flush_interval, out_stream)
+        validate_dans_bag.validate(args.path, args.info_package_type, result_writer, dry_run=args.dry_run)
+    finally:
+        if out_stream is not sys.stdout:
+            out_stream.close()
 
 
 if __name__ == '__main__':
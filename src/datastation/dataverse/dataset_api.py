@@ -7,17 +7,46 @@ from datastation.common.utils import print_dry_run_message, raise_for_status_aft
 
 
 class DatasetApi:
+    """ Client for the dataset endpoints of the Dataverse API, for a single dataset.
 
-    def __init__(self, pid, server_url, api_token, unblock_key, safety_latch):
+    The dataset document and the version documents that are read are kept for the lifetime of the instance, so that
+    e.g. the draft state, the files, the license and the metadata blocks of the latest version are read with a single
+    GET. The cache is cleared by every call that changes the dataset (publish, edit_metadata, delete_draft, destroy),
+    and can be cleared explicitly with invalidate_cache. Use a new instance (e.g. DataverseClient.dataset) to see
+    changes made by others.
+    """
+
+    def __init__(self, pid, server_url, api_token, unblock_key, safety_latch, session: requests.Session = None):
         self.pid = pid
         self.server_url = server_url
         self.api_token = api_token
         self.unblock_key = unblock_key
         self.safety_latch = safety_latch
+        self.session = session if session is not None else requests.Session()
+        self._dataset = None
+        self._versions = {}
 
     def get_pid(self):
         return self.pid
-    
+
+    def invalidate_cache(self):
+        self._dataset = None
+        self._versions = {}
+
+    def get_dataset(self, dry_run=False):
+        """Get the JSON representation of the dataset, including its latest version."""
+        url = f'{self.server_url}/api/datasets/:persistentId'
+        params = {'persistentId': self.pid}
+        headers = {'X-Dataverse-key': self.api_token}
+        if dry_run:
+            print_dry_run_message(method='GET', url=url, headers=headers, params=params)
+            return None
+        if self._dataset is None:
+            r = self.session.get(url, headers=headers, params=params)
+            raise_for_status_after_log(r)
+            self._dataset = r.json()['data']
+        return self._dataset
+
     def get(self, version=":latest", dry_run=False):
         url = f'{self.server_url}/api/datasets/:persistentId/versions/{version}'
         headers = {'X-Dataverse-key': self.api_token}
@@ -26,12 +55,14 @@ class DatasetApi:
         if dry_run:
             print_dry_run_message(method='GET', url=url, headers=headers, params=params)
             return None
-        
-        dv_resp = requests.get(url, headers=headers, params=params)
-        raise_for_status_after_log(dv_resp)
 
-        resp_data = dv_resp.json()['data']
-        return resp_data
+        if version == ':latest' and self._dataset is not None:
+            return self._dataset['latestVersion']
+        if version not in self._versions:
+            dv_resp = self.session.get(url, headers=headers, params=params)
+            raise_for_status_after_log(dv_resp)
+            self._versions[version] = dv_resp.json()['data']
+        return self._versions[version]
 
     def get_role_assignments(self, dry_run=False):
         url = f'{self.server_url}/api/datasets/:persistentId/assignments'
@@ -41,7 +72,7 @@ class DatasetApi:
             print_dry_run_message(method='GET', url=url, headers=headers, params=params)
             return None
         else:
-            r = requests.get(url, headers=headers, params=params)
+            r = self.session.get(url, headers=headers, params=params)
         raise_for_status_after_log(r)
         return r.json()['data']
 
@@ -55,7 +86,7 @@ class DatasetApi:
                                   data=json.dumps(role_assignment))
             return None
         else:
-            r = requests.post(url, headers=headers, params=params, json=role_assignment)
+            r = self.session.post(url, headers=headers, params=params, json=role_assignment)
             raise_for_status_after_log(r)
             return r
 
@@ -67,21 +98,17 @@ class DatasetApi:
             print_dry_run_message(method='DELETE', url=url, headers=headers, params=params)
             return None
         else:
-            r = requests.delete(url, headers=headers, params=params)
+            r = self.session.delete(url, headers=headers, params=params)
         raise_for_status_after_log(r)
         return r
 
     def is_draft(self, dry_run=False):
-        url = f'{self.server_url}/api/datasets/:persistentId'
-        params = {'persistentId': self.pid}
-        headers = {'X-Dataverse-key': self.api_token}
-        if dry_run:
-            print_dry_run_message(method='GET', url=url, headers=headers, params=params)
+        if ':latest' in self._versions:
+            return self._versions[':latest']['versionState'] == 'DRAFT'
+        dataset = self.get_dataset(dry_run=dry_run)
+        if dataset is None:
             return None
-        else:
-            r = requests.get(url, headers=headers, params=params)
-        raise_for_status_after_log(r)
-        return r.json()['data']['latestVersion']['versionState'] == 'DRAFT'
+        return dataset['latestVersion']['versionState'] == 'DRAFT'
 
     def delete_draft(self, dry_run=False):
         url = f'{self.server_url}/api/datasets/:persistentId'
@@ -91,7 +118,8 @@ class DatasetApi:
             print_dry_run_message(method='DELETE', url=url, headers=headers, params=params)
             return None
         else:
-            r = requests.delete(url, headers=headers, params=params)
+            self.invalidate_cache()
+            r = self.session.delete(url, headers=headers, params=params)
         raise_for_status_after_log(r)
         return r.json()
 
@@ -107,7 +135,8 @@ class DatasetApi:
             if dry_run:
                 print_dry_run_message(method='DELETE', url=url, headers=headers, params=params)
                 return None
-            r = requests.delete(url, headers=headers, params=params)
+            self.invalidate_cache()
+            r = self.session.delete(url, headers=headers, params=params)
         raise_for_status_after_log(r)
         return r.json()
 
@@ -117,16 +146,7 @@ class DatasetApi:
          https://guides.dataverse.org/en/latest/api/native-api.html#get-json-representation-of-a-dataset
          for more information.
          """
-        url = f'{self.server_url}/api/datasets/:persistentId/versions/{version}'
-        params = {'persistentId': self.pid}
-        headers = {'X-Dataverse-key': self.api_token}
-        if dry_run:
-            print_dry_run_message(method='GET', url=url, headers=headers, params=params)
-            return None
-        else:
-            r = requests.get(url, headers=headers, params=params)
-        raise_for_status_after_log(r)
-        return r.json()['data']
+        return self.get(version=version, dry_run=dry_run)
 
     def get_metadata_export(self, exporter='dataverse_json', dry_run=False):
         """Get a metadata export for the latest version of the dataset.
@@ -140,7 +160,7 @@ class DatasetApi:
             print_dry_run_message(method='GET', url=url, headers=headers, params=params)
             return None
         else:
-            r = requests.get(url, headers=headers, params=params)
+            r = self.session.get(url, headers=headers, params=params)
         raise_for_status_after_log(r)
         return r.text
 
@@ -154,7 +174,7 @@ class DatasetApi:
             print_dry_run_message(method='GET', url=url, headers=headers, params=params)
             return None
         else:
-            r = requests.get(url, headers=headers, params=params)
+            r = self.session.get(url, headers=headers, params=params)
         raise_for_status_after_log(r)
         return r.json()['data']
 
@@ -166,7 +186,7 @@ class DatasetApi:
             print_dry_run_message(method='POST', url=url, headers=headers, params=params)
             return None
         else:
-            r = requests.post(url, headers=headers, params=params)
+            r = self.session.post(url, headers=headers, params=params)
             raise_for_status_after_log(r)
             return r.json()
 
@@ -180,7 +200,7 @@ class DatasetApi:
             print_dry_run_message(method='DELETE', url=url, headers=headers, params=params)
             return None
         else:
-            r = requests.delete(url, headers=headers, params=params)
+            r = self.session.delete(url, headers=headers, params=params)
         raise_for_status_after_log(r)
         return r.json()
 
@@ -194,7 +214,8 @@ class DatasetApi:
         if dry_run:
             print_dry_run_message(method='POST', url=url, headers=headers, params=params)
             return None
-        r = requests.post(url, headers=headers, params=params)
+        self.invalidate_cache()
+        r = self.session.post(url, headers=headers, params=params)
         raise_for_status_after_log(r)
         return r.json()
 
@@ -208,7 +229,7 @@ class DatasetApi:
             print_dry_run_message(method='GET', url=url, headers=headers, params=params)
             return None
         else:
-            r = requests.get(url, headers=headers, params=params)
+            r = self.session.get(url, headers=headers, params=params)
         raise_for_status_after_log(r)
         return r.json()
 
@@ -220,7 +241,7 @@ class DatasetApi:
             print_dry_run_message(method='POST', url=url, headers=headers, params=params)
             return None
         else:
-            r = requests.post(url, headers=headers, params=params)
+            r = self.session.post(url, headers=headers, params=params)
         raise_for_status_after_log(r)
         return r.json()
 
@@ -231,8 +252,11 @@ class DatasetApi:
         if dry_run:
             print_dry_run_message(method='GET', url=url, headers=headers, params=params)
             return None
-        else:
-            r = requests.get(url, headers=headers, params=params)
+        if version in self._versions:
+            return self._versions[version]['files']
+        if version == ':latest' and self._dataset is not None:
+            return self._dataset['latestVersion']['files']
+        r = self.session.get(url, headers=headers, params=params)
         raise_for_status_after_log(r)
         return r.json()['data']
 
@@ -261,6 +285,7 @@ class DatasetApi:
             print_dry_run_message(method='PUT', url=url, headers=headers, params=params, data=data)
             return None
         else:
-            r = requests.put(url, headers=headers, params=params, data=data)
+            self.invalidate_cache()
+            r = self.session.put(url, headers=headers, params=params, data=data)
             raise_for_status_after_log(r)
             return r
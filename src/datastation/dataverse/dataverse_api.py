@@ -6,10 +6,11 @@ from datastation.common.utils import print_dry_run_message, raise_for_status_aft
 
 
 class DataverseApi:
-    def __init__(self, server_url, api_token, alias):
+    def __init__(self, server_url, api_token, alias, session: requests.Session = None):
         self.server_url = server_url
         self.api_token = api_token
         self.alias = alias  # Methods should use this one if specified
+        self.session = session if session is not None else requests.Session()
 
     def get_alias(self):
         return self.alias
@@ -23,7 +24,7 @@ class DataverseApi:
             print_dry_run_message(method="GET", url=url, headers=headers)
             return None
 
-        dv_resp = requests.get(url, headers=headers)
+        dv_resp = self.session.get(url, headers=headers)
         raise_for_status_after_log(dv_resp)
 
         resp_data = dv_resp.json()["data"]
@@ -49,7 +50,7 @@ class DataverseApi:
             print_dry_run_message(method='GET', url=url, headers=headers)
             return None
         else:
-            r = requests.get(url, headers=headers)
+            r = self.session.get(url, headers=headers)
         raise_for_status_after_log(r)
         return r.json()['data']['message']
 
@@ -62,7 +63,7 @@ class DataverseApi:
                                   data=json.dumps(role_assignment))
             return None
         else:
-            r = requests.post(url, headers=headers, json=role_assignment)
+            r = self.session.post(url, headers=headers, json=role_assignment)
             raise_for_status_after_log(r)
             return r
 
@@ -73,6 +74,6 @@ class DataverseApi:
             print_dry_run_message(method='DELETE', url=url, headers=headers)
             return None
         else:
-            r = requests.delete(url, headers=headers)
+            r = self.session.delete(url, headers=headers)
         raise_for_status_after_log(r)
         return r
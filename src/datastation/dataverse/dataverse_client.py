@@ -1,4 +1,11 @@
+import atexit
+import weakref
+
+import requests
+
 from datastation.common.database import Database
+from datastation.common.rate_limiter import TokenBucket, create_rate_limiter
+from datastation.common.retry import RetryingAdapter, RetryPolicy, RetryStatistics, create_retry_policy
 from datastation.dataverse.banner_api import BannerApi
 from datastation.dataverse.builtin_users import BuiltInUsersApi
 from datastation.dataverse.dataset_api import DatasetApi
@@ -8,8 +15,46 @@ from datastation.dataverse.metrics_api import MetricsApi
 from datastation.dataverse.search_api import SearchApi
 
 
+def create_session(api_token, pool_connections=4, pool_maxsize=16, rate_limiter: TokenBucket = None,
+                   retry_policy: RetryPolicy = None, retry_statistics: RetryStatistics = None):
+    """ Creates a session with a connection pool for one Dataverse server. Connections are kept alive and reused
+    between calls, so that a batch does not pay for a new TCP connection and TLS handshake on every request.
+
+    Args:
+        api_token:        sent as X-Dataverse-key with every request
+        pool_connections: the number of hosts to keep connection pools for
+        pool_maxsize:     the maximum number of connections to keep alive per host; set this to at least the number
+                          of threads that use the session concurrently
+        rate_limiter:     if given, every request (including retries) takes a token from it before it is sent
+        retry_policy:     decides which requests are retried after transient errors, by default the RetryPolicy defaults
+        retry_statistics: counts the retries
+    """
+    session = requests.Session()
+    adapter = RetryingAdapter(retry_policy if retry_policy is not None else RetryPolicy(),
+                              retry_statistics if retry_statistics is not None else RetryStatistics(),
+                              rate_limiter, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'X-Dataverse-key': api_token})
+    return session
+
+
+# The clients that have not been closed; the retry summaries of these are logged when the interpreter exits
+_open_clients = weakref.WeakSet()
+
+
+@atexit.register
+def _log_retry_summaries():
+    for client in list(_open_clients):
+        client.retry_statistics.log_summary()
+
+
 class DataverseClient:
-    """ A client for the Dataverse API. """
+    """ A client for the Dataverse API. All the API objects it creates share one pooled HTTP session.
+
+    Closing the client, or leaving it as a context manager, closes the session and logs a summary of the retries. The
+    summary of a client that is never closed is logged when the interpreter exits.
+    """
 
     def __init__(self, config: dict):
         self.server_url = config['server_url']
@@ -17,27 +62,46 @@ class DataverseClient:
         self.unblock_key = config['unblock_key'] if 'unblock_key' in config else None
         self.safety_latch = config['safety_latch']
         self.db_config = config['db']
+        self.rate_limiter = create_rate_limiter(config.get('rate_limit'))
+        self.retry_statistics = RetryStatistics()
+        self.session = create_session(self.api_token, pool_maxsize=config.get('http_pool_maxsize', 16),
+                                      rate_limiter=self.rate_limiter,
+                                      retry_policy=create_retry_policy(config.get('retry')),
+                                      retry_statistics=self.retry_statistics)
+        _open_clients.add(self)
 
     def banner(self):
-        return BannerApi(self.server_url, self.api_token, self.unblock_key)
+        return BannerApi(self.server_url, self.api_token, self.unblock_key, self.session)
 
     def search_api(self):
-        return SearchApi(self.server_url, self.api_token)
+        return SearchApi(self.server_url, self.api_token, self.session)
 
     def dataset(self, pid):
-        return DatasetApi(pid, self.server_url, self.api_token, self.unblock_key, self.safety_latch)
+        return DatasetApi(pid, self.server_url, self.api_token, self.unblock_key, self.safety_latch, self.session)
 
     def dataverse(self, alias=None):
-        return DataverseApi(self.server_url, self.api_token, alias)
+        return DataverseApi(self.server_url, self.api_token, alias, self.session)
 
     def file(self, file_id):
-        return FileApi(file_id, self.server_url, self.api_token, self.unblock_key, self.safety_latch)
+        return FileApi(file_id, self.server_url, self.api_token, self.unblock_key, self.safety_latch, self.session)
 
     def built_in_users(self, builtin_users_key):
-        return BuiltInUsersApi(self.server_url, self.api_token, builtin_users_key, self.unblock_key)
+        return BuiltInUsersApi(self.server_url, self.api_token, builtin_users_key, self.unblock_key, self.session)
 
     def database(self):
         return Database(self.db_config)
 
     def metrics(self):
-        return MetricsApi(self.server_url)
+        return MetricsApi(self.server_url, self.session)
+
+    def close(self):
+        if self in _open_clients:
+            _open_clients.discard(self)
+            self.retry_statistics.log_summary()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,198 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import tarfile
+import threading
+import time
+
+from datastation.common.compression import get_compression, get_suffix, open_output
+from datastation.common.csv import CsvReport
+from datastation.dataverse.export_manifest import now
+
+TAR = 'tar'
+JSONL = 'jsonl'
+
+# Archive is the file that holds the export, Exported the start of the run that found it to be current
+index_headers = ['PID', 'Exporter', 'Name', 'Offset', 'Size', 'Sha256', 'Archive', 'Exported']
+
+
+def get_archive_format(filename):
+    """ Returns TAR or JSONL, from the suffix of the archive filename, e.g. exports.tar.zst or exports.jsonl.gz. """
+    base = filename[:len(filename) - len(get_suffix(get_compression(filename)))]
+    if base.endswith('.tar'):
+        return TAR
+    if base.endswith('.jsonl'):
+        return JSONL
+    raise ValueError(f"Archive {filename} must end with .tar or .jsonl, optionally followed by .gz or .zst")
+
+
+def get_index_filename(archive_filename):
+    return f'{archive_filename}.index.csv'
+
+
+def read_index(archive_filename):
+    """ Returns the index of an archive, as a dictionary from PID to its index row. The rows of an index written before
+    it had the Archive and Exported columns point at the archive itself, and have an empty Exported. """
+    with open(get_index_filename(archive_filename), 'r') as f:
+        index = {row['PID']: row for row in csv.DictReader(f)}
+    for row in index.values():
+        if not row.get('Archive'):
+            row['Archive'] = os.path.basename(archive_filename)
+        if row.get('Exported') is None:
+            row['Exported'] = ''
+    return index
+
+
+def get_exported_since(index):
+    """ Returns the earliest Exported of the index, before which no dataset in it can have been modified without the
+    index knowing, or None if the index is empty or has rows without it. """
+    exported = [row['Exported'] for row in index.values()]
+    if len(exported) == 0 or '' in exported:
+        return None
+    return min(exported)
+
+
+class ExportArchive:
+    """ Writes the metadata exports of many datasets to a single archive file, a tar file with a member per dataset or
+    a JSON Lines file with an object per dataset, optionally compressed (see open_output). Next to the archive an index
+    is written, <archive>.index.csv, with for each PID the offset and size of its export in the uncompressed archive
+    and the SHA-256 of the export.
+
+    Exports may be added from several threads. If the index of a previous archive is given, an export that has the
+    same hash as in that archive is not added, so that the archive only contains what changed since then. Its index
+    row is still written, pointing at the archive that holds the export, so that every index covers all datasets and
+    can serve as the previous index of the next run. An export that cannot have changed, because the dataset was not
+    modified since the previous run, can be kept without fetching it at all.
+    """
+
+    def __init__(self, filename, exporter, extension, previous_index=None, compression_level=None, started_at=None):
+        """
+        Args:
+            started_at: the start of the run, recorded as the Exported of the index rows (default: when opened)
+        """
+        self.filename = filename
+        self.exporter = exporter
+        self.extension = extension
+        self.format = get_archive_format(filename)
+        self.previous_index = previous_index if previous_index is not None else {}
+        self.compression_level = compression_level
+        self.lock = threading.Lock()
+        self.started_at = started_at
+        self.added = 0
+        self.unchanged = 0
+        self.kept = 0
+        self.indexed = set()
+        self.start_time = None
+        self.out_stream = None
+        self.tar = None
+        self.offset = 0
+        self.index = None
+
+    def open(self):
+        self.start_time = time.monotonic()
+        if self.started_at is None:
+            self.started_at = now()
+        self.out_stream = open_output(self.filename, 'wb', level=self.compression_level)
+        if self.format == TAR:
+            self.tar = tarfile.open(fileobj=self.out_stream, mode='w|', format=tarfile.PAX_FORMAT)
+        self.index = CsvReport(get_index_filename(self.filename), index_headers)
+
+    def add(self, pid, export: str):
+        """ Adds the export of a dataset, unless it is the same as in the previous archive. Returns whether it was
+        added. """
+        data = export.encode('utf-8')
+        sha256 = hashlib.sha256(data).hexdigest()
+        previous = self._get_previous(pid)
+        with self.lock:
+            if previous is not None and previous['Sha256'] == sha256:
+                self._write_previous(previous)
+                self.unchanged += 1
+                return False
+            name = f"{pid.replace('/', '_')}.{self.extension}"
+            if self.format == TAR:
+                offset, size = self._add_to_tar(name, data)
+            else:
+                offset, size = self._add_to_jsonl(pid, export)
+            self.index.write({'PID': pid, 'Exporter': self.exporter, 'Name': name, 'Offset': offset, 'Size': size,
+                              'Sha256': sha256, 'Archive': os.path.basename(self.filename),
+                              'Exported': self.started_at})
+            self.indexed.add(pid)
+            self.added += 1
+            return True
+
+    def keep(self, pid):
+        """ Keeps the export of a dataset that was not modified since the previous archive, without fetching it: its
+        index row points at the archive that holds it. Returns False if the previous archive does not have it. """
+        previous = self._get_previous(pid)
+        if previous is None:
+            return False
+        with self.lock:
+            self._write_previous(previous)
+            self.kept += 1
+        return True
+
+    def keep_remaining(self, excluded=()):
+        """ Keeps the exports of the previous archive that were neither added nor kept, e.g. those of the datasets that
+        were not modified, when only the modified ones were exported. The exports of the excluded PIDs, e.g. of
+        modified datasets whose export failed, are left out. """
+        for pid in list(self.previous_index.keys()):
+            if pid not in self.indexed and pid not in excluded:
+                self.keep(pid)
+
+    def _get_previous(self, pid):
+        previous = self.previous_index.get(pid)
+        if previous is None or previous['Exporter'] != self.exporter:
+            return None
+        return previous
+
+    def _write_previous(self, previous):
+        self.indexed.add(previous['PID'])
+        self.index.write({**{header: previous[header] for header in index_headers}, 'Exported': self.started_at})
+
+    def _add_to_tar(self, name, data):
+        tarinfo = tarfile.TarInfo(name)
+        tarinfo.size = len(data)
+        tarinfo.mtime = int(time.time())
+        self.tar.addfile(tarinfo, io.BytesIO(data))
+        # The data ends on the last block before the current offset of the tar file
+        offset = self.tar.offset - (len(data) + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE * tarfile.BLOCKSIZE
+        self.tar.members = []  # the tar file keeps all members by default, which is not needed for writing
+        return offset, len(data)
+
+    def _add_to_jsonl(self, pid, export):
+        line = json.dumps({'pid': pid, 'exporter': self.exporter, 'export': export}).encode('utf-8') + b'\n'
+        offset = self.offset
+        self.out_stream.write(line)
+        self.offset += len(line)
+        return offset, len(line)
+
+    def close(self):
+        if self.tar is not None:
+            self.tar.close()
+        if self.out_stream is not None:
+            self.out_stream.close()
+        if self.index is not None:
+            self.index.close()
+        if self.start_time is not None:
+            elapsed = time.monotonic() - self.start_time
+            logging.info(f"Added {self.added} exports to {self.filename}, skipped {self.unchanged} unchanged ones "
+                         f"and kept {self.kept} of unmodified datasets without fetching them, in {elapsed:.1f} s")
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def previous_index_of(previous_archive):
+    """ Returns the index of the previous archive, or None if there is none. """
+    if previous_archive is None:
+        return None
+    if not os.path.isfile(get_index_filename(previous_archive)):
+        raise FileNotFoundError(f"No index of previous archive: {get_index_filename(previous_archive)}")
+    return read_index(previous_archive)
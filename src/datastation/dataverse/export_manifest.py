@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from datastation.common.database import Database
+from datastation.dataverse.search_api import SearchApi
+
+SEARCH = 'search'
+DATABASE = 'database'
+
+schema = """
+    create table if not exists export (
+        pid text not null,
+        exporter text not null,
+        exported_at text not null,
+        sha256 text not null,
+        primary key (pid, exporter)
+    );
+    create table if not exists export_run (
+        exporter text primary key,
+        started_at text not null
+    );
+"""
+
+upsert_statement = """
+    insert into export (pid, exporter, exported_at, sha256) values (?, ?, ?, ?)
+    on conflict (pid, exporter) do update set exported_at = excluded.exported_at, sha256 = excluded.sha256
+"""
+
+# Only datasets with a published version have exports
+datasets_modified_since_query = """
+    select concat(dvo.protocol, ':', dvo.authority, '/', dvo.identifier)
+    from dvobject dvo
+    where dvo.dtype = 'Dataset'
+      and dvo.modificationtime > %s
+      and exists (select 1 from datasetversion dv where dv.dataset_id = dvo.id and dv.versionstate = 'RELEASED')
+    order by dvo.modificationtime
+"""
+
+
+def now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def find_pids_modified_in_search(search_api: SearchApi, since, prefetch: int = 2):
+    """ Yields the PIDs of the datasets with a dateSort after since (an ISO 8601 string in UTC), or of all datasets if
+    since is None, oldest first. """
+    filter_queries = [f'dateSort:[{since} TO *]'] if since is not None else None
+    for item in search_api.search(filter_queries=filter_queries, sort='date', order='asc', prefetch=prefetch,
+                                  fields=['global_id']):
+        yield item['global_id']
+
+
+def find_pids_modified_in_database(database: Database, since):
+    """ Yields the PIDs of the published datasets that were modified after since (an ISO 8601 string in UTC), or of
+    all published datasets if since is None, oldest first. """
+    since = datetime.fromisoformat(since.replace('Z', '+00:00')).replace(tzinfo=None) if since is not None \
+        else datetime.min
+    for record in database.stream_query(datasets_modified_since_query, (since,)):
+        yield record[0]
+
+
+class ExportManifest:
+    """ A local SQLite record of the metadata exports of datasets: for each PID and exporter when it was last exported
+    and the SHA-256 of that export, and for each exporter when the last complete run started.
+
+    The start of the last complete run is the watermark for the next one: only datasets modified since then need to be
+    exported again. A run that had failures does not move the watermark, so that its datasets are tried again.
+    Exports may be recorded from several threads.
+    """
+
+    def __init__(self, filename, commit_every: int = 1000):
+        self.filename = filename
+        self.commit_every = commit_every
+        self.connection = None
+        self.lock = threading.Lock()
+        self.uncommitted = 0
+
+    def connect(self):
+        self.connection = sqlite3.connect(self.filename, check_same_thread=False)
+        self.connection.executescript(schema)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get_last_run(self, exporter):
+        """ Returns the start of the last complete run for the exporter, or None if there was none. """
+        with self.lock:
+            row = self.connection.execute("select started_at from export_run where exporter = ?",
+                                          (exporter,)).fetchone()
+        return row[0] if row is not None else None
+
+    def get_hash(self, pid, exporter):
+        with self.lock:
+            row = self.connection.execute("select sha256 from export where pid = ? and exporter = ?",
+                                          (pid, exporter)).fetchone()
+        return row[0] if row is not None else None
+
+    def record(self, pid, exporter, export: str, exported_at=None):
+        """ Records an export, and returns whether it differs from the previous one. """
+        sha256 = hashlib.sha256(export.encode('utf-8')).hexdigest()
+        is_changed = self.get_hash(pid, exporter) != sha256
+        with self.lock:
+            self.connection.execute(upsert_statement, (pid, exporter, exported_at or now(), sha256))
+            self.uncommitted += 1
+            if self.uncommitted >= self.commit_every:
+                self.connection.commit()
+                self.uncommitted = 0
+        return is_changed
+
+    def complete_run(self, exporter, started_at):
+        with self.lock:
+            with self.connection:
+                self.connection.execute("insert into export_run (exporter, started_at) values (?, ?) "
+                                        "on conflict (exporter) do update set started_at = excluded.started_at",
+                                        (exporter, started_at))
+        logging.info(f"Completed export run for {exporter} started at {started_at}")
@@ -4,8 +4,9 @@ from datastation.common.utils import raise_for_status_after_log
 
 
 class MetricsApi:
-    def __init__(self, server_url: str):
+    def __init__(self, server_url: str, session: requests.Session = None):
         self.server_url = server_url
+        self.session = session if session is not None else requests.Session()
 
     def get_tree(self, dry_run: bool = False):
         """ Get dataverses hierarchy (tree). """
@@ -13,6 +14,6 @@ class MetricsApi:
         if dry_run:
             print(f"Would have sent the following request: {url}")
             return
-        r = requests.get(url)
+        r = self.session.get(url)
         raise_for_status_after_log(r)
         return r.json()['data']
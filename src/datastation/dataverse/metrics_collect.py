@@ -1,4 +1,6 @@
-from datastation.common.result_writer import CsvResultWriter, YamlResultWriter, JsonResultWriter
+from datastation.common.result_writer import CsvResultWriter, YamlResultWriter, JsonResultWriter, \
+    JsonLinesResultWriter, ParquetResultWriter
+from datastation.common.compression import open_output
 from datastation.dataverse.dataverse_client import DataverseClient
 import logging
 import re
@@ -6,8 +8,31 @@ import csv
 import sys
 import json
 import rich
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
+# The total size of the files below each dataverse, in one pass over the database. The files of a dataset count for the
+# dataverse that owns the dataset and for all the ancestors of that dataverse, like the storagesize API does it.
+storage_size_query = """
+    with recursive own_size(dataverse_id, size) as (
+        select ds.owner_id, sum(df.filesize)
+        from datafile df
+        inner join dvobject fo on fo.id = df.id
+        inner join dvobject ds on ds.id = fo.owner_id
+        group by ds.owner_id
+    ), ancestry(dataverse_id, ancestor_id) as (
+        select id, id from dvobject where dtype = 'Dataverse'
+        union all
+        select a.dataverse_id, p.owner_id
+        from ancestry a inner join dvobject p on p.id = a.ancestor_id
+        where p.owner_id is not null
+    )
+    select a.ancestor_id, sum(o.size)
+    from ancestry a inner join own_size o on o.dataverse_id = a.dataverse_id
+    group by a.ancestor_id
+"""
+
 
 def extract_size_str(msg):
     # Example message: "Total size of the files stored in this dataverse: 43,638,426,561 bytes"
@@ -23,11 +48,16 @@ def extract_size_str(msg):
 
 class MetricsCollect:
 
-    def __init__(self, dataverse_client: DataverseClient, output_file, output_format, dry_run: bool = False):
+    def __init__(self, dataverse_client: DataverseClient, output_file, output_format, dry_run: bool = False,
+                 workers: int = 1, flush_interval: float = 1.0, compress: str = None, compression_level: int = None):
         self.dataverse_client = dataverse_client
         self.output_file = output_file
         self.output_format = output_format
         self.dry_run = dry_run
+        self.workers = workers
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self.compression_level = compression_level
 
         self.writer = None
         self.is_first = True  # Would be nicer if the Writer does the bookkeeping
@@ -35,11 +65,24 @@ class MetricsCollect:
     def create_result_writer(self, out_stream):
         logging.info(f'Writing output: {self.output_file}, with format : {self.output_format}')
         csv_columns = ['depth', 'parentalias', 'alias', 'name', 'storagesize']
+        column_types = {'depth': 'int64', 'storagesize': 'int64'}
         if self.output_format == 'csv':
             return CsvResultWriter(headers=csv_columns, out_stream=out_stream)
+        elif self.output_format == 'jsonl':
+            return JsonLinesResultWriter(out_stream, self.flush_interval)
+        elif self.output_format == 'parquet':
+            return ParquetResultWriter([(column, column_types.get(column, 'string')) for column in csv_columns],
+                                       out_stream)
         else:
             return JsonResultWriter(out_stream)
 
+    @staticmethod
+    def close_output(out_stream):
+        if out_stream is sys.stdout or out_stream is getattr(sys.stdout, 'buffer', None):
+            out_stream.flush()
+        else:
+            out_stream.close()
+
     def write_result_row(self, row):
         self.writer.write(row, self.is_first)
         self.is_first = False  # Only the first time it can be True
@@ -53,27 +96,114 @@ class MetricsCollect:
                'storagesize': storage_size}
         return row
 
-    # Traverses the tree and collects sizes for each dataverse using recursion.
-    # Note that storing the parents size if all children sizes are also stored is redundant.
-    def collect_children_sizes(self, parent_data, max_depth, depth=1):
+    # Traverses the tree and yields the dataverses to collect the size for, parents before their children.
+    def iter_children(self, parent_data, max_depth, depth=1):
         parent_alias = parent_data['alias']
         # Only direct descendants (children)
         if 'children' in parent_data:
             for child_data in parent_data['children']:
-                row = self.get_result_row(parent_alias, child_data['alias'], child_data['name'], depth)
-                self.write_result_row(row)
+                yield parent_alias, child_data, depth
 
                 if depth < max_depth:
-                    self.collect_children_sizes(child_data, max_depth, depth + 1)  # Recurse
+                    yield from self.iter_children(child_data, max_depth, depth + 1)  # Recurse
+
+    # Collects the sizes for each dataverse in the tree, and writes them in tree order.
+    # Note that storing the parents size if all children sizes are also stored is redundant.
+    def collect_children_sizes(self, parent_data, max_depth, depth=1):
+        children = self.iter_children(parent_data, max_depth, depth)
+        if self.workers > 1:
+            self.collect_sizes_concurrently(children)
+        else:
+            for parent_alias, child_data, child_depth in children:
+                row = self.get_result_row(parent_alias, child_data['alias'], child_data['name'], child_depth)
+                self.write_result_row(row)
 
-    def collect_storage_usage(self, max_depth=1, include_grand_total: bool = False):
-        out_stream = sys.stdout
-        if self.output_file != '-':
-            try:
-                out_stream = open(self.output_file, "w")
-            except:
-                logging.error(f"Could not open file: {self.output_file}")
-                raise
+    # The storage sizes of the dataverses are requested by a pool of workers, but rows are written in the order in
+    # which the dataverses are yielded. To keep the workers busy while waiting for a slow dataverse, a few requests per
+    # worker are submitted ahead.
+    def collect_sizes_concurrently(self, children):
+        logging.info(f'Collecting sizes with {self.workers} workers')
+        max_pending = self.workers * 4
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='storage-size')
+        try:
+            for parent_alias, child_data, child_depth in children:
+                pending.append(executor.submit(self.get_result_row, parent_alias, child_data['alias'],
+                                               child_data['name'], child_depth))
+                if len(pending) >= max_pending:
+                    self.write_result_row(pending.popleft().result())
+            while len(pending) > 0:
+                self.write_result_row(pending.popleft().result())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    # The size of the files in the datasets that the dataverse itself contains, not counting those in the dataverses
+    # of the tree below it, or else its total size. Returns a tuple (size, is_total). A dataverse without children in
+    # the tree costs one storage size call. For the other ones the contents are listed, which does not make the server
+    # sum any files. A dataverse that directly contains datasets, or dataverses missing from the tree (e.g. unpublished
+    # ones), as well as children can only be sized as a whole, which makes the server sum the files below it again.
+    # That is only done if size_mixed is set; the own size then follows by subtracting the totals of its children.
+    def get_own_or_total_size(self, tree_data, size_mixed: bool = False):
+        alias = tree_data['alias']
+        children = tree_data.get('children', [])
+        if len(children) > 0:
+            logging.info(f'Retrieving contents of dataverse: {alias} ...')
+            child_ids = {child['id'] for child in children}
+            if not any(item['type'] == 'dataset' or item['id'] not in child_ids
+                       for item in self.dataverse_client.dataverse(alias).get_contents()):
+                return 0, False
+            if not size_mixed:
+                raise ValueError(f'Dataverse {alias} contains datasets as well as dataverses, and can only be sized '
+                                 f'as a whole; allow this with --size-mixed-dataverses or use --from-database')
+        size = int(extract_size_str(self.dataverse_client.dataverse(alias).get_storage_size()))
+        return size, len(children) > 0
+
+    # Traverses the whole tree and yields every dataverse, children before their parents (post-order).
+    def iter_post_order(self, tree_data):
+        for child_data in tree_data.get('children', []):
+            yield from self.iter_post_order(child_data)
+        yield tree_data
+
+    # Retrieves the own size or the total size of every dataverse in the tree, and computes the total size of the
+    # other dataverses locally by adding up the totals of their children. Returns a dictionary from dataverse id to
+    # total size.
+    def aggregate_sizes(self, tree_data, include_root: bool, size_mixed: bool = False):
+        nodes = [node for node in self.iter_post_order(tree_data) if include_root or node is not tree_data]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='storage-size') as executor:
+            sizes = dict(zip([node['id'] for node in nodes],
+                             executor.map(lambda node: self.get_own_or_total_size(node, size_mixed), nodes)))
+        totals = {}
+        for node in nodes:  # post-order, so the totals of the children are known
+            size, is_total = sizes[node['id']]
+            totals[node['id']] = size if is_total else \
+                size + sum(totals[child['id']] for child in node.get('children', []))
+        return totals
+
+    # Retrieves the total size of every dataverse from the database with a single query. Dataverses without any files
+    # do not occur in the result. Returns a dictionary from dataverse id to total size.
+    def get_sizes_from_database(self):
+        logging.info('Retrieving the sizes of all dataverses from the database ...')
+        with self.dataverse_client.database() as database:
+            return {dataverse_id: int(size) for dataverse_id, size in database.stream_query(storage_size_query)}
+
+    # Writes the rows in tree order, with the sizes looked up in totals, a dictionary from dataverse id to total size.
+    def write_sizes(self, tree_data, max_depth, include_grand_total: bool, totals: dict):
+        if include_grand_total:
+            self.write_result_row({'depth': 0, 'parentalias': '-', 'alias': tree_data['alias'],
+                                   'name': tree_data['name'], 'storagesize': str(totals.get(tree_data['id'], 0))})
+        for parent_alias, child_data, depth in self.iter_children(tree_data, max_depth):
+            self.write_result_row({'depth': depth, 'parentalias': parent_alias, 'alias': child_data['alias'],
+                                   'name': child_data['name'], 'storagesize': str(totals.get(child_data['id'], 0))})
+
+    def collect_storage_usage(self, max_depth=1, include_grand_total: bool = False, bottom_up: bool = False,
+                              from_database: bool = False, size_mixed: bool = False):
+        is_binary = self.output_format == 'parquet'
+        try:
+            out_stream = open_output(self.output_file, "wb" if is_binary else "w", self.compress,
+                                     self.compression_level)
+        except:
+            logging.error(f"Could not open file: {self.output_file}")
+            raise
 
         self.writer = self.create_result_writer(out_stream)
 
@@ -83,6 +213,15 @@ class MetricsCollect:
         name = tree_data['name']
         logging.info(f'Extracted the tree for the toplevel dataverse: {name} ({alias})')
 
+        if from_database or bottom_up:
+            totals = self.get_sizes_from_database() if from_database else \
+                self.aggregate_sizes(tree_data, include_grand_total, size_mixed)
+            self.write_sizes(tree_data, max_depth, include_grand_total, totals)
+            self.writer.close()
+            self.close_output(out_stream)
+            self.is_first = True
+            return
+
         if include_grand_total:
             logging.info("Retrieving the total size for this dataverse instance...")
             row = self.get_result_row("-", alias, name, 0)  # The root has no parent
@@ -90,4 +229,5 @@ class MetricsCollect:
 
         self.collect_children_sizes(tree_data, max_depth, 1)
         self.writer.close()
+        self.close_output(out_stream)
         self.is_first = True
@@ -3,8 +3,32 @@ from datastation.common.database import Database
 from datastation.dataverse.builtin_users import User
 from datastation.dataverse.dataverse_client import DataverseClient
 import logging
+import time
 from datetime import timedelta
 
+count_statement = """
+    select count(*), now() - %s
+    from usernotification
+    where senddate < now() - %s
+"""
+
+# The upper bound of the id range of the next batch: the id of the batch_size-th notification to delete after the
+# previous batch, or the last one if there are fewer
+next_batch_end_statement = """
+    select max(id)
+    from (select id
+          from usernotification
+          where senddate < %s and id > %s
+          order by id
+          limit %s) batch
+"""
+
+delete_batch_statement = """
+    delete
+    from usernotification
+    where senddate < %s and id > %s and id <= %s
+"""
+
 
 class Notifications:
 
@@ -12,7 +36,7 @@ class Notifications:
         self.dataverse_client = dataverse_client
         self.dry_run = dry_run
 
-    def cleanup(self, days_old):
+    def cleanup(self, days_old, vacuum: bool = False):
         logging.info("Cleaning up notifications older than %s days", days_old)
 
         with self.dataverse_client.database() as database:
@@ -30,6 +54,51 @@ class Notifications:
 
             amount_deleted = database.update(delete_statement, (notifications_older_than,))
             logging.info("Deleted %s notifications", amount_deleted)
+            if vacuum:
+                self.vacuum(database)
+
+    def cleanup_in_batches(self, days_old, batch_size=10000, pause=1.0, vacuum: bool = False):
+        """ Deletes the notifications older than days_old in batches of at most batch_size, in order of id, each in
+        its own transaction and with a pause in between, so that locks are held briefly and autovacuum can keep up.
+
+        The batch that is running when the cleanup is interrupted is rolled back, and all batches before it stay
+        deleted. Running the cleanup again continues with the remaining notifications.
+        """
+        logging.info("Cleaning up notifications older than %s days in batches of %s", days_old, batch_size)
 
+        with self.dataverse_client.database() as database:
+            notifications_older_than = timedelta(days=days_old)
+            [(total, cutoff)] = database.query(count_statement, (notifications_older_than, notifications_older_than))
+            logging.info("Found %s notifications sent before %s", total, cutoff)
+            if self.dry_run:
+                logging.info(f"dry-run, not deleting {total} notifications in batches of {batch_size}")
+                return
 
+            deleted = 0
+            last_id = 0
+            start = time.monotonic()
+            try:
+                while True:
+                    # The statements of every batch are the same, so they are prepared on the server once
+                    [(batch_end,)] = database.query(next_batch_end_statement, (cutoff, last_id, batch_size),
+                                                    prepare=True)
+                    if batch_end is None:
+                        break
+                    deleted += database.update(delete_batch_statement, (cutoff, last_id, batch_end), prepare=True)
+                    last_id = batch_end
+                    elapsed = time.monotonic() - start
+                    logging.info("Deleted %s of %s notifications (%.0f%%), %.0f rows/s", deleted, total,
+                                 100 * deleted / total if total > 0 else 100, deleted / elapsed if elapsed > 0 else 0)
+                    time.sleep(pause)
+            except KeyboardInterrupt:
+                logging.warning("Interrupted after deleting %s notifications; run again to delete the rest", deleted)
+                raise
+            logging.info("Deleted %s notifications in %.1f seconds", deleted, time.monotonic() - start)
+            if vacuum:
+                self.vacuum(database)
 
+    def vacuum(self, database: Database):
+        logging.info("Vacuuming and analyzing usernotification")
+        start = time.monotonic()
+        database.execute_outside_transaction("VACUUM (ANALYZE) usernotification")
+        logging.info("Vacuumed usernotification in %.1f seconds", time.monotonic() - start)
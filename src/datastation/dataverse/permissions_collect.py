@@ -1,4 +1,6 @@
-from datastation.common.result_writer import CsvResultWriter, YamlResultWriter, JsonResultWriter
+from datastation.common.result_writer import CsvResultWriter, YamlResultWriter, JsonResultWriter, \
+    JsonLinesResultWriter, ParquetResultWriter
+from datastation.common.compression import open_output
 from datastation.dataverse.dataverse_client import DataverseClient
 import logging
 import re
@@ -6,16 +8,52 @@ import csv
 import sys
 import json
 import rich
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
+# The queries for the database backend. Each returns the dvobject id of the dataverse followed by the fields of one
+# group, role or assignment, in the format of the corresponding API response.
+groups_query = """
+    select g.owner_id,
+           concat('&explicit/', g.groupalias),
+           (select count(*) from explicitgroup_authenticateduser u where u.explicitgroup_id = g.id)
+           + (select count(*) from explicitgroup_containedroleassignees c where c.explicitgroup_id = g.id)
+           + (select count(*) from explicitgroup_explicitgroup e where e.explicitgroup_id = g.id)
+    from explicitgroup g
+    order by g.owner_id, g.id
+"""
+
+roles_query = """
+    select r.owner_id, r.alias, r.permissionbits
+    from dataverserole r
+    where r.owner_id is not null
+    order by r.owner_id, r.id
+"""
+
+assignments_query = """
+    select ra.definitionpoint_id, ra.assigneeidentifier, r.alias
+    from roleassignment ra
+    inner join dataverserole r on r.id = ra.role_id
+    inner join dvobject dvo on dvo.id = ra.definitionpoint_id
+    where dvo.dtype = 'Dataverse'
+    order by ra.definitionpoint_id, ra.id
+"""
+
 
 class PermissionsCollect:
 
-    def __init__(self, dataverse_client: DataverseClient, output_file, output_format, dry_run: bool = False):
+    def __init__(self, dataverse_client: DataverseClient, output_file, output_format, dry_run: bool = False,
+                 workers: int = 1, flush_interval: float = 1.0, compress: str = None, compression_level: int = None):
         self.dataverse_client = dataverse_client
         self.output_file = output_file
         self.output_format = output_format
         self.dry_run = dry_run
+        self.workers = workers
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self.compression_level = compression_level
+        self.database_info = None  # (groups, roles, assignments) by dataverse id, when read from the database
 
         self.writer = None
         self.is_first = True  # Would be nicer if the Writer does the bookkeeping
@@ -24,20 +62,42 @@ class PermissionsCollect:
     def create_result_writer(self, out_stream):
         logging.info(f'Writing output: {self.output_file}, with format : {self.output_format}')
         csv_columns = ['depth', 'parentalias', 'alias', 'name', 'id', 'vpath', 'groups', 'roles', 'assignments']
+        column_types = {'depth': 'int64', 'id': 'int64'}
         if self.output_format == 'csv':
             return CsvResultWriter(headers=csv_columns, out_stream=out_stream)
+        elif self.output_format == 'jsonl':
+            return JsonLinesResultWriter(out_stream, self.flush_interval)
+        elif self.output_format == 'parquet':
+            return ParquetResultWriter([(column, column_types.get(column, 'string')) for column in csv_columns],
+                                       out_stream)
         else:
             return JsonResultWriter(out_stream)
 
+    @staticmethod
+    def close_output(out_stream):
+        if out_stream is sys.stdout or out_stream is getattr(sys.stdout, 'buffer', None):
+            out_stream.flush()
+        else:
+            out_stream.close()
+
     def write_result_row(self, row):
         self.writer.write(row, self.is_first)
         self.is_first = False  # Only the first time it can be True
 
     def get_result_row(self, parent_alias, child_alias, child_name, id, vpath, depth):
+        if self.database_info is not None:
+            groups, roles, assignments = self.database_info
+            return self.create_result_row(parent_alias, child_alias, child_name, id, vpath, depth, groups.get(id, ''),
+                                          roles.get(id, ''), assignments.get(id, ''))
         logging.info(f'Retrieving permission info for dataverse: {parent_alias} / {child_alias} ...')
         group_info = self.get_group_info(child_alias)
         role_info = self.get_role_info(child_alias)
         assignment_info = self.get_assignment_info(child_alias)
+        return self.create_result_row(parent_alias, child_alias, child_name, id, vpath, depth, group_info, role_info,
+                                      assignment_info)
+
+    def create_result_row(self, parent_alias, child_alias, child_name, id, vpath, depth, group_info, role_info,
+                          assignment_info):
         row = {'depth': depth, 'parentalias': parent_alias, 'alias': child_alias, 'name': child_name,
                'id': id, 'vpath': vpath, 'groups': group_info, 'roles': role_info, 'assignments': assignment_info}
         return row
@@ -69,17 +129,68 @@ class PermissionsCollect:
             result_list.append(assignment['assignee'] + ' (' + (assignment['_roleAlias']) + ')')
         return ', '.join(result_list)
 
-    def collect_permissions_info(self, tree_data, parent_vpath, parent_alias, depth=1):
+    # Traverses the tree and yields the arguments for the result row of each dataverse, in vpath order.
+    def iter_dataverses(self, tree_data, parent_vpath, parent_alias, depth=1):
         alias = tree_data['alias']
         name = tree_data['name']
         id = tree_data['id']
         vpath = parent_vpath + self.vpath_delimiter + alias
-        row = self.get_result_row(parent_alias, alias, name, id, vpath, depth)
-        self.write_result_row(row)
+        yield parent_alias, alias, name, id, vpath, depth
         # only direct descendants (children)
         if 'children' in tree_data:
             for child_tree_data in tree_data['children']:
-                self.collect_permissions_info(child_tree_data, vpath, alias, depth + 1)  # recurse
+                yield from self.iter_dataverses(child_tree_data, vpath, alias, depth + 1)  # recurse
+
+    def collect_permissions_info(self, tree_data, parent_vpath, parent_alias, depth=1):
+        dataverses = self.iter_dataverses(tree_data, parent_vpath, parent_alias, depth)
+        if self.workers > 1 and self.database_info is None:
+            self.collect_permissions_info_concurrently(dataverses)
+        else:
+            for row_args in dataverses:
+                self.write_result_row(self.get_result_row(*row_args))
+
+    # The three requests for each dataverse are sent by a pool of workers, for a few dataverses per worker ahead, but
+    # rows are written in the order in which the dataverses are yielded.
+    def collect_permissions_info_concurrently(self, dataverses):
+        logging.info(f'Collecting permission info with {self.workers} workers')
+        max_pending = self.workers * 2
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='permissions')
+        try:
+            for row_args in dataverses:
+                alias = row_args[1]
+                logging.info(f'Retrieving permission info for dataverse: {row_args[0]} / {alias} ...')
+                futures = [executor.submit(get_info, alias)
+                           for get_info in (self.get_group_info, self.get_role_info, self.get_assignment_info)]
+                pending.append((row_args, futures))
+                if len(pending) >= max_pending:
+                    self.write_pending_row(pending.popleft())
+            while len(pending) > 0:
+                self.write_pending_row(pending.popleft())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def write_pending_row(self, pending_row):
+        row_args, futures = pending_row
+        self.write_result_row(self.create_result_row(*row_args, *[future.result() for future in futures]))
+
+    # Reads the groups, roles and assignments of all dataverses from the database, with one query each, and returns
+    # them as dictionaries from dataverse id to the same text as get_group_info, get_role_info and get_assignment_info.
+    def read_database_info(self):
+        logging.info('Retrieving the permission info of all dataverses from the database ...')
+        groups = {}
+        roles = {}
+        assignments = {}
+        with self.dataverse_client.database() as database:
+            for dataverse_id, identifier, nr_of_assignees in database.stream_query(groups_query):
+                groups.setdefault(dataverse_id, []).append(f'{identifier} ({nr_of_assignees})')
+            for dataverse_id, alias, permission_bits in database.stream_query(roles_query):
+                # each permission is one bit
+                roles.setdefault(dataverse_id, []).append(f'{alias} ({bin(permission_bits).count("1")})')
+            for dataverse_id, assignee, role_alias in database.stream_query(assignments_query):
+                assignments.setdefault(dataverse_id, []).append(f'{assignee} ({role_alias})')
+        return tuple({dataverse_id: ', '.join(items) for dataverse_id, items in info.items()}
+                     for info in (groups, roles, assignments))
 
     def find_child(self, parent, alias):
         result = None
@@ -89,14 +200,14 @@ class PermissionsCollect:
                 break
         return result
 
-    def collect_permissions_info_overview(self, selected_dataverse=None):
-        out_stream = sys.stdout
-        if self.output_file != '-':
-            try:
-                out_stream = open(self.output_file, "w")
-            except:
-                logging.error(f"Could not open file: {self.output_file}")
-                raise
+    def collect_permissions_info_overview(self, selected_dataverse=None, from_database: bool = False):
+        is_binary = self.output_format == 'parquet'
+        try:
+            out_stream = open_output(self.output_file, "wb" if is_binary else "w", self.compress,
+                                     self.compression_level)
+        except:
+            logging.error(f"Could not open file: {self.output_file}")
+            raise
 
         self.writer = self.create_result_writer(out_stream)
 
@@ -108,6 +219,8 @@ class PermissionsCollect:
         vpath = alias
         logging.info(f'Extracted the tree for the toplevel dataverse: {name} ({alias})')
         logging.info("Retrieving the info for this dataverse instance...")
+        if from_database:
+            self.database_info = self.read_database_info()
 
         if selected_dataverse is None:
             # do whole tree
@@ -126,4 +239,6 @@ class PermissionsCollect:
                 logging.error(f"Could not find the selected dataverse: {selected_dataverse}")
 
         self.writer.close()
+        self.close_output(out_stream)
         self.is_first = True
+        self.database_info = None
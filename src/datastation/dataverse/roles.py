@@ -1,3 +1,4 @@
+import logging
 from datetime import datetime
 
 import rich
@@ -22,10 +23,9 @@ class DataverseRole:
         role = role_assignment.split('=')[1]
         action = "None"
         if self.in_current_assignments(assignee, role, dataverse_api):
-            print("{} is already {} for dataset {}".format(assignee, role, dataverse_api.get_alias()))
+            logging.info("{} is already {} for dataset {}".format(assignee, role, dataverse_api.get_alias()))
         else:
-            print(
-                "Adding {} as {} for dataset {}".format(assignee, role, dataverse_api.get_alias()))
+            logging.info("Adding {} as {} for dataset {}".format(assignee, role, dataverse_api.get_alias()))
             dataverse_api.add_role_assignment(assignee, role, dry_run=self.dry_run)
             action = "Added"
         csv_report.write(
@@ -48,7 +48,7 @@ class DataverseRole:
         role = role_assignment.split('=')[1]
         action = "None"
         if self.in_current_assignments(assignee, role, dataverse_api):
-            print("Removing {} as {} for dataverse {}".format(assignee, role, dataverse_api.get_alias()))
+            logging.info("Removing {} as {} for dataverse {}".format(assignee, role, dataverse_api.get_alias()))
             all_assignments = dataverse_api.get_role_assignments()
             for assignment in all_assignments:
                 if assignment.get('assignee') == assignee and assignment.get('_roleAlias') == role:
@@ -56,7 +56,7 @@ class DataverseRole:
                     action = "Removed"
                     break
         else:
-            print("{} is not {} for dataverse {}".format(assignee, role, dataverse_api.get_alias()))
+            logging.info("{} is not {} for dataverse {}".format(assignee, role, dataverse_api.get_alias()))
         csv_report.write(
             {'alias': dataverse_api.get_alias(), 'Modified': datetime.now(), 'Assignee': assignee, 'Role': role,
              'Change': action})
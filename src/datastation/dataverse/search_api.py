@@ -1,17 +1,25 @@
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
 from datastation.common.utils import print_dry_run_message, raise_for_status_after_log
 
+# The search API returns at most 1000 rows per page
+DEFAULT_PER_PAGE = 1000
+
 
 class SearchApi:
 
-    def __init__(self, server_url, api_token):
+    def __init__(self, server_url, api_token, session: requests.Session = None):
         self.url = f"{server_url}/api/search"
         self.api_token = api_token
+        self.session = session if session is not None else requests.Session()
 
-    def search(self, query="*", subtree="root", object_type="dataset", dry_run=False, rows=0, start=0):
+    def search(self, query="*", subtree="root", object_type="dataset", dry_run=False, rows=0, start=0,
+               per_page=DEFAULT_PER_PAGE, prefetch=0, filter_queries=None, sort=None, order=None, fields=None,
+               show_entity_ids=False):
         """
         Do a query via the public search API, only published datasets
         using the public search 'API', so no token needed
@@ -25,7 +33,18 @@ class SearchApi:
         :param dry_run: Do not perform the action, but show what would be done.
         :param start: The cursor (zero based result index) indicating where the result page starts
         :param rows: The number of results returned in the 'page'
-                     if zero: 25 rows at a time are read until no more rows are found
+                     if zero: per_page rows at a time are read until no more rows are found
+        :param per_page: The number of rows per page if rows is zero (the API allows up to 1000)
+        :param prefetch: The number of pages to fetch concurrently ahead of the page being consumed.
+                         The number of pages is taken from the total_count of the first page.
+                         If zero, the next page is only fetched when the previous one is consumed.
+        :param filter_queries: A list of filter queries (fq), e.g. ['dateSort:[2023-01-01T00:00:00Z TO *]'],
+                               that restrict the results without affecting the relevance ranking
+        :param sort: The field to sort on, e.g. 'name' or 'date'
+        :param order: The sort order, 'asc' or 'desc'
+        :param fields: If given, each item is trimmed down to these keys as soon as its page is parsed,
+                       e.g. ['global_id'] to only keep the PIDs
+        :param show_entity_ids: Include the database id of each item as entity_id
         :return: The search results in a list of dictionaries.
                  Make sure the result is not transformed to an array before feeding it to a batch processor,
                  otherwise all pages are read before processing starts. In other words:
@@ -33,9 +52,7 @@ class SearchApi:
                  but: map(lambda rec: rec['global_id'], dataverse_client.search_api().search())
         """
 
-        if rows == 0:
-            per_page = 25
-        else:
+        if rows != 0:
             per_page = rows
 
         params = {
@@ -45,6 +62,14 @@ class SearchApi:
             "per_page": str(per_page),
             "start": str(start),
         }
+        if filter_queries:
+            params["fq"] = list(filter_queries)
+        if sort is not None:
+            params["sort"] = sort
+        if order is not None:
+            params["order"] = order
+        if show_entity_ids:
+            params["show_entity_ids"] = "true"
 
         headers = {"X-Dataverse-key": self.api_token}
 
@@ -52,20 +77,64 @@ class SearchApi:
             print_dry_run_message(method="GET", url=self.url, headers=headers, params=params)
             return None
 
+        data = self._get_page(params, headers, start, fields)
+        items = data["items"]
+        yield from items
+        if len(items) < per_page or rows != 0:
+            return
+        start += per_page
+
+        if prefetch > 0:
+            start = yield from self._prefetch_pages(params, headers, range(start, data["total_count"], per_page),
+                                                    prefetch, fields)
+            if start is None:
+                return
+            # The last page was full, so rows were added since the first page was read; continue page by page
+
         while True:
-            dv_resp = requests.get(self.url, headers=headers, params=params)
-            raise_for_status_after_log(dv_resp)
+            items = self._get_page(params, headers, start, fields)["items"]
+            yield from items
+            if len(items) < per_page:
+                break
+            start += per_page
 
-            data = dv_resp.json()["data"]
-            items = data["items"]
-            logging.debug(f"{len(items)} items, {params}")
+    def _get_page(self, params, headers, start, fields=None):
+        page_params = {**params, "start": str(start)}
+        dv_resp = self.session.get(self.url, headers=headers, params=page_params)
+        raise_for_status_after_log(dv_resp)
 
-            for item in items:
-                logging.debug(f"ITEM: {item}")
-                yield item
+        data = dv_resp.json()["data"]
+        logging.debug(f"{len(data['items'])} items, {page_params}")
+        if fields is not None:
+            data["items"] = [{field: item[field] for field in fields if field in item} for item in data["items"]]
+        return data
 
-            if len(items) < per_page or rows != 0:
-                break
+    def _prefetch_pages(self, params, headers, starts: range, prefetch, fields):
+        """ Yields the items of the pages at starts in order, keeping at most prefetch pages in flight.
 
-            start += per_page
-            params["start"] = str(start)
+        Returns:
+            the start of the page after the last one, or None if the last page was not full
+        """
+        pages = iter(starts)
+        next_start = starts.start
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix='search-prefetch')
+        try:
+            for page_start in pages:
+                pending.append((page_start, executor.submit(self._get_page, params, headers, page_start, fields)))
+                if len(pending) >= prefetch:
+                    break
+            while len(pending) > 0:
+                page_start, future = pending.popleft()
+                items = future.result()["items"]
+                following_start = next(pages, None)
+                if following_start is not None:
+                    future = executor.submit(self._get_page, params, headers, following_start, fields)
+                    pending.append((following_start, future))
+                yield from items
+                if len(items) < starts.step:
+                    return None
+                next_start = page_start + starts.step
+            return next_start
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
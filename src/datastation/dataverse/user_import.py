@@ -1,45 +1,135 @@
-from datastation.common.csv import CsvInput
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from datastation.common.csv import CsvInput, open_report
 from datastation.common.database import Database
 from datastation.dataverse.builtin_users import User
 from datastation.dataverse.dataverse_client import DataverseClient
 
+CREATED = 'CREATED'
+SKIPPED = 'SKIPPED'
+FAILED = 'FAILED'
+
+# The passwords of a batch of created users are copied into this temporary table, and then set with a single update
+imported_password_table = "imported_password"
+imported_password_columns = "username text primary key, encryptedpassword text, passwordencryptionversion integer"
+update_imported_passwords_statement = f"""
+    UPDATE builtinuser
+    SET encryptedpassword = p.encryptedpassword, passwordencryptionversion = p.passwordencryptionversion
+    FROM {imported_password_table} p
+    WHERE builtinuser.username = p.username
+"""
+
 
-def update_password(database, user, encryption_version=1, dry_run=False):
-    update_statement = f"UPDATE builtinuser SET encryptedpassword = '{user.encrypted_password}', passwordencryptionversion = {encryption_version} WHERE username = '{user.username}';"
+def update_passwords(database, users, encryption_version=1, dry_run=False):
+    """ Sets the passwords of the users with one update statement, and returns the number of updated users. """
     if dry_run:
-        print(f"dry-run, not updating database with {update_statement}")
-    else:
-        database.update(update_statement)
+        print(f"dry-run, not updating the passwords with {update_imported_passwords_statement}")
+        return 0
+    return database.update_from_rows(update_imported_passwords_statement, imported_password_table,
+                                     imported_password_columns,
+                                     ((user.username, user.encrypted_password, encryption_version) for user in users))
 
 
 class UserImport:
     """Imports users from a CSV file into a Dataverse instance. The CSV file can be exported from EASY or manually
-    created. The Dataverse instance must have the BuiltinUsers.KEY set. """
+    created. The Dataverse instance must have the BuiltinUsers.KEY set.
+
+    The users are created through the API, by several workers at the same time if so configured. The passwords of the
+    created users are set in the database in batches of the configured commit_batch_size while the users are created,
+    and for the last batch when the import stops, also after an error. A user that is created is thus never left with
+    the password of the API, which a rerun would not set, as it skips the users that already exist. """
 
     def __init__(self, dataverse_client: DataverseClient, is_easy_format: bool,
-                 builtin_users_key: str, dry_run: bool = False):
+                 builtin_users_key: str, dry_run: bool = False, workers: int = 1):
         self.dataverse_client = dataverse_client
         self.is_easy_format = is_easy_format
         self.builtin_users_key = builtin_users_key
         self.dry_run = dry_run
+        self.workers = workers
 
-    def import_users(self, csv_file):
-        with Database(self.dataverse_client.db_config) as database:
-            with UserCsv(csv_file, is_easy_format=self.is_easy_format) as userCsv:
-                for user in userCsv:
-                    self.import_user(user, self.builtin_users_key, database)
+    def import_users(self, csv_file, report_file='-', commit_batch_size=None):
+        """ Creates the users, sets the passwords of the created ones in the database, and writes the outcome per user
+        to the report. Returns the number of users per outcome (CREATED, SKIPPED and FAILED).
 
-    def import_user(self, user, builtin_users_key, database, dry_run=False):
-        r = self.dataverse_client.built_in_users(builtin_users_key=builtin_users_key).create(user,
-                                                                                             send_email_notification=False,
-                                                                                             dry_run=self.dry_run)
-        if r is None:
+        Args:
+            commit_batch_size: the number of passwords set per transaction (default: the configured commit_batch_size)
+        """
+        encryption_version = 0 if self.is_easy_format else 1
+        counts = {CREATED: 0, SKIPPED: 0, FAILED: 0}
+        created_users = []
+        with (nullcontext() if self.dry_run else Database(self.dataverse_client.db_config)) as database, \
+                UserCsv(csv_file, is_easy_format=self.is_easy_format) as user_csv, \
+                open_report(report_file, ['Username', 'Status', 'Message']) as report:
+            try:
+                for user, status, message in self.create_users(user_csv):
+                    if status is None:
+                        continue  # dry run
+                    counts[status] += 1
+                    report.write({'Username': user.username, 'Status': status, 'Message': message})
+                    if status == CREATED:
+                        created_users.append(user)
+                        if len(created_users) >= (commit_batch_size or database.commit_batch_size):
+                            self.set_passwords(database, created_users, encryption_version)
+            finally:
+                self.set_passwords(database, created_users, encryption_version)
+        logging.info(f"Created {counts[CREATED]} users, skipped {counts[SKIPPED]}, failed {counts[FAILED]}")
+        return counts
+
+    def set_passwords(self, database, users, encryption_version):
+        """ Sets the passwords of the users in the database, and empties the list of users. """
+        if self.dry_run:
+            update_passwords(None, users, encryption_version, dry_run=True)
+        elif len(users) > 0:
+            updated = update_passwords(database, users, encryption_version)
+            logging.info(f"Updated the password of {updated} users")
+        users.clear()
+
+    def create_users(self, users):
+        """ Yields (user, status, message) for each user, in the order of the users. With more than one worker the users
+        are created concurrently, with a few more requests in flight than workers to keep them busy. """
+        if self.workers == 1:
+            for user in users:
+                yield self.import_user(user, self.builtin_users_key)
             return
+        max_pending = self.workers * 2
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='user-import') as executor:
+            for user in users:
+                pending.append(executor.submit(self.import_user, user, self.builtin_users_key))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while len(pending) > 0:
+                yield pending.popleft().result()
+
+    def import_user(self, user, builtin_users_key):
+        """ Creates the user, and returns (user, status, message); the status is None in a dry run. """
+        try:
+            r = self.dataverse_client.built_in_users(builtin_users_key=builtin_users_key).create(
+                user, send_email_notification=False, dry_run=self.dry_run)
+        except Exception as e:
+            logging.error(f"Error creating user {user.username}: {e}")
+            return user, FAILED, str(e)
+        if r is None:
+            return user, None, None
         if r.status_code == 200:
-            update_password(database, user, 0 if self.is_easy_format else 1, dry_run)
-            print(f"Imported user {user.username}")
-        else:
-            print(f"Error creating user {user}: {r.status_code} {r.json()['message']}")
+            logging.info(f"Imported user {user.username}")
+            return user, CREATED, ''
+        message = get_error_message(r)
+        if 'already exists' in message.lower():
+            logging.info(f"Skipping user {user.username}: {message}")
+            return user, SKIPPED, message
+        logging.error(f"Error creating user {user}: {r.status_code} {message}")
+        return user, FAILED, f"{r.status_code} {message}"
+
+
+def get_error_message(response):
+    try:
+        return response.json()['message']
+    except (ValueError, KeyError, TypeError):
+        return response.reason or ''
 
 
 class UserCsv(CsvInput):
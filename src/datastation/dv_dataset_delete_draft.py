@@ -1,9 +1,10 @@
 import argparse
+import logging
 from datetime import datetime
 
 from datastation.common.batch_processing import BatchProcessor, get_pids, BatchProcessorWithReport
 from datastation.common.config import init
-from datastation.common.utils import add_batch_processor_args, add_dry_run_arg
+from datastation.common.utils import add_batch_processor_args, check_batch_processor_args, add_dry_run_arg
 from datastation.dataverse.dataverse_client import DataverseClient
 
 
@@ -19,11 +20,11 @@ def delete_dataset_drafts(args, dataverse_client: DataverseClient, batch_process
 def delete_dataset_draft(pid, dataset_api, csv_report, dry_run: bool):
     action = "None"
     if dataset_api.is_draft():
-        print("Deleting dataset draft {}".format(pid))
+        logging.info("Deleting dataset draft {}".format(pid))
         dataset_api.delete_draft(dry_run=dry_run)
         action = "Deleted"
     else:
-        print("Dataset {} is not a draft".format(pid))
+        logging.info("Dataset {} is not a draft".format(pid))
     csv_report.write({'DOI': pid, 'Modified': datetime.now(), 'Change': action})
 
 
@@ -32,12 +33,15 @@ def main():
 
     parser = argparse.ArgumentParser(description='Deletes one or more dataset drafts')
     parser.add_argument('pid_or_pid_file', help='The pid or file with pids of the datasets to delete')
-    add_batch_processor_args(parser)
+    add_batch_processor_args(parser, config=config)
     add_dry_run_arg(parser)
     args = parser.parse_args()
+    check_batch_processor_args(parser, args)
 
     dataverse_client = DataverseClient(config['dataverse'])
-    batch_processor = BatchProcessorWithReport(wait=args.wait, report_file=args.report_file)
+    batch_processor = BatchProcessorWithReport(wait=args.wait, report_file=args.report_file,
+                                               workers=args.workers,
+                                               journal_file=args.journal_file, resume=args.resume, dry_run=args.dry_run)
     delete_dataset_drafts(args, dataverse_client, batch_processor)
 
 
@@ -1,9 +1,10 @@
 import argparse
+import logging
 from datetime import datetime
 
 from datastation.common.batch_processing import BatchProcessor, get_pids, BatchProcessorWithReport
 from datastation.common.config import init
-from datastation.common.utils import add_batch_processor_args, add_dry_run_arg
+from datastation.common.utils import add_batch_processor_args, check_batch_processor_args, add_dry_run_arg
 from datastation.dataverse.dataverse_client import DataverseClient
 
 
@@ -17,7 +18,7 @@ def destroy_datasets(args, dataverse_client: DataverseClient, batch_processor: B
 
 
 def destroy_dataset(pid, dataset_api, csv_report, dry_run: bool):
-    print("Destroying dataset {}".format(pid))
+    logging.info("Destroying dataset {}".format(pid))
     dataset_api.destroy(dry_run=dry_run)
     action = "Destroyed"
     csv_report.write({'DOI': pid, 'Modified': datetime.now(), 'Change': action})
@@ -30,12 +31,15 @@ def main():
         description='Deletes one or more, potentially published, datasets. Requires an API token with superuser '
                     'privileges. Furthermore, the dataverse.safety_latch must be set to OFF.')
     parser.add_argument('pid_or_pid_file', help='The pid or file with pids of the datasets to destroy')
-    add_batch_processor_args(parser)
+    add_batch_processor_args(parser, config=config)
     add_dry_run_arg(parser)
     args = parser.parse_args()
+    check_batch_processor_args(parser, args)
 
     dataverse_client = DataverseClient(config['dataverse'])
-    batch_processor = BatchProcessorWithReport(wait=args.wait, report_file=args.report_file)
+    batch_processor = BatchProcessorWithReport(wait=args.wait, report_file=args.report_file,
+                                               workers=args.workers,
+                                               journal_file=args.journal_file, resume=args.resume, dry_run=args.dry_run)
     destroy_datasets(args, dataverse_client, batch_processor, dry_run=args.dry_run)
 
 
@@ -2,7 +2,7 @@ import argparse
 
 from datastation.common.batch_processing import get_pids, BatchProcessorWithReport
 from datastation.common.config import init
-from datastation.common.utils import add_batch_processor_args, add_dry_run_arg
+from datastation.common.utils import add_batch_processor_args, check_batch_processor_args, add_dry_run_arg
 from datastation.dataverse.dataverse_client import DataverseClient
 from datastation.dataverse.destroy_placeholder_dataset import destroy_placeholder_dataset
 
@@ -17,12 +17,14 @@ def main():
                     'the description of the dataset must match the pattern configured in '
                     'migration_placeholders.description_text_pattern. Note, that the safety latch must also be OFF.')
     parser.add_argument('pid_or_pids_file', help='The pid of the dataset to destroy, or a file with a list of pids')
-    add_batch_processor_args(parser)
+    add_batch_processor_args(parser, config=config)
     add_dry_run_arg(parser)
     args = parser.parse_args()
+    check_batch_processor_args(parser, args)
 
     batch_processor = BatchProcessorWithReport(wait=args.wait, report_file=args.report_file,
-                                               headers=['PID', 'Destroyed', 'Messages'])
+                                               headers=['PID', 'Destroyed', 'Messages'], workers=args.workers,
+                                               journal_file=args.journal_file, resume=args.resume, dry_run=args.dry_run)
     pids = get_pids(args.pid_or_pids_file)
     description_text_pattern = config['migration_placeholders']['description_text_pattern']
     batch_processor.process_pids(pids,
@@ -4,7 +4,7 @@ from os.path import expanduser, isfile
 
 from datastation.common.batch_processing import BatchProcessor
 from datastation.common.config import init
-from datastation.common.utils import add_batch_processor_args, add_dry_run_arg
+from datastation.common.utils import add_batch_processor_args, check_batch_processor_args, add_dry_run_arg
 from datastation.dataverse.datasets import Datasets
 from datastation.dataverse.dataverse_client import DataverseClient
 
@@ -32,14 +32,17 @@ def main():
                              "An attempt to update a protected field will result in '403 Client Error: Forbidden'. "
                              "You may also get a 403 when updating author details without updating the authorName. "
                              "The server logs will show the details of the error. ")
-    add_batch_processor_args(parser, report=False)
+    add_batch_processor_args(parser, report=False, config=config)
     add_dry_run_arg(parser)
     args = parser.parse_args()
+    check_batch_processor_args(parser, args)
 
     def run(obj_list):
         client = DataverseClient(config['dataverse'])
         datasets = Datasets(client, dry_run=args.dry_run)
-        batch_processor = BatchProcessor(wait=args.wait, fail_on_first_error=args.fail_fast)
+        batch_processor = BatchProcessor(wait=args.wait, fail_on_first_error=args.fail_fast,
+                                         workers=args.workers,
+                                         journal_file=args.journal_file, resume=args.resume, dry_run=args.dry_run)
         batch_processor.process_entries(obj_list, lambda obj: datasets.update_metadata(data=obj, replace=args.replace))
 
     def parse_value_args():
@@ -5,20 +5,23 @@ from datastation.common.config import init
 from datastation.dataverse.dataverse_client import DataverseClient
 
 
+find_datasets_by_role_assignment_query = \
+    "select concat(dvo.protocol, ':', dvo.authority, '/', dvo.identifier) " \
+    "from roleassignment ra inner join dataverserole dr on ra.role_id=dr.id " \
+    "inner join dvobject dvo on definitionpoint_id=dvo.id " \
+    "where dtype='Dataset' and assigneeidentifier=%s and alias=%s"
+
+
 def find_datasets_by_role_assignment(database, role_assignment):
     [role_assignee, role_alias] = role_assignment.split('=')
     logging.debug(f"role_assignee={role_assignee}, role_alias={role_alias}")
-    select_statement = \
-        f"select concat(dvo.protocol, ':', dvo.authority, '/', dvo.identifier) " \
-        f"from roleassignment ra inner join dataverserole dr on ra.role_id=dr.id " \
-        f"inner join dvobject dvo on definitionpoint_id=dvo.id " \
-        f"where dtype='Dataset' and assigneeidentifier='{role_assignee}' and alias='{role_alias}'"
-    logging.debug(f"select_statement={select_statement}")
-    result = database.query(select_statement)
-    if len(result) == 0:
-        print(f"No datasets for user {role_assignee} with role {role_alias}")
-    for r in result:
+    # The result can be large, so it is streamed and printed as it comes in
+    count = 0
+    for r in database.stream_query(find_datasets_by_role_assignment_query, (role_assignee, role_alias)):
         print(r[0])
+        count += 1
+    if count == 0:
+        print(f"No datasets for user {role_assignee} with role {role_alias}")
 
 
 def main():
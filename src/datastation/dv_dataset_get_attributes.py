@@ -3,7 +3,8 @@ import json
 
 from datastation.common.batch_processing import get_entries, BatchProcessor
 from datastation.common.config import init
-from datastation.common.utils import add_batch_processor_args, add_dry_run_arg
+from datastation.common.utils import add_batch_processor_args, check_batch_processor_args, add_dry_run_arg, \
+    print_synchronized
 from datastation.dataverse.datasets import Datasets
 from datastation.dataverse.dataverse_client import DataverseClient
 
@@ -24,11 +25,14 @@ def main():
                        help="The dataset pid, or a file with a list of pids", )
     group.add_argument("--all", dest="all_datasets", action="store_true", required=False,
                        help="All datasets in the dataverse", )
+    parser.add_argument("--prefetch-pages", dest="prefetch_pages", type=int, default=2,
+                        help="With --all, the number of search result pages to fetch ahead (default: 2)")
 
-    add_batch_processor_args(parser, report=False)
+    add_batch_processor_args(parser, report=False, config=config)
     add_dry_run_arg(parser)
 
     args = parser.parse_args()
+    check_batch_processor_args(parser, args)
 
     attribute_options = {
         'storage': args.storage,
@@ -41,13 +45,16 @@ def main():
 
     datasets = Datasets(dataverse_client, dry_run=args.dry_run)
     if args.all_datasets:
-        search_result = dataverse_client.search_api().search(dry_run=args.dry_run)
+        search_result = dataverse_client.search_api().search(dry_run=args.dry_run, prefetch=args.prefetch_pages,
+                                                             fields=['global_id'])
         pids = map(lambda rec: rec['global_id'], search_result)  # lazy iterator
     else:
         pids = get_entries(args.pid_or_pids_file)
-    BatchProcessor(wait=args.wait, fail_on_first_error=args.fail_fast).process_entries(
+    BatchProcessor(wait=args.wait, fail_on_first_error=args.fail_fast, workers=args.workers,
+                   journal_file=args.journal_file, resume=args.resume, dry_run=args.dry_run).process_entries(
         pids,
-        lambda pid: print(json.dumps(datasets.get_dataset_attributes(pid, **attribute_options), skipkeys=True)))
+        lambda pid: print_synchronized(json.dumps(datasets.get_dataset_attributes(pid, **attribute_options),
+                                                  skipkeys=True)))
 
 
 if __name__ == "__main__":
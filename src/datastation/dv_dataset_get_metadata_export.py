@@ -1,10 +1,16 @@
 import argparse
+import logging
 import os
 
 from datastation.common.batch_processing import BatchProcessor, get_pids
+from datastation.common.compression import get_suffix, open_output
 from datastation.common.config import init
-from datastation.common.utils import add_batch_processor_args, add_dry_run_arg
+from datastation.common.utils import add_batch_processor_args, check_batch_processor_args, add_compression_args, \
+    add_dry_run_arg, print_synchronized
 from datastation.dataverse.dataverse_client import DataverseClient
+from datastation.dataverse.export_archive import ExportArchive, previous_index_of, get_exported_since
+from datastation.dataverse.export_manifest import ExportManifest, SEARCH, DATABASE, now, \
+    find_pids_modified_in_database, find_pids_modified_in_search
 
 exporter_to_extension = {
     'dcterms': 'xml',
@@ -19,16 +25,113 @@ exporter_to_extension = {
 }
 
 
-def get_metadata_export(args, pid, dataverse):
+def get_metadata_export(args, pid, dataverse, out_stream=None, manifest: ExportManifest = None):
     result = dataverse.dataset(pid).get_metadata_export(dry_run=args.dry_run, exporter=args.exporter)
+    is_changed = True
+    if manifest is not None and result is not None:
+        is_changed = manifest.record(pid, args.exporter, result)
     if args.output_dir:
-        if not os.path.exists(args.output_dir):
-            os.makedirs(args.output_dir)
         pid = pid.replace('/', '_')
-        with open(f'{args.output_dir}/{pid}.{exporter_to_extension[args.exporter]}', 'w') as f:
+        filename = f'{args.output_dir}/{pid}.{exporter_to_extension[args.exporter]}{get_suffix(args.compress)}'
+        if not is_changed and os.path.exists(filename):
+            return
+        with open_output(filename, 'w', args.compress, args.compression_level) as f:
             f.write(result)
     else:
-        print(result)
+        # With several workers the exports of different datasets must not interleave
+        print_synchronized(result, out_stream)
+
+
+def add_metadata_export_to_archive(args, pid, dataverse, archive: ExportArchive, manifest: ExportManifest = None,
+                                   modified_pids=None):
+    if modified_pids is not None and pid not in modified_pids and not args.dry_run and archive.keep(pid):
+        return
+    result = dataverse.dataset(pid).get_metadata_export(dry_run=args.dry_run, exporter=args.exporter)
+    if result is not None:
+        archive.add(pid, result)
+        if manifest is not None:
+            manifest.record(pid, args.exporter, result)
+
+
+def find_pids_modified_since_previous_archive(dataverse, previous_index):
+    """ Returns the set of PIDs of the datasets modified since the run that wrote the previous index, according to
+    their modification time in the Dataverse database, or None if that run is not known, in which case every export
+    must be fetched. The date sort of the search API cannot be used for this, as it does not move on a minor release or
+    a metadata change. """
+    since = get_exported_since(previous_index)
+    if since is None:
+        return None
+    logging.info(f"Finding the datasets modified since the previous archive was exported, at {since}")
+    with dataverse.database() as database:
+        return set(find_pids_modified_in_database(database, since))
+
+
+def export_metadata(args, dataverse, batch_processor, pids, manifest: ExportManifest = None,
+                    unmodified_since=None):
+    """ Exports the metadata of the datasets, and returns whether all of them were exported. If unmodified_since is
+    given, the datasets that are not in pids were not modified since then according to the database; their exports in
+    the previous archive are then kept in the new one, if the previous archive found them current after that time. """
+    failed = []
+
+    def process(callback):
+        def process_pid(pid):
+            try:
+                callback(pid)
+            except Exception:
+                failed.append(pid)
+                raise
+
+        batch_processor.process_pids(pids, callback=process_pid)
+
+    if args.archive is not None:
+        started_at = now()
+        previous_index = previous_index_of(args.previous_archive)
+        modified_pids = None
+        if previous_index is not None and args.skip_unmodified:
+            modified_pids = find_pids_modified_since_previous_archive(dataverse, previous_index)
+        with ExportArchive(args.archive, args.exporter, exporter_to_extension[args.exporter], previous_index,
+                           args.compression_level, started_at) as archive:
+            process(lambda pid: add_metadata_export_to_archive(args, pid, dataverse, archive, manifest, modified_pids))
+            if previous_index is not None and unmodified_since is not None and not args.dry_run:
+                keep_unmodified_exports(archive, previous_index, unmodified_since, set(failed))
+    elif args.compress is not None and not args.output_dir:
+        with open_output('-', 'w', args.compress, args.compression_level) as out_stream:
+            process(lambda pid: get_metadata_export(args, pid, dataverse, out_stream, manifest))
+    else:
+        if args.output_dir and not os.path.exists(args.output_dir):
+            os.makedirs(args.output_dir)
+        process(lambda pid: get_metadata_export(args, pid, dataverse, manifest=manifest))
+    return len(failed) == 0
+
+
+def keep_unmodified_exports(archive: ExportArchive, previous_index, unmodified_since, failed_pids):
+    exported_since = get_exported_since(previous_index)
+    if exported_since is None or exported_since < unmodified_since:
+        logging.warning(f"The previous archive may predate modifications before {unmodified_since}; the index of the "
+                        f"new archive only has the exported datasets")
+        return
+    archive.keep_remaining(excluded=failed_pids)
+
+
+def export_changed_metadata(args, dataverse, batch_processor, manifest: ExportManifest):
+    """ Exports the metadata of the datasets that were modified since the start of the last complete run, and records
+    the start of this run as the new watermark if all of them were exported. """
+    started_at = now()
+    since = manifest.get_last_run(args.exporter)
+    logging.info(f"Exporting the datasets modified since {since or 'the beginning'}, found with the {args.changed}")
+    if args.changed == DATABASE:
+        with dataverse.database() as database:
+            is_complete = export_metadata(args, dataverse, batch_processor,
+                                          find_pids_modified_in_database(database, since), manifest,
+                                          unmodified_since=since)
+    else:
+        # The date sort of the search API does not tell which of the other datasets were not modified
+        is_complete = export_metadata(args, dataverse, batch_processor,
+                                      find_pids_modified_in_search(dataverse.search_api(), since), manifest)
+    if is_complete and not args.dry_run:
+        manifest.complete_run(args.exporter, started_at)
+    elif not is_complete:
+        logging.warning("Not all datasets were exported; the next run will try them again")
 
 
 def main():
@@ -39,8 +142,9 @@ def main():
                                                  'only supports getting metadata exports for the latest published '
                                                  'version of a dataset.')
 
-    parser.add_argument('pid_or_pids_file',
-                        help='the pid of the dataset to get the metadata export for, or a file with a list of pids')
+    parser.add_argument('pid_or_pids_file', nargs='?',
+                        help='the pid of the dataset to get the metadata export for, or a file with a list of pids; '
+                             'not needed with --changed')
     parser.add_argument('-e', '--exporter', default='dataverse_json',
                         help=f"the exporter to use (one of: {', '.join(exporter_to_extension.keys())}; "
                              f"default: dataverse_json)",
@@ -49,14 +153,57 @@ def main():
                                                    "stored. If not provided, the files will be dumped to stdout. If "
                                                    "the directory does not exist, it will be created.",
                         dest='output_dir')
-    add_batch_processor_args(parser)
+    parser.add_argument('-a', '--archive', dest='archive',
+                        help="write all exports to this single archive instead of a file per dataset: a tar file "
+                             "(.tar, .tar.gz or .tar.zst) or a JSON Lines file (.jsonl, .jsonl.gz or .jsonl.zst). An "
+                             "index with the offset of each export is written to <archive>.index.csv. Use --workers "
+                             "to fetch the exports concurrently")
+    parser.add_argument('--previous-archive', dest='previous_archive',
+                        help="the archive of a previous run; exports that are the same as in that archive are left "
+                             "out of the new one, and the index points at the archive that holds them")
+    parser.add_argument('--skip-unmodified', dest='skip_unmodified', action='store_true',
+                        help="with --previous-archive, do not fetch the exports of the datasets that were not modified "
+                             "since that run according to the Dataverse database (see the dataverse.db "
+                             "configuration); they are kept as in the previous archive")
+    parser.add_argument('-m', '--manifest', dest='manifest',
+                        help="a SQLite file in which the time and hash of every export are recorded. With "
+                             "--output-dir, the file of an export that has not changed is not written again")
+    parser.add_argument('--changed', dest='changed', choices=[SEARCH, DATABASE],
+                        help="instead of the given pids, export the datasets modified since the start of the last "
+                             "complete run recorded in the manifest (all datasets on the first run). They are found "
+                             "by the date sort of the search API, or by the modification time in the Dataverse "
+                             "database (see the dataverse.db configuration)")
+    add_compression_args(parser)
+    add_batch_processor_args(parser, config=config)
     add_dry_run_arg(parser)
 
     args = parser.parse_args()
-    batch_processor = BatchProcessor(wait=args.wait, fail_on_first_error=args.fail_fast)
-    pids = get_pids(args.pid_or_pids_file)
-    batch_processor.process_pids(pids,
-                                 callback=lambda pid: get_metadata_export(args, pid, dataverse))
+    check_batch_processor_args(parser, args)
+    if args.archive is not None and args.output_dir is not None:
+        parser.error("--archive and --output-dir cannot be combined")
+    if args.archive is not None and args.resume:
+        parser.error("--resume is not supported with --archive")
+    if args.previous_archive is not None and args.archive is None:
+        parser.error("--previous-archive needs --archive")
+    if args.skip_unmodified and args.previous_archive is None:
+        parser.error("--skip-unmodified needs --previous-archive")
+    if args.archive is not None and args.compress is not None:
+        parser.error("the compression of an archive follows from its suffix, e.g. exports.tar.zst")
+    if args.changed is not None and args.manifest is None:
+        parser.error("--changed needs --manifest")
+    if (args.changed is None) == (args.pid_or_pids_file is None):
+        parser.error("give either a pid or pids file, or --changed")
+    batch_processor = BatchProcessor(wait=args.wait, fail_on_first_error=args.fail_fast,
+                                     workers=args.workers,
+                                     journal_file=args.journal_file, resume=args.resume, dry_run=args.dry_run)
+    if args.manifest is None:
+        export_metadata(args, dataverse, batch_processor, get_pids(args.pid_or_pids_file))
+        return
+    with ExportManifest(os.path.expanduser(args.manifest)) as manifest:
+        if args.changed is not None:
+            export_changed_metadata(args, dataverse, batch_processor, manifest)
+        else:
+            export_metadata(args, dataverse, batch_processor, get_pids(args.pid_or_pids_file), manifest)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,69 @@
+import argparse
+import os
+
+from datastation.common.config import init
+from datastation.dataverse.dataverse_client import DataverseClient
+from datastation.inventory.inventory import Inventory
+
+default_inventory_file = '~/.dans-datastation-tools-inventory.db'
+
+
+def sync(args, dataverse_client: DataverseClient):
+    with Inventory(os.path.expanduser(args.inventory_file)) as inventory:
+        if args.source == 'database':
+            with dataverse_client.database() as database:
+                inventory.sync_from_database(database, full=args.full)
+        else:
+            inventory.sync_from_search(dataverse_client.search_api())
+
+
+def select(args):
+    with Inventory(os.path.expanduser(args.inventory_file)) as inventory:
+        for pid in inventory.select_pids(version_state=args.version_state, dataverse_alias=args.dataverse_alias,
+                                         min_storage_size=args.min_storage_size, modified_since=args.modified_since):
+            print(pid)
+
+
+def main():
+    config = init()
+    dataverse_client = DataverseClient(config['dataverse'])
+    inventory_config = config.get('inventory', {})
+
+    parser = argparse.ArgumentParser(description='Keep a local inventory of the datasets in Dataverse, and select '
+                                                 'dataset PIDs from it. The output of select can be used as the '
+                                                 'pids file of the other dv-dataset- commands.')
+    parser.add_argument('-i', '--inventory-file', dest='inventory_file',
+                        default=inventory_config.get('file', default_inventory_file),
+                        help=f"the SQLite file with the inventory (default: {default_inventory_file})")
+    parser.set_defaults(func=lambda _: parser.print_help())
+    subparsers = parser.add_subparsers()
+
+    parser_sync = subparsers.add_parser('sync', help="Update the inventory")
+    parser_sync.add_argument('-s', '--source', dest='source', choices=['search', 'database'], default='database',
+                             help="where to read the datasets from. From the database only the datasets modified "
+                                  "since the previous database sync are read; the search API is crawled in full, as "
+                                  "it has no modification time to filter on. Only the database includes storage sizes "
+                                  "(default: database)")
+    parser_sync.add_argument('--full', dest='full', action='store_true',
+                             help="with the database source, read all datasets, and remove the ones that no longer "
+                                  "exist")
+    parser_sync.set_defaults(func=lambda _: sync(_, dataverse_client))
+
+    parser_select = subparsers.add_parser('select', help="Print the PIDs of the datasets matching all the given "
+                                                         "criteria")
+    parser_select.add_argument('--state', dest='version_state', choices=['DRAFT', 'RELEASED', 'DEACCESSIONED'],
+                               help="the state of the latest version")
+    parser_select.add_argument('--collection', dest='dataverse_alias',
+                               help="the alias of the dataverse that directly contains the dataset")
+    parser_select.add_argument('--min-storage-size', dest='min_storage_size', type=int,
+                               help="the minimum total size of the files in bytes")
+    parser_select.add_argument('--modified-since', dest='modified_since',
+                               help="the minimum last modification time, in ISO 8601, e.g. 2024-01-31T00:00:00Z")
+    parser_select.set_defaults(func=lambda _: select(_))
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
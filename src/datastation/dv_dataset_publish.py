@@ -1,17 +1,19 @@
 import argparse
 import json
+import logging
 from datetime import datetime
 
 from datastation.common.batch_processing import BatchProcessorWithReport, get_pids
 from datastation.common.config import init
-from datastation.common.utils import add_batch_processor_args, add_dry_run_arg
+from datastation.common.utils import add_batch_processor_args, check_batch_processor_args, add_dry_run_arg
 from datastation.dataverse.dataverse_client import DataverseClient
 
 
 def publish_datasets(args, dataverse_client: DataverseClient):
     pids = get_pids(args.pid_or_pid_file)
     batch_processor = BatchProcessorWithReport(report_file=args.report_file, wait=args.wait,
-                                               fail_on_first_error=args.fail_fast,
+                                               fail_on_first_error=args.fail_fast, workers=args.workers,
+                                               journal_file=args.journal_file, resume=args.resume, dry_run=args.dry_run,
                                                headers=['DOI', 'Modified', 'Change', 'Messages'])
     batch_processor.process_pids(pids,
                                  lambda pid, csv_report: publish(pid, dataverse_client,
@@ -24,13 +26,13 @@ def publish(pid, dataverse_client: DataverseClient, update_type, csv_report, dry
     dataset_api = dataverse_client.dataset(pid)
     message = ''
     if dataset_api.is_draft():
-        print("Dataset {} is a draft. Publishing it.".format(pid))
+        logging.info("Dataset {} is a draft. Publishing it.".format(pid))
         r = dataset_api.publish(update_type=update_type, dry_run=dry_run)
         action = "Published"
         if r is not None:
             message = json.dumps(r['data'])
     else:
-        print(f"Dataset {pid} is not in draft state. Skipping it.")
+        logging.info(f"Dataset {pid} is not in draft state. Skipping it.")
         action = "None"
     csv_report.write({'DOI': pid, 'Modified': datetime.now(), 'Change': action, 'Messages': message})
 
@@ -47,10 +49,11 @@ def main():
     parser.add_argument('-u', '--update-type', dest='update_type',
                         help='whether to create a major, version or update the '
                              'current version (default: major)', choices=update_types, default='major')
-    add_batch_processor_args(parser)
+    add_batch_processor_args(parser, config=config)
     add_dry_run_arg(parser)
 
     args = parser.parse_args()
+    check_batch_processor_args(parser, args)
     publish_datasets(args, dataverse)
 
 
@@ -4,16 +4,19 @@ import json
 from requests import HTTPError
 
 from datastation.common.batch_processing import get_pids, BatchProcessorWithReport
+from datastation.common.checkpoint import FAILED
 from datastation.common.config import init
 from datastation.common.csv import CsvReport
-from datastation.common.utils import add_batch_processor_args, add_dry_run_arg
+from datastation.common.utils import add_batch_processor_args, check_batch_processor_args, add_dry_run_arg
 from datastation.dataverse.dataverse_client import DataverseClient
 
 
 def reindex_datasets(args, dataverse_client: DataverseClient):
     pids = get_pids(args.pid_or_pid_file)
     batch_processor = BatchProcessorWithReport(wait=args.wait, fail_on_first_error=args.fail_fast,
-                                               report_file=args.report_file, headers=["PID", "Status", "Message"])
+                                               report_file=args.report_file, headers=["PID", "Status", "Message"],
+                                               workers=args.workers,
+                                               journal_file=args.journal_file, resume=args.resume, dry_run=args.dry_run)
     batch_processor.process_pids(pids,
                                  lambda pid, csv_report: reindex_dataset(pid, dataverse_client, csv_report=csv_report,
                                                                          dry_run=args.dry_run))
@@ -25,6 +28,7 @@ def reindex_dataset(pid, dataverse_client: DataverseClient, csv_report: CsvRepor
         csv_report.write({"PID": pid, "Status": "200", "Message": json.dumps(r)})
     except HTTPError as e:
         csv_report.write({"PID": pid, "Status": e.response.status_code, "Message": e.response.text})
+        return FAILED
 
 
 def main():
@@ -33,10 +37,11 @@ def main():
 
     parser = argparse.ArgumentParser(description='Reindex one or more datasets.')
     parser.add_argument('pid_or_pid_file', help='The pid or file with pids of the datasets to reindex')
-    add_batch_processor_args(parser)
+    add_batch_processor_args(parser, config=config)
     add_dry_run_arg(parser)
 
     args = parser.parse_args()
+    check_batch_processor_args(parser, args)
     reindex_datasets(args, dataverse_client=dataverse)
 
 
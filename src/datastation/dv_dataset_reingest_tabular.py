@@ -5,15 +5,17 @@ from datetime import datetime
 import requests
 
 from datastation.common.batch_processing import get_pids, BatchProcessorWithReport
+from datastation.common.checkpoint import FAILED
 from datastation.common.config import init
-from datastation.common.utils import add_batch_processor_args, add_dry_run_arg
+from datastation.common.utils import add_batch_processor_args, check_batch_processor_args, add_dry_run_arg
 from datastation.dataverse.dataverse_client import DataverseClient
 
 
 def reingest_tabular_files_in_datasets(args, dataverse_client: DataverseClient):
     pids = get_pids(args.pid_or_pid_file)
     batch_processor = BatchProcessorWithReport(report_file=args.report_file, wait=args.wait,
-                                               fail_on_first_error=args.fail_fast,
+                                               fail_on_first_error=args.fail_fast, workers=args.workers,
+                                               journal_file=args.journal_file, resume=args.resume, dry_run=args.dry_run,
                                                headers=['DOI', 'Modified', 'Change', 'Messages'])
     batch_processor.process_pids(pids,
                                  lambda pid, csv_report: reingest_tabular_files_in_dataset(pid, dataverse_client,
@@ -46,7 +48,7 @@ def reingest_tabular_files_in_dataset(pid, dataverse_client: DataverseClient, cs
     except Exception as e:
         csv_report.write({'DOI': pid, 'Modified': datetime.now(), 'Change': 'Error', 'Messages': str(e)})
         logging.warning(f"Error re-ingesting files in dataset {pid}: {e}. Moving on to next dataset.")
-        return
+        return FAILED
 
 
 def main():
@@ -57,7 +59,8 @@ def main():
     parser.add_argument('pid_or_pid_file',
                         help='the persistent identifier of the dataset or a file containing a list of '
                              'persistent identifiers.')
-    add_batch_processor_args(parser)
+    add_batch_processor_args(parser, config=config)
     add_dry_run_arg(parser)
     args = parser.parse_args()
+    check_batch_processor_args(parser, args)
     reingest_tabular_files_in_datasets(args, dataverse)
@@ -1,11 +1,12 @@
 import argparse
+import logging
 from datetime import datetime
 
 import rich
 
 from datastation.common.batch_processing import get_pids, BatchProcessorWithReport
 from datastation.common.config import init
-from datastation.common.utils import add_batch_processor_args, add_dry_run_arg
+from datastation.common.utils import add_batch_processor_args, check_batch_processor_args, add_dry_run_arg
 from datastation.dataverse.dataset_api import DatasetApi
 from datastation.dataverse.dataverse_client import DataverseClient
 
@@ -13,7 +14,8 @@ from datastation.dataverse.dataverse_client import DataverseClient
 def add_role_assignments(args, dataverse_client: DataverseClient):
     pids = get_pids(args.pid_or_pid_file)
     batch_processor = BatchProcessorWithReport(wait=args.wait, fail_on_first_error=args.fail_fast,
-                                               report_file=args.report_file,
+                                               report_file=args.report_file, workers=args.workers,
+                                               journal_file=args.journal_file, resume=args.resume, dry_run=args.dry_run,
                                                headers=['DOI', 'Modified', 'Assignee', 'Role', 'Change'])
     batch_processor.process_pids(pids,
                                  lambda pid, csv_report: add_role_assignment(args.role_assignment,
@@ -26,10 +28,9 @@ def add_role_assignment(role_assignment, dataset_api: DatasetApi, csv_report, dr
     role = role_assignment.split('=')[1]
     action = "None"
     if in_current_assignments(assignee, role, dataset_api):
-        print("{} is already {} for dataset {}".format(assignee, role, dataset_api.get_pid()))
+        logging.info("{} is already {} for dataset {}".format(assignee, role, dataset_api.get_pid()))
     else:
-        print(
-            "Adding {} as {} for dataset {}".format(assignee, role, dataset_api.get_pid()))
+        logging.info("Adding {} as {} for dataset {}".format(assignee, role, dataset_api.get_pid()))
         dataset_api.add_role_assignment(assignee, role, dry_run=dry_run)
         action = "Added"
     csv_report.write(
@@ -56,7 +57,8 @@ def list_role_assignments(args, dataverse_client):
 
 def remove_role_assignments(args, dataverse_client: DataverseClient):
     pids = get_pids(args.pid_or_pid_file)
-    batch_processor = BatchProcessorWithReport(wait=args.wait, report_file=args.report_file,
+    batch_processor = BatchProcessorWithReport(wait=args.wait, report_file=args.report_file, workers=args.workers,
+                                               journal_file=args.journal_file, resume=args.resume, dry_run=args.dry_run,
                                                headers=['DOI', 'Modified', 'Assignee', 'Role', 'Change'])
     batch_processor.process_pids(pids,
                                  lambda pid, csv_report: remove_role_assignment(args.role_assignment,
@@ -70,7 +72,7 @@ def remove_role_assignment(role_assignment, dataset_api: DatasetApi, csv_report,
     role = role_assignment.split('=')[1]
     action = "None"
     if in_current_assignments(assignee, role, dataset_api):
-        print("Removing {} as {} for dataset {}".format(assignee, role, dataset_api.get_pid()))
+        logging.info("Removing {} as {} for dataset {}".format(assignee, role, dataset_api.get_pid()))
         all_assignments = dataset_api.get_role_assignments()
         for assignment in all_assignments:
             if assignment.get('assignee') == assignee and assignment.get('_roleAlias') == role:
@@ -78,7 +80,7 @@ def remove_role_assignment(role_assignment, dataset_api: DatasetApi, csv_report,
                 action = "Removed"
                 break
     else:
-        print("{} is not {} for dataset {}".format(assignee, role, dataset_api.get_pid()))
+        logging.info("{} is not {} for dataset {}".format(assignee, role, dataset_api.get_pid()))
     csv_report.write(
         {'DOI': dataset_api.get_pid(), 'Modified': datetime.now(), 'Assignee': assignee, 'Role': role,
          'Change': action})
@@ -98,7 +100,7 @@ def main():
     parser_add.add_argument('role_assignment',
                             help='role assignee and alias (example: @dataverseAdmin=contributor) to add')
     parser_add.add_argument('pid_or_pid_file', help='the dataset pid or the input file with the dataset pids')
-    add_batch_processor_args(parser_add)
+    add_batch_processor_args(parser_add, config=config)
     add_dry_run_arg(parser_add)
 
     parser_add.set_defaults(func=lambda _: add_role_assignments(_, dataverse_client))
@@ -108,7 +110,7 @@ def main():
     parser_remove.add_argument('role_assignment',
                                help='role assignee and alias (example: @dataverseAdmin=contributor)')
     parser_remove.add_argument('pid_or_pid_file', help='The dataset pid or the input file with the dataset pids')
-    add_batch_processor_args(parser_remove)
+    add_batch_processor_args(parser_remove, config=config)
     add_dry_run_arg(parser_remove)
     parser_remove.set_defaults(func=lambda _: remove_role_assignments(_, dataverse_client))
 
@@ -120,6 +122,7 @@ def main():
     parser_list.set_defaults(func=lambda _: list_role_assignments(_, dataverse_client))
 
     args = parser.parse_args()
+    check_batch_processor_args(parser, args)
     args.func(args)
 
 
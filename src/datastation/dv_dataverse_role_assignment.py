@@ -2,7 +2,7 @@ import argparse
 
 from datastation.common.batch_processing import get_entries, BatchProcessorWithReport
 from datastation.common.config import init
-from datastation.common.utils import add_batch_processor_args, add_dry_run_arg
+from datastation.common.utils import add_batch_processor_args, check_batch_processor_args, add_dry_run_arg
 from datastation.dataverse.dataverse_client import DataverseClient
 from datastation.dataverse.roles import DataverseRole
 
@@ -39,6 +39,10 @@ def create_batch_processor(args):
     return BatchProcessorWithReport(
         wait=args.wait,
         fail_on_first_error=args.fail_fast,
+        workers=args.workers,
+        journal_file=args.journal_file,
+        resume=args.resume,
+        dry_run=args.dry_run,
         report_file=args.report_file,
         headers=['alias', 'Modified', 'Assignee', 'Role', 'Change']
     )
@@ -58,7 +62,7 @@ def main():
                             help='role assignee and alias (example: @dataverseAdmin=contributor) to add')
     parser_add.add_argument('alias_or_alias_file',
                             help='The dataverse alias or the input file with the dataverse aliases')
-    add_batch_processor_args(parser_add)
+    add_batch_processor_args(parser_add, config=config)
     add_dry_run_arg(parser_add)
 
     parser_add.set_defaults(func=lambda _: add_role_assignments(_, dataverse_client))
@@ -69,7 +73,7 @@ def main():
                                help='role assignee and alias (example: @dataverseAdmin=contributor)')
     parser_remove.add_argument('alias_or_alias_file',
                                help='The dataverse alias or the input file with the dataverse aliases')
-    add_batch_processor_args(parser_remove)
+    add_batch_processor_args(parser_remove, config=config)
     add_dry_run_arg(parser_remove)
     parser_remove.set_defaults(func=lambda _: remove_role_assignments(_, dataverse_client))
 
@@ -81,6 +85,7 @@ def main():
     parser_list.set_defaults(func=lambda _: list_role_assignments(_, dataverse_client))
 
     args = parser.parse_args()
+    check_batch_processor_args(parser, args)
     args.func(args)
 
 
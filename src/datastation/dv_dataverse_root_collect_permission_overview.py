@@ -2,7 +2,8 @@ import argparse
 from argparse_formatter import FlexiFormatter
 
 from datastation.common.config import init
-from datastation.common.utils import add_dry_run_arg
+from datastation.common.utils import add_dry_run_arg, add_flush_interval_arg, add_compression_args, \
+    positive_int_argument_converter
 from datastation.dataverse.dataverse_client import DataverseClient
 from datastation.dataverse.permissions_collect import PermissionsCollect
 
@@ -31,16 +32,28 @@ def main():
     parser.add_argument('-o', '--output-file', dest='output_file', default='-',
                         help='The file to write the output to or - for stdout')
     parser.add_argument('-f', '--format', dest='format',
-                        help='Output format, one of: csv, json (default: json)')
+                        help='Output format, one of: csv, json, jsonl, parquet (default: json). With jsonl every row is a '
+                             'JSON object on a line of its own, which can be processed while the output is written. '
+                             'Parquet has typed, compressed columns and needs the parquet extra')
+    add_flush_interval_arg(parser)
+    add_compression_args(parser)
     parser.add_argument('-s', '--selected-dataverse', dest='selected_dataverse', default=None,
                         help='The dataverse (top-level) sub-tree to collect the permissions for, by default all dataverses are collected')
+    parser.add_argument('--from-database', dest='from_database', action='store_true',
+                        help='Read the groups, roles and assignments of all dataverses from the Dataverse database (see '
+                             'the dataverse.db configuration) with a few queries, instead of with three API calls '
+                             'per dataverse')
+    parser.add_argument('--workers', dest='workers', type=positive_int_argument_converter, default=1,
+                        help='The number of requests to send concurrently (default: 1). Rows are written in the same '
+                             'order regardless of this setting')
     add_dry_run_arg(parser)
     args = parser.parse_args()
 
     selected_dataverse = args.selected_dataverse
     dataverse_client = DataverseClient(config['dataverse'])
-    collector = PermissionsCollect(dataverse_client, args.output_file, args.format, args.dry_run)
-    collector.collect_permissions_info_overview(selected_dataverse)
+    collector = PermissionsCollect(dataverse_client, args.output_file, args.format, args.dry_run, args.workers,
+                                   args.flush_interval, args.compress, args.compression_level)
+    collector.collect_permissions_info_overview(selected_dataverse, args.from_database)
 
 if __name__ == '__main__':
     main()
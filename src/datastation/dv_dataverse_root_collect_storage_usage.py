@@ -2,7 +2,8 @@ import argparse
 
 
 from datastation.common.config import init
-from datastation.common.utils import add_dry_run_arg
+from datastation.common.utils import add_dry_run_arg, add_flush_interval_arg, add_compression_args, \
+    positive_int_argument_converter
 from datastation.dataverse.dataverse_client import DataverseClient
 from datastation.dataverse.metrics_collect import MetricsCollect
 
@@ -18,14 +19,41 @@ def main():
     parser.add_argument('-o', '--output-file', dest='output_file', default='-',
                         help='the file to write the output to or - for stdout')
     parser.add_argument('-f', '--format', dest='format',
-                        help='Output format, one of: csv, json (default: json)')
+                        help='Output format, one of: csv, json, jsonl, parquet (default: json). With jsonl every row is a '
+                             'JSON object on a line of its own, which can be processed while the output is written. '
+                             'Parquet has typed, compressed columns and needs the parquet extra')
+    add_flush_interval_arg(parser)
+    add_compression_args(parser)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('-b', '--bottom-up', dest='bottom_up', action='store_true',
+                      help='retrieve the size of the dataverses at the bottom of the tree, and add up the sizes of '
+                           'the dataverses above them locally, so that most files are summed only once. This '
+                           'includes the grand total for free, but always traverses the whole tree. A dataverse that '
+                           'directly contains datasets as well as dataverses stops the traversal, unless '
+                           '--size-mixed-dataverses is given')
+    mode.add_argument('--from-database', dest='from_database', action='store_true',
+                      help='compute the sizes with a single query on the Dataverse database (see the dataverse.db '
+                           'configuration) instead of the API. The output is the same, and can be used to '
+                           'cross-check the API')
+    parser.add_argument('--size-mixed-dataverses', dest='size_mixed', action='store_true',
+                        help='with --bottom-up, size a dataverse that directly contains datasets as well as '
+                             'dataverses as a whole. The server then sums the files of the dataverses below it again, '
+                             'so if the root contains datasets this costs as much as the grand total of the top-down '
+                             'traversal')
+    parser.add_argument('--workers', dest='workers', type=positive_int_argument_converter, default=1,
+                        help='the number of storage sizes to retrieve concurrently (default: 1). Rows are written in '
+                             'the same order regardless of this setting')
 
     add_dry_run_arg(parser)
     args = parser.parse_args()
+    if args.size_mixed and not args.bottom_up:
+        parser.error('--size-mixed-dataverses requires --bottom-up')
 
     dataverse_client = DataverseClient(config['dataverse'])
-    collector = MetricsCollect(dataverse_client, args.output_file, args.format, args.dry_run)
-    collector.collect_storage_usage(args.max_depth, args.include_grand_total)
+    collector = MetricsCollect(dataverse_client, args.output_file, args.format, args.dry_run, args.workers,
+                               args.flush_interval, args.compress, args.compression_level)
+    collector.collect_storage_usage(args.max_depth, args.include_grand_total, args.bottom_up, args.from_database,
+                                    args.size_mixed)
 
 if __name__ == '__main__':
     main()
@@ -15,6 +15,24 @@ def main():
         type=positive_int_argument_converter,
         required=True,
     )
+    parser.add_argument(
+        "--batch-size",
+        dest="batch_size",
+        help="Delete the notifications in batches of at most this many, each in its own transaction. The progress and "
+             "rate are logged after each batch. If interrupted, run the command again to delete the rest",
+        type=positive_int_argument_converter,
+    )
+    parser.add_argument(
+        "--pause",
+        help="With --batch-size, the number of seconds to wait between batches (default: 1.0)",
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument(
+        "--vacuum",
+        help="Run VACUUM (ANALYZE) on the notifications table afterwards",
+        action="store_true",
+    )
     add_dry_run_arg(parser)
     args = parser.parse_args()
 
@@ -25,7 +43,11 @@ def main():
         dry_run=args.dry_run
     )
     
-    notifications.cleanup(args.days_old)
+    if args.batch_size is not None:
+        notifications.cleanup_in_batches(args.days_old, batch_size=args.batch_size, pause=args.pause,
+                                         vacuum=args.vacuum)
+    else:
+        notifications.cleanup(args.days_old, vacuum=args.vacuum)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,7 @@
 import argparse
 
 from datastation.common.config import init
-from datastation.common.utils import add_dry_run_arg
+from datastation.common.utils import add_dry_run_arg, positive_int_argument_converter
 from datastation.dataverse.dataverse_client import DataverseClient
 from datastation.dataverse.user_import import UserImport
 
@@ -18,13 +18,20 @@ def main():
                         action='store_true')
     parser.add_argument('-k', '--builtin-users-key', help="BuiltinUsers.KEY set in Dataverse")
     parser.add_argument('-i', '--input-csv', help="the csv file containing the users and hashed passwords")
+    parser.add_argument('--commit-batch-size', dest='commit_batch_size', type=positive_int_argument_converter,
+                        help="the number of password updates per database transaction (default: the "
+                             "dataverse.db.commit_batch_size configuration, or 1000)")
+    parser.add_argument('--workers', default=1, type=positive_int_argument_converter,
+                        help="number of users to create concurrently (default: 1)")
+    parser.add_argument('-r', '--report-file', dest='report_file', default='-',
+                        help="the report with the outcome per user (CREATED, SKIPPED or FAILED), or - for stdout")
     add_dry_run_arg(parser)
 
     args = parser.parse_args()
     dataverse_client = DataverseClient(config['dataverse'])
     user_import = UserImport(dataverse_client, builtin_users_key=args.builtin_users_key,
-                             is_easy_format=args.is_easy_format, dry_run=args.dry_run)
-    user_import.import_users(args.input_csv)
+                             is_easy_format=args.is_easy_format, dry_run=args.dry_run, workers=args.workers)
+    user_import.import_users(args.input_csv, report_file=args.report_file, commit_batch_size=args.commit_batch_size)
 
 
 if __name__ == '__main__':
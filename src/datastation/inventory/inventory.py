@@ -0,0 +1,216 @@
+import logging
+import sqlite3
+from datetime import datetime, timezone
+
+from datastation.common.database import Database
+from datastation.dataverse.search_api import SearchApi
+
+SEARCH = 'search'
+DATABASE = 'database'
+
+schema = """
+    create table if not exists dataset (
+        pid text primary key,
+        id integer,
+        version_state text,
+        version text,
+        storage_size integer,
+        dataverse_alias text,
+        last_modified text,
+        synced_at text not null
+    );
+    create index if not exists dataset_version_state on dataset (version_state);
+    create index if not exists dataset_dataverse_alias on dataset (dataverse_alias);
+    create index if not exists dataset_storage_size on dataset (storage_size);
+    create index if not exists dataset_last_modified on dataset (last_modified);
+    create table if not exists sync_state (
+        source text primary key,
+        watermark text,
+        synced_at text not null
+    );
+"""
+
+upsert_statement = """
+    insert into dataset (pid, id, version_state, version, storage_size, dataverse_alias, last_modified, synced_at)
+    values (?, ?, ?, ?, ?, ?, ?, ?)
+    on conflict (pid) do update set
+        id = coalesce(excluded.id, dataset.id),
+        version_state = excluded.version_state,
+        version = excluded.version,
+        storage_size = coalesce(excluded.storage_size, dataset.storage_size),
+        dataverse_alias = excluded.dataverse_alias,
+        last_modified = excluded.last_modified,
+        synced_at = excluded.synced_at
+"""
+
+# The latest version of a dataset is the one with the highest id; the storage size is that of all its files
+datasets_modified_since_query = """
+    select concat(dvo.protocol, ':', dvo.authority, '/', dvo.identifier),
+           dvo.id,
+           dv.versionstate,
+           dv.versionnumber,
+           dv.minorversionnumber,
+           (select coalesce(sum(df.filesize), 0)
+            from dvobject fo inner join datafile df on df.id = fo.id
+            where fo.owner_id = dvo.id),
+           owner.alias,
+           dvo.modificationtime
+    from dvobject dvo
+    inner join datasetversion dv on dv.dataset_id = dvo.id
+    inner join dataverse owner on owner.id = dvo.owner_id
+    where dvo.dtype = 'Dataset'
+      and dv.id = (select max(v.id) from datasetversion v where v.dataset_id = dvo.id)
+      and dvo.modificationtime > %s
+    order by dvo.modificationtime
+"""
+
+
+def format_timestamp(value):
+    """ Formats a datetime, or an ISO 8601 string, as an ISO 8601 string in UTC with second precision. """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def format_version(major, minor):
+    if major is None:
+        return None
+    return f"{major}.{minor if minor is not None else 0}"
+
+
+def search_item_to_row(item, synced_at):
+    return (item['global_id'], item.get('entity_id'), item.get('versionState'),
+            format_version(item.get('majorVersion'), item.get('minorVersion')), None,
+            item.get('identifier_of_dataverse'), format_timestamp(item.get('updatedAt')), synced_at)
+
+
+def database_record_to_row(record, synced_at):
+    pid, dvobject_id, version_state, major, minor, storage_size, alias, modification_time = record
+    return (pid, dvobject_id, version_state, format_version(major, minor), storage_size, alias,
+            format_timestamp(modification_time), synced_at)
+
+
+class Inventory:
+    """ A local SQLite mirror of the datasets in a Dataverse installation, to select PIDs by predicate without
+    crawling the search API.
+
+    The inventory can be filled from the search API, which does a full crawl, or from the Dataverse database, which
+    only reads the datasets modified since the previous sync from the database. The search API has no modification
+    time to filter on: its date sort does not move when a draft is created, on a minor release or on a metadata change.
+    Only the database provides storage sizes.
+    """
+
+    def __init__(self, filename, commit_every: int = 1000):
+        self.filename = filename
+        self.commit_every = commit_every
+        self.connection = None
+
+    def connect(self):
+        self.connection = sqlite3.connect(self.filename)
+        self.connection.executescript(schema)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def sync_from_search(self, search_api: SearchApi, prefetch: int = 2):
+        """ Replaces the inventory with the datasets found by the search API. Datasets that are no longer found are
+        removed. Storage sizes from a previous database sync are kept. """
+        synced_at = now()
+        items = search_api.search(prefetch=prefetch, show_entity_ids=True,
+                                  fields=['global_id', 'entity_id', 'versionState', 'majorVersion', 'minorVersion',
+                                          'identifier_of_dataverse', 'updatedAt'])
+        count = self._upsert(search_item_to_row(item, synced_at) for item in items)
+        removed = self._remove_not_synced_since(synced_at)
+        self._set_sync_state(SEARCH, None, synced_at)
+        logging.info(f"Synced {count} datasets from the search API, removed {removed}")
+        return count
+
+    def sync_from_database(self, database: Database, full: bool = False):
+        """ Updates the inventory with the datasets modified since the previous database sync, or with all datasets
+        if full is True. A full sync also removes the datasets that no longer exist. """
+        synced_at = now()
+        watermark = None if full else self.get_watermark(DATABASE)
+        since = datetime.fromisoformat(watermark) if watermark is not None else datetime.min
+        logging.info(f"Reading datasets modified since {since} from the database")
+        last_modified = None
+
+        def rows():
+            nonlocal last_modified
+            for record in database.stream_query(datasets_modified_since_query, (since,)):
+                last_modified = record[7]  # the records are ordered by modification time
+                yield database_record_to_row(record, synced_at)
+
+        count = self._upsert(rows())
+        if last_modified is not None:
+            watermark = last_modified.isoformat()
+        if full:
+            removed = self._remove_not_synced_since(synced_at)
+            logging.info(f"Removed {removed} datasets that no longer exist")
+        self._set_sync_state(DATABASE, watermark, synced_at)
+        logging.info(f"Synced {count} datasets from the database")
+        return count
+
+    def get_watermark(self, source):
+        row = self.connection.execute("select watermark from sync_state where source = ?", (source,)).fetchone()
+        return row[0] if row is not None else None
+
+    def select_pids(self, version_state=None, dataverse_alias=None, min_storage_size=None, modified_since=None):
+        """ Yields the PIDs of the datasets that match all the given predicates, in PID order. """
+        conditions = []
+        params = []
+        if version_state is not None:
+            conditions.append("version_state = ?")
+            params.append(version_state)
+        if dataverse_alias is not None:
+            conditions.append("dataverse_alias = ?")
+            params.append(dataverse_alias)
+        if min_storage_size is not None:
+            conditions.append("storage_size >= ?")
+            params.append(min_storage_size)
+        if modified_since is not None:
+            conditions.append("last_modified >= ?")
+            params.append(format_timestamp(modified_since))
+        where = f"where {' and '.join(conditions)}" if len(conditions) > 0 else ""
+        for row in self.connection.execute(f"select pid from dataset {where} order by pid", params):
+            yield row[0]
+
+    def _upsert(self, rows):
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.commit_every:
+                count += self._write_batch(batch)
+                batch = []
+        return count + self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        with self.connection:
+            self.connection.executemany(upsert_statement, batch)
+        return len(batch)
+
+    def _remove_not_synced_since(self, synced_at):
+        with self.connection:
+            return self.connection.execute("delete from dataset where synced_at < ?", (synced_at,)).rowcount
+
+    def _set_sync_state(self, source, watermark, synced_at):
+        with self.connection:
+            self.connection.execute("insert into sync_state (source, watermark, synced_at) values (?, ?, ?) "
+                                    "on conflict (source) do update set watermark = excluded.watermark, "
+                                    "synced_at = excluded.synced_at", (source, watermark, synced_at))
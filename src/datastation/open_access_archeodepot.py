@@ -7,7 +7,7 @@ import os
 import re
 from datastation.common.batch_processing import BatchProcessor
 from datastation.common.config import init
-from datastation.dv_api import publish_dataset, get_dataset_metadata, is_draft_dataset, change_access_request, replace_dataset_metadata, \
+from datastation.dv_api import publish_dataset, get_dataset_metadata, change_access_request, replace_dataset_metadata, \
     change_file_restrict, update_file_metas
 
 
@@ -163,7 +163,7 @@ def update_license(doi, new_license_uri, must_be_restricted, server_url, api_tok
         logging.warning("cannot get metadata for {}, skipping: {}".format(doi, str(e)))
         return
 
-    if is_draft_dataset(server_url, api_token, doi):
+    if resp_data['versionState'] == 'DRAFT':
         logging.warning("dataset is draft, skipping: {}".format(doi))
         return
 
@@ -0,0 +1,142 @@
+""" Fakes of the Dataverse API and database, shared by the tests. """
+import random
+import threading
+import time
+
+
+class FakeResponse:
+
+    def __init__(self, data):
+        self.status_code = 200
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"status": "OK", "data": self.data}
+
+
+class FakeSearchSession:
+    """ Answers search requests from a list of items, and records the start and parameters of each request. """
+
+    def __init__(self, items):
+        self.items = items
+        self.starts = []
+        self.params = []
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, params=None):
+        start, per_page = int(params["start"]), int(params["per_page"])
+        with self.lock:
+            self.starts.append(start)
+            self.params.append(params)
+        return FakeResponse({"total_count": len(self.items), "items": self.items[start:start + per_page]})
+
+
+def numbered_items(count):
+    return [{"global_id": f"doi:10.5072/FK2/{i}"} for i in range(count)]
+
+
+class FakeDatabase:
+    """ Answers every streamed query with the given rows, and records the queries. If modified is given, only the
+    rows with a modification time after the first parameter are returned, ordered by it, like the queries for
+    modified datasets. """
+
+    def __init__(self, rows, modified=None):
+        self.rows = rows
+        self.modified = modified
+        self.queries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def stream_query(self, query, params=None, fetch_size=None, as_dicts=False):
+        self.queries.append((query, params))
+        if self.modified is None:
+            return iter(self.rows)
+        since = params[0]
+        return iter(sorted([row for row in self.rows if self.modified(row) > since], key=self.modified))
+
+
+class FakeSearchApi:
+    """ Answers every search with the datasets of the given PIDs, and records the arguments of each search. """
+
+    def __init__(self, pids):
+        self.pids = pids
+        self.calls = []
+
+    def search(self, **kwargs):
+        self.calls.append(kwargs)
+        return iter([{'global_id': pid} for pid in self.pids])
+
+
+class FakeExportDatasetApi:
+
+    def __init__(self, client, pid):
+        self.client = client
+        self.pid = pid
+
+    def get_metadata_export(self, exporter, dry_run=False):
+        with self.client.lock:
+            self.client.fetched.append(self.pid)
+        if self.pid not in self.client.exports:
+            raise Exception(f"No export of {self.pid}")
+        return self.client.exports[self.pid]
+
+
+class FakeExportDataverseClient:
+    """ Answers metadata exports from a dictionary from PID to export, and searches and database queries with the given
+    PIDs. The PIDs of the fetched exports are recorded. """
+
+    def __init__(self, pids, exports):
+        self.search = FakeSearchApi(pids)
+        self.db = FakeDatabase([(pid,) for pid in pids])
+        self.exports = exports
+        self.fetched = []
+        self.lock = threading.Lock()
+
+    def search_api(self):
+        return self.search
+
+    def database(self):
+        return self.db
+
+    def dataset(self, pid):
+        return FakeExportDatasetApi(self, pid)
+
+
+class FakeMetricsApi:
+
+    def __init__(self, tree):
+        self.tree = tree
+
+    def get_tree(self):
+        return self.tree
+
+
+class FakeConcurrentDataverseClient:
+    """ Creates dataverse APIs of the given class, which answer through call(), so that the maximum number of calls
+    in progress at the same time can be checked. """
+
+    def __init__(self, dataverse_api_class, max_delay=0.01):
+        self.dataverse_api_class = dataverse_api_class
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def dataverse(self, alias):
+        return self.dataverse_api_class(self, alias)
+
+    def call(self, result):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(random.uniform(0, self.max_delay))
+        with self.lock:
+            self.active -= 1
+        return result
@@ -1,7 +1,13 @@
+import csv
+import threading
 import time
 from datetime import datetime
 
-from datastation.common.batch_processing import BatchProcessor, get_pids
+import pytest
+
+from datastation.common.batch_processing import BatchProcessor, get_pids, BatchProcessorWithReport
+from datastation.common.checkpoint import FAILED
+from datastation.dv_dataset_publish import publish
 
 
 class TestBatchProcessor:
@@ -50,8 +56,8 @@ class TestBatchProcessor:
         batch_processor.process_pids(objects, lambda obj: print(obj))
         assert capsys.readouterr().out == ""
         assert caplog.text == (
-            'INFO     root:batch_processing.py:62 Start batch processing on unknown number of entries\n'
-            'INFO     root:batch_processing.py:91 Batch processing ended: 0 entries processed\n')
+            'INFO     root:batch_processing.py:96 Start batch processing on unknown number of entries\n'
+            'INFO     root:batch_processing.py:102 Batch processing ended: 0 entries processed\n')
         assert len(caplog.records) == 2
         assert (caplog.records[0].message == 'Start batch processing on unknown number of entries')
         assert (caplog.records[1].message == 'Batch processing ended: 0 entries processed')
@@ -62,8 +68,8 @@ class TestBatchProcessor:
         batch_processor.process_entries(['a'], lambda obj: print(obj))
         assert capsys.readouterr().out == "a\n"
         assert caplog.text == (
-            'INFO     root:batch_processing.py:60 Start batch processing on 1 entries\n'
-            'INFO     root:batch_processing.py:91 Batch processing ended: 1 entries processed\n')
+            'INFO     root:batch_processing.py:94 Start batch processing on 1 entries\n'
+            'INFO     root:batch_processing.py:102 Batch processing ended: 1 entries processed\n')
         assert len(caplog.records) == 2
         assert (caplog.records[0].message == 'Start batch processing on 1 entries')
         assert (caplog.records[1].message == 'Batch processing ended: 1 entries processed')
@@ -73,7 +79,7 @@ class TestBatchProcessor:
         batch_processor = BatchProcessor()
         batch_processor.process_pids(None, lambda obj: print(obj))
         assert capsys.readouterr().out == ""
-        assert caplog.text == 'INFO     root:batch_processing.py:56 Nothing to process\n'
+        assert caplog.text == 'INFO     root:batch_processing.py:84 Nothing to process\n'
         assert len(caplog.records) == 1
         assert (caplog.records[0].message == 'Nothing to process')
 
@@ -82,8 +88,8 @@ class TestBatchProcessor:
         batch_processor = BatchProcessor()
         batch_processor.process_pids([], lambda obj: print(obj))
         assert capsys.readouterr().out == ""
-        assert caplog.text == ('INFO     root:batch_processing.py:60 Start batch processing on 0 entries\n'
-                               'INFO     root:batch_processing.py:91 Batch processing ended: 0 entries '
+        assert caplog.text == ('INFO     root:batch_processing.py:94 Start batch processing on 0 entries\n'
+                               'INFO     root:batch_processing.py:102 Batch processing ended: 0 entries '
                                'processed\n')
         assert len(caplog.records) == 2
         assert (caplog.records[0].message == 'Start batch processing on 0 entries')
@@ -188,6 +194,156 @@ class TestBatchProcessor:
         assert (caplog.records[6].message == 'Waiting 0.1 seconds before processing next entry')
         # see other tests for other lines
 
+    def test_process_entries_with_workers(self, caplog):
+        caplog.set_level('INFO')
+        batch_processor = BatchProcessor(wait=0, workers=4)
+        processed = []
+        lock = threading.Lock()
+
+        def callback(pid):
+            time.sleep(0.1)
+            with lock:
+                processed.append(pid)
+
+        start_time = datetime.now()
+        batch_processor.process_entries([str(i) for i in range(8)], callback)
+        end_time = datetime.now()
+        assert sorted(processed) == [str(i) for i in range(8)]
+        # two rounds of four concurrent entries
+        assert (end_time - start_time).total_seconds() < 0.6
+        assert caplog.records[0].message == 'Start batch processing on 8 entries'
+        assert caplog.records[1].message == 'Processing with 4 workers'
+        assert caplog.records[2].message == 'Processing 1 of 8 entries: 0'
+        assert caplog.records[-1].message == 'Batch processing ended: 8 entries processed'
+
+    def test_workers_keep_bounded_number_of_entries_in_flight(self):
+        batch_processor = BatchProcessor(wait=0, workers=2)
+        read = []
+        in_flight = []
+        lock = threading.Lock()
+
+        def lazy(rec):
+            read.append(rec)
+            return rec
+
+        def callback(pid):
+            with lock:
+                in_flight.append(len(read) - len(processed))
+            time.sleep(0.05)
+            with lock:
+                processed.append(pid)
+
+        processed = []
+        batch_processor.process_entries(map(lazy, ["a", "b", "c", "d", "e"]), callback)
+        assert sorted(processed) == ["a", "b", "c", "d", "e"]
+        assert max(in_flight) <= 2
+
+    def test_workers_stop_on_first_error(self, caplog):
+        caplog.set_level('INFO')
+
+        def raise_on_b(rec):
+            time.sleep(0.05)
+            if rec == "b":
+                raise Exception("b is not allowed")
+
+        batch_processor = BatchProcessor(wait=0, workers=2)
+        batch_processor.process_entries([str(c) for c in "abcdefghij"], raise_on_b)
+        messages = [r.message for r in caplog.records]
+        assert 'Exception occurred on entry nr 2' in messages
+        assert 'Stop processing because of an exception: b is not allowed' in messages
+        assert 'Processing 10 of 10 entries: j' not in messages
+
+    def test_workers_write_complete_report_rows(self, tmp_path):
+        report_file = tmp_path / "report.csv"
+        batch_processor = BatchProcessorWithReport(report_file=str(report_file), headers=["PID", "Status"],
+                                                   wait=0, workers=8)
+        pids = [f"doi:10.5072/FK2/{i}" for i in range(200)]
+        batch_processor.process_entries(pids, lambda pid, csv_report: csv_report.write({"PID": pid, "Status": "OK"}))
+        with open(report_file) as f:
+            rows = list(csv.DictReader(f))
+        assert sorted(row["PID"] for row in rows) == sorted(pids)
+        assert all(row["Status"] == "OK" for row in rows)
+
+    def test_workers_write_only_the_report_to_stdout(self, capsys):
+        class FakeDatasetApi:
+            def __init__(self, pid):
+                self.pid = pid
+
+            def is_draft(self):
+                return self.pid.endswith('0')
+
+            def publish(self, update_type, dry_run):
+                return {'data': {}}
+
+        class FakeDataverseClient:
+            def dataset(self, pid):
+                return FakeDatasetApi(pid)
+
+        batch_processor = BatchProcessorWithReport(report_file='-', headers=['DOI', 'Modified', 'Change', 'Messages'],
+                                                   wait=0, workers=8)
+        pids = [f"doi:10.5072/FK2/{i}" for i in range(100)]
+        batch_processor.process_pids(pids, lambda pid, csv_report: publish(pid, FakeDataverseClient(), 'major',
+                                                                          csv_report))
+        rows = list(csv.DictReader(capsys.readouterr().out.splitlines()))
+        assert sorted(row['DOI'] for row in rows) == sorted(pids)
+        assert sum(row['Change'] == 'Published' for row in rows) == 10
+
+    def test_resume_skips_completed_entries(self, tmp_path, capsys):
+        journal_file = str(tmp_path / "journal")
+
+        def fail_on_c(pid):
+            if pid == "c":
+                raise Exception("c is not allowed")
+            print(pid)
+
+        BatchProcessor(wait=0, journal_file=journal_file).process_entries(["a", "b", "c", "d"], fail_on_c)
+        assert capsys.readouterr().out == "a\nb\n"
+        BatchProcessor(wait=0, journal_file=journal_file, resume=True).process_entries(["a", "b", "c", "d"], print)
+        assert capsys.readouterr().out == "c\nd\n"
+
+    def test_resume_appends_to_report(self, tmp_path):
+        journal_file = str(tmp_path / "journal")
+        report_file = str(tmp_path / "report.csv")
+        callback = lambda pid, csv_report: csv_report.write({"PID": pid, "Status": "OK"})
+        BatchProcessorWithReport(report_file=report_file, headers=["PID", "Status"], wait=0,
+                                 journal_file=journal_file).process_entries(["a", "b"], callback)
+        BatchProcessorWithReport(report_file=report_file, headers=["PID", "Status"], wait=0,
+                                 journal_file=journal_file, resume=True).process_entries(["a", "b", "c"], callback)
+        with open(report_file) as f:
+            assert f.read() == "PID,Status\na,OK\nb,OK\nc,OK\n"
+
+    def test_journal_records_failed_outcome_of_callback(self, tmp_path, capsys):
+        journal_file = str(tmp_path / "journal")
+
+        def report_failure_of_b(pid):
+            print(pid)
+            return FAILED if pid == "b" else None
+
+        BatchProcessor(wait=0, journal_file=journal_file).process_entries(["a", "b", "c"], report_failure_of_b)
+        assert capsys.readouterr().out == "a\nb\nc\n"
+        BatchProcessor(wait=0, journal_file=journal_file, resume=True).process_entries(["a", "b", "c"], print)
+        assert capsys.readouterr().out == "b\n"
+
+    def test_dry_run_does_not_change_journal(self, tmp_path, capsys):
+        journal_file = tmp_path / "journal"
+        BatchProcessor(wait=0, journal_file=str(journal_file)).process_entries(["a"], print)
+        journal = journal_file.read_text()
+        BatchProcessor(wait=0, journal_file=str(journal_file), resume=True, dry_run=True).process_entries(
+            ["a", "b"], print)
+        assert journal_file.read_text() == journal
+        BatchProcessor(wait=0, journal_file=str(journal_file), dry_run=True).process_entries(["a", "b"], print)
+        assert journal_file.read_text() == journal
+        assert capsys.readouterr().out == "a\nb\na\nb\n"
+
+    def test_default_wait_depends_on_workers(self):
+        assert BatchProcessor(wait=None).wait == 2.0
+        assert BatchProcessor(wait=None, workers=4).wait == 0
+        assert BatchProcessor(wait=0.5, workers=4).wait == 0.5
+
+    def test_resume_requires_journal(self):
+        with pytest.raises(ValueError):
+            BatchProcessor(resume=True)
+
     def test_get_single_pid(self):
         pids = get_pids('doi:10.5072/DAR/ATALUT')
         assert pids == ['doi:10.5072/DAR/ATALUT']
@@ -0,0 +1,42 @@
+from datastation.common.checkpoint import CheckpointJournal, OK, FAILED, entry_key
+
+
+class TestCheckpointJournal:
+
+    def test_records_outcomes(self, tmp_path):
+        journal_file = tmp_path / "journal"
+        with CheckpointJournal(journal_file) as journal:
+            journal.record("doi:10.5072/FK2/A", OK)
+            journal.record("doi:10.5072/FK2/B", FAILED)
+        assert journal_file.read_text() == "OK\tdoi:10.5072/FK2/A\nFAILED\tdoi:10.5072/FK2/B\n"
+
+    def test_resume_reads_completed_entries(self, tmp_path):
+        journal_file = tmp_path / "journal"
+        journal_file.write_text("OK\tA\nFAILED\tB\nOK\tC\nFAILED\tC\nFAILED\tD\nOK\tD\n")
+        with CheckpointJournal(journal_file, resume=True) as journal:
+            assert journal.completed == {"A", "D"}
+            assert journal.is_completed("A")
+            assert not journal.is_completed("B")
+
+    def test_resume_appends(self, tmp_path):
+        journal_file = tmp_path / "journal"
+        journal_file.write_text("OK\tA\n")
+        with CheckpointJournal(journal_file, resume=True) as journal:
+            journal.record("B", OK)
+        assert journal_file.read_text() == "OK\tA\nOK\tB\n"
+
+    def test_without_resume_starts_over(self, tmp_path):
+        journal_file = tmp_path / "journal"
+        journal_file.write_text("OK\tA\n")
+        with CheckpointJournal(journal_file) as journal:
+            assert journal.completed == set()
+        assert journal_file.read_text() == ""
+
+    def test_ignores_torn_last_line(self, tmp_path):
+        journal_file = tmp_path / "journal"
+        journal_file.write_text("OK\tA\nOK\tB")
+        with CheckpointJournal(journal_file, resume=True) as journal:
+            assert journal.completed == {"A"}
+
+    def test_dict_entries_are_keyed_by_json(self):
+        assert entry_key({"b": 1, "PID": "x"}) == '{"PID": "x", "b": 1}'
@@ -0,0 +1,68 @@
+import gzip
+import sys
+
+import pytest
+
+from datastation.common.compression import get_compression, get_suffix, open_output, GZIP, ZSTD
+
+
+class TestGetCompression:
+
+    def test_compression_follows_suffix(self):
+        assert get_compression('report.csv.gz') == GZIP
+        assert get_compression('report.csv.zst') == ZSTD
+        assert get_compression('report.csv') is None
+
+    def test_stdout_is_only_compressed_on_request(self):
+        assert get_compression('-') is None
+        assert get_compression('-', compress=ZSTD) == ZSTD
+
+    def test_compress_overrides_suffix(self):
+        assert get_compression('report.csv', compress=GZIP) == GZIP
+
+    def test_rejects_unknown_compression(self):
+        with pytest.raises(ValueError):
+            get_compression('report.csv', compress='bzip2')
+
+    def test_suffix_of_compression(self):
+        assert get_suffix(GZIP) == '.gz'
+        assert get_suffix(ZSTD) == '.zst'
+        assert get_suffix(None) == ''
+
+
+class TestOpenOutput:
+
+    def test_writes_uncompressed_file(self, tmp_path):
+        with open_output(str(tmp_path / 'out.csv')) as f:
+            f.write('a,b\n')
+        assert (tmp_path / 'out.csv').read_text() == 'a,b\n'
+
+    def test_writes_gzip_file_and_appends_member(self, tmp_path):
+        filename = str(tmp_path / 'out.csv.gz')
+        with open_output(filename, level=1) as f:
+            f.write('a,b\n')
+        with open_output(filename, 'a') as f:
+            f.write('1,2\n')
+        with gzip.open(filename, 'rt') as f:
+            assert f.read() == 'a,b\n1,2\n'
+
+    def test_writes_zstd_file(self, tmp_path):
+        zstandard = pytest.importorskip('zstandard')
+        filename = str(tmp_path / 'out.json.zst')
+        with open_output(filename, level=10) as f:
+            f.write('{"a": 1}\n')
+            f.flush()
+            f.write('{"a": 2}\n')
+        with open(filename, 'rb') as f:
+            assert zstandard.ZstdDecompressor().stream_reader(f).read() == b'{"a": 1}\n{"a": 2}\n'
+
+    def test_missing_zstandard_names_the_extra(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(sys.modules, 'zstandard', None)
+        with pytest.raises(ImportError, match=r"dans-datastation-tools\[zstd\]"):
+            open_output(str(tmp_path / 'out.json.zst'))
+
+    def test_compresses_stdout_without_closing_it(self, capsysbinary):
+        out_stream = open_output('-', 'w', compress=GZIP)
+        out_stream.write('hello\n')
+        out_stream.close()
+        assert gzip.decompress(capsysbinary.readouterr().out) == b'hello\n'
@@ -1,8 +1,15 @@
 # Tests the csv_report module
 
 import csv
+import gzip
+import os
+import threading
+import time
+from datetime import datetime
 
-from datastation.common.csv import CsvReport
+import pytest
+
+from datastation.common.csv import CsvReport, AsyncReport, FSYNC_ON_FLUSH, open_report
 
 
 class TestCsvReport:
@@ -53,4 +60,163 @@ class TestCsvReport:
         # Then
         with open(filename, "r") as f:
             reader = csv.DictReader(f)
-            assert len(list(reader)) == 0
\ No newline at end of file
+            assert len(list(reader)) == 0
+
+
+class TestParquetReport:
+
+    def test_parquet_report_has_typed_columns(self, tmp_path):
+        pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+        # Given
+        filename = str(tmp_path / "test.parquet")
+        modified = datetime(2024, 1, 2, 3, 4, 5)
+        # When
+        with open_report(filename, ["DOI", "Modified", "Change"]) as report:
+            report.write({"DOI": "doi:10.5072/FK2/ABC", "Modified": modified, "Change": "Reindexed"})
+            report.write({"DOI": "doi:10.5072/FK2/DEF", "Modified": None, "Change": "Error"})
+        # Then
+        table = pyarrow_parquet.read_table(filename)
+        assert str(table.schema.field("Modified").type) == "timestamp[us]"
+        assert table.to_pylist() == [{"DOI": "doi:10.5072/FK2/ABC", "Modified": modified, "Change": "Reindexed"},
+                                     {"DOI": "doi:10.5072/FK2/DEF", "Modified": None, "Change": "Error"}]
+
+    def test_parquet_report_cannot_be_appended_to(self, tmp_path):
+        with pytest.raises(ValueError):
+            open_report(str(tmp_path / "test.parquet"), ["DOI"], append=True)
+
+    def test_open_report_opens_csv_report_by_default(self, tmp_path):
+        with open_report(str(tmp_path / "test.csv"), ["DOI"]) as report:
+            assert isinstance(report, CsvReport)
+
+
+class RecordingReport:
+
+    def __init__(self, fail=False):
+        self.filename = "recording"
+        self.headers = ["PID"]
+        self.fail = fail
+        self.events = []
+
+    def write_rows(self, rows):
+        if self.fail:
+            raise OSError("disk full")
+        self.events.append(("rows", [row["PID"] for row in rows]))
+
+    def flush(self):
+        self.events.append(("flush",))
+
+    def fsync(self):
+        self.events.append(("fsync",))
+
+    def close(self):
+        self.events.append(("close",))
+
+
+class TestAsyncReport:
+
+    def test_writes_all_rows_in_order_from_several_threads(self, tmp_path):
+        filename = str(tmp_path / "test.csv")
+        with open_report(filename, ["PID", "Status"], asynchronous=True) as report:
+            def write_rows(thread_number):
+                for i in range(200):
+                    report.write({"PID": f"{thread_number}-{i}", "Status": "OK"})
+
+            threads = [threading.Thread(target=write_rows, args=(n,)) for n in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        with open(filename) as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == 800
+        for n in range(4):
+            assert [row["PID"] for row in rows if row["PID"].startswith(f"{n}-")] == [f"{n}-{i}" for i in range(200)]
+
+    def test_flush_writes_pending_rows_and_applies_fsync_policy(self):
+        recording = RecordingReport()
+        report = AsyncReport(recording, batch_size=10, fsync=FSYNC_ON_FLUSH)
+        for i in range(3):
+            report.write({"PID": str(i)})
+        report.flush()
+        written = [pid for event in recording.events if event[0] == "rows" for pid in event[1]]
+        assert written == ["0", "1", "2"]
+        assert recording.events[-2:] == [("flush",), ("fsync",)]
+        report.close()
+        assert recording.events[-2:] == [("fsync",), ("close",)]
+
+    def test_batches_rows(self):
+        recording = RecordingReport()
+        report = AsyncReport(recording, batch_size=10)
+        for i in range(25):
+            report.write({"PID": str(i)})
+        report.close()
+        batches = [event[1] for event in recording.events if event[0] == "rows"]
+        assert [pid for batch in batches for pid in batch] == [str(i) for i in range(25)]
+        assert all(len(batch) <= 10 for batch in batches)
+        assert recording.events[-1] == ("close",)
+        assert ("fsync",) not in recording.events
+
+    def test_flushes_only_on_request_or_interval(self):
+        recording = RecordingReport()
+        report = AsyncReport(recording, flush_interval=60)
+        for i in range(20):
+            report.write({"PID": str(i)})
+            time.sleep(0.001)
+        time.sleep(0.05)
+        assert ("flush",) not in recording.events
+        report.flush()
+        assert recording.events[-1] == ("flush",)
+        report.close()
+
+    def test_flushes_pending_rows_after_interval(self):
+        recording = RecordingReport()
+        report = AsyncReport(recording, flush_interval=0.05)
+        report.write({"PID": "1"})
+        deadline = time.monotonic() + 5
+        while ("flush",) not in recording.events and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert ("flush",) in recording.events
+        report.close()
+
+    def test_compressed_report_is_as_small_as_written_synchronously(self, tmp_path):
+        for asynchronous in [False, True]:
+            with open_report(str(tmp_path / f"{asynchronous}.csv.gz"), ["PID", "Status"],
+                             asynchronous=asynchronous) as report:
+                for i in range(3000):
+                    report.write({"PID": f"doi:10.5072/FK2/{i}", "Status": "OK"})
+                    if i % 10 == 0:
+                        time.sleep(0.0002)  # let the writer thread catch up, as with workers that make requests
+        assert os.path.getsize(tmp_path / "True.csv.gz") < 1.5 * os.path.getsize(tmp_path / "False.csv.gz")
+
+    def test_raises_error_of_writer_thread(self):
+        report = AsyncReport(RecordingReport(fail=True))
+        report.write({"PID": "1"})
+        with pytest.raises(OSError):
+            report.flush()
+        with pytest.raises(OSError):
+            report.close()
+
+    def test_rejects_unknown_fsync_policy(self):
+        with pytest.raises(ValueError):
+            AsyncReport(RecordingReport(), fsync="sometimes")
+
+    def test_rejects_write_and_flush_after_close(self):
+        report = AsyncReport(RecordingReport())
+        report.close()
+        with pytest.raises(ValueError):
+            report.write({"PID": "1"})
+        with pytest.raises(ValueError):
+            report.flush()
+        report.close()
+
+
+class TestCompressedCsvReport:
+
+    def test_report_with_gz_suffix_is_compressed(self, tmp_path):
+        filename = str(tmp_path / "test.csv.gz")
+        with open_report(filename, ["PID", "Status"]) as report:
+            report.write({"PID": "doi:10.5072/FK2/ABC", "Status": "OK"})
+        with open_report(filename, ["PID", "Status"], append=True) as report:
+            report.write({"PID": "doi:10.5072/FK2/DEF", "Status": "OK"})
+        with gzip.open(filename, "rt") as f:
+            assert f.read() == "PID,Status\ndoi:10.5072/FK2/ABC,OK\ndoi:10.5072/FK2/DEF,OK\n"
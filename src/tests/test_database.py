@@ -0,0 +1,118 @@
+from datastation.common.database import Database
+from datastation.dv_dataset_find_by_role_assignment import find_datasets_by_role_assignment
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def execute(self, query, params=None):
+        self.connection.events.append(('execute', query.split()[0]))
+        self.rowcount = len(self.connection.copied)
+
+    def copy(self, statement):
+        return FakeCopy(self.connection, statement)
+
+    def executemany(self, query, params_seq):
+        self.connection.events.append(('executemany', len(params_seq)))
+        self.rowcount = len(params_seq)
+
+
+class FakeCopy:
+
+    def __init__(self, connection, statement):
+        self.connection = connection
+        self.connection.events.append(('copy', statement))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def write_row(self, row):
+        self.connection.copied.append(row)
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.events = []
+        self.copied = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.events.append(('commit',))
+
+
+def create_database(commit_batch_size=1000):
+    database = Database({'host': 'localhost', 'dbname': 'dvndb', 'user': 'dvnuser', 'password': 'secret',
+                         'commit_batch_size': commit_batch_size})
+    database.connection = FakeConnection()
+    return database
+
+
+class TestDatabase:
+
+    def test_update_many_commits_per_batch(self):
+        database = create_database()
+        params = ((f'hash{i}', 1, f'user{i}') for i in range(25))
+        assert database.update_many("update builtinuser set encryptedpassword = %s", params, batch_size=10) == 25
+        assert database.connection.events == [('executemany', 10), ('commit',), ('executemany', 10), ('commit',),
+                                              ('executemany', 5), ('commit',)]
+
+    def test_update_many_uses_configured_batch_size(self):
+        database = create_database(commit_batch_size=20)
+        assert database.update_many("update builtinuser set encryptedpassword = %s", [('x',)] * 30) == 30
+        assert database.connection.events == [('executemany', 20), ('commit',), ('executemany', 10), ('commit',)]
+
+    def test_update_many_without_parameters_does_nothing(self):
+        database = create_database()
+        assert database.update_many("update builtinuser set encryptedpassword = %s", iter([])) == 0
+        assert database.connection.events == []
+
+    def test_update_from_rows_copies_rows_and_updates_in_one_transaction(self):
+        database = create_database()
+        rows = ((f'user{i}', f'hash{i}', 1) for i in range(3))
+        assert database.update_from_rows("UPDATE builtinuser SET ...", "imported_password",
+                                         "username text, encryptedpassword text, passwordencryptionversion integer",
+                                         rows) == 3
+        assert database.connection.copied == [('user0', 'hash0', 1), ('user1', 'hash1', 1), ('user2', 'hash2', 1)]
+        assert database.connection.events == [('execute', 'CREATE'), ('copy', 'COPY imported_password FROM STDIN'),
+                                              ('execute', 'UPDATE'), ('commit',)]
+
+
+class FakeStreamingDatabase(Database):
+    """ Answers stream_query from a list of rows, recording the query and parameters. """
+
+    def __init__(self, rows):
+        super().__init__({'host': 'localhost', 'dbname': 'dvndb', 'user': 'dvnuser', 'password': 'secret'})
+        self.rows = rows
+        self.queries = []
+
+    def stream_query(self, query, params=None, fetch_size=None, as_dicts=False):
+        self.queries.append((query, params))
+        yield from self.rows
+
+
+class TestFindDatasetsByRoleAssignment:
+
+    def test_prints_streamed_pids(self, capsys):
+        database = FakeStreamingDatabase([('doi:10.5072/FK2/A',), ('doi:10.5072/FK2/B',)])
+        find_datasets_by_role_assignment(database, '@user1=curator')
+        assert capsys.readouterr().out == 'doi:10.5072/FK2/A\ndoi:10.5072/FK2/B\n'
+        assert database.queries[0][1] == ('@user1', 'curator')
+
+    def test_reports_no_datasets(self, capsys):
+        find_datasets_by_role_assignment(FakeStreamingDatabase([]), "@user1=curator")
+        assert capsys.readouterr().out == 'No datasets for user @user1 with role curator\n'
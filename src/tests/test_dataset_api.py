@@ -0,0 +1,82 @@
+from datastation.dataverse.dataset_api import DatasetApi
+from tests.fakes import FakeResponse
+
+
+class FakeDatasetSession:
+    """ Answers dataset and version requests for a single dataset, and records the requests. """
+
+    def __init__(self, version_state='DRAFT'):
+        self.version = {"versionState": version_state, "files": [{"label": "a.txt"}],
+                        "license": {"uri": "http://creativecommons.org/publicdomain/zero/1.0"}}
+        self.requests = []
+
+    def get(self, url, headers=None, params=None):
+        self.requests.append(('GET', url))
+        if url.endswith('/api/datasets/:persistentId'):
+            return FakeResponse({"id": 1, "latestVersion": self.version})
+        if url.endswith('/files'):
+            return FakeResponse(self.version['files'])
+        return FakeResponse(self.version)
+
+    def post(self, url, headers=None, params=None):
+        self.requests.append(('POST', url))
+        self.version = {**self.version, "versionState": "RELEASED"}
+        return FakeResponse({})
+
+    def put(self, url, headers=None, params=None, data=None):
+        self.requests.append(('PUT', url))
+        return FakeResponse({})
+
+
+def dataset_api(session):
+    return DatasetApi("doi:10.5072/FK2/A", "http://localhost", "xxx", None, True, session)
+
+
+class TestDatasetApi:
+
+    def test_latest_version_is_read_once(self):
+        session = FakeDatasetSession()
+        api = dataset_api(session)
+        assert api.is_draft()
+        assert api.get_metadata()['license']['uri'] == "http://creativecommons.org/publicdomain/zero/1.0"
+        assert api.get_files() == [{"label": "a.txt"}]
+        assert api.get()['versionState'] == 'DRAFT'
+        assert len(session.requests) == 1
+
+    def test_is_draft_uses_cached_latest_version(self):
+        session = FakeDatasetSession()
+        api = dataset_api(session)
+        api.get_metadata()
+        assert api.is_draft()
+        assert session.requests == [('GET', 'http://localhost/api/datasets/:persistentId/versions/:latest')]
+
+    def test_other_versions_are_cached_separately(self):
+        session = FakeDatasetSession()
+        api = dataset_api(session)
+        api.is_draft()
+        api.get_metadata(':latest-published')
+        api.get_metadata(':latest-published')
+        assert len(session.requests) == 2
+
+    def test_publish_invalidates_cache(self):
+        session = FakeDatasetSession()
+        api = dataset_api(session)
+        assert api.is_draft()
+        api.publish()
+        assert not api.is_draft()
+        assert [method for method, _ in session.requests] == ['GET', 'POST', 'GET']
+
+    def test_edit_metadata_invalidates_cache(self):
+        session = FakeDatasetSession()
+        api = dataset_api(session)
+        api.get_metadata()
+        api.edit_metadata(data='{}')
+        api.get_metadata()
+        assert [method for method, _ in session.requests] == ['GET', 'PUT', 'GET']
+
+    def test_dry_run_does_not_fill_cache(self):
+        session = FakeDatasetSession()
+        api = dataset_api(session)
+        assert api.is_draft(dry_run=True) is None
+        assert api.is_draft()
+        assert len(session.requests) == 1
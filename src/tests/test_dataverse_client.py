@@ -0,0 +1,49 @@
+import atexit
+import logging
+
+from datastation.common.rate_limiter import RateLimitedAdapter
+from datastation.dataverse import dataverse_client
+from datastation.dataverse.dataverse_client import DataverseClient
+
+
+class TestDataverseClient:
+    cfg = {'server_url': 'https://demo.archaeology.datastations.nl', 'api_token': 'xxx', 'safety_latch': 'ON',
+           'db': {}}
+
+    def test_api_objects_share_one_session(self):
+        client = DataverseClient(config=self.cfg)
+        sessions = [client.dataset('doi:10.5072/FK2/8KQW3Y').session, client.dataverse('root').session,
+                    client.search_api().session, client.file(1).session, client.metrics().session,
+                    client.banner().session, client.built_in_users('key').session]
+        assert all(session is client.session for session in sessions)
+
+    def test_session_sends_api_token(self):
+        client = DataverseClient(config=self.cfg)
+        assert client.session.headers['X-Dataverse-key'] == 'xxx'
+
+    def test_pool_size_is_configurable(self):
+        client = DataverseClient(config={**self.cfg, 'http_pool_maxsize': 32})
+        assert client.session.get_adapter('https://demo.archaeology.datastations.nl')._pool_maxsize == 32
+
+    def test_rate_limit_applies_to_session(self):
+        client = DataverseClient(config={**self.cfg, 'rate_limit': {'requests_per_second': 5}})
+        adapter = client.session.get_adapter('https://demo.archaeology.datastations.nl')
+        assert isinstance(adapter, RateLimitedAdapter)
+        assert adapter.rate_limiter is client.rate_limiter
+
+    def test_clients_do_not_register_exit_handlers(self, monkeypatch):
+        registered = []
+        monkeypatch.setattr(atexit, 'register', registered.append)
+        for _ in range(3):
+            DataverseClient(config=self.cfg)
+        assert registered == []
+
+    def test_close_logs_retry_summary_once(self, caplog):
+        caplog.set_level(logging.INFO)
+        with DataverseClient(config=self.cfg) as client:
+            client.retry_statistics.gave_up = 1
+            assert client in dataverse_client._open_clients
+        assert client not in dataverse_client._open_clients
+        client.close()
+        dataverse_client._log_retry_summaries()
+        assert caplog.text.count('gave up on 1') == 1
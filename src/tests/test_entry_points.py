@@ -0,0 +1,35 @@
+import importlib
+import os
+import re
+
+import pytest
+
+pyproject = os.path.join(os.path.dirname(__file__), '..', '..', 'pyproject.toml')
+
+
+def read_entry_points():
+    """ Returns the (script name, module) pairs of the [tool.poetry.scripts] section of pyproject.toml. """
+    with open(pyproject, 'r') as f:
+        scripts_section = f.read().split('[tool.poetry.scripts]')[1].split('\n[')[0]
+    return re.findall(r'^([\w-]+)\s*=\s*"([\w.]+):main"', scripts_section, re.MULTILINE)
+
+
+entry_points = read_entry_points()
+
+
+class TestEntryPoints:
+
+    def test_entry_points_are_found(self):
+        assert len(entry_points) > 20
+
+    @pytest.mark.parametrize('script, module', entry_points, ids=[script for script, _ in entry_points])
+    def test_help_builds_the_parser(self, script, module, tmp_path, monkeypatch, capsys):
+        # init() instantiates the example configuration in the working directory
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv('HOME', str(tmp_path))
+        monkeypatch.setattr('sys.argv', [script, '--help'])
+        main = importlib.import_module(module).main
+        with pytest.raises(SystemExit) as exit_info:
+            main()
+        assert exit_info.value.code == 0
+        assert 'usage:' in capsys.readouterr().out
@@ -0,0 +1,165 @@
+import argparse
+import gzip
+import json
+import tarfile
+from datetime import datetime
+
+import pytest
+
+from datastation.common.batch_processing import BatchProcessor
+from datastation.dataverse.export_archive import ExportArchive, get_archive_format, get_index_filename, \
+    get_exported_since, read_index, TAR, JSONL
+from datastation.dv_dataset_get_metadata_export import export_metadata
+from tests.fakes import FakeExportDataverseClient
+
+exports = {f'doi:10.5072/FK2/{i:03d}': f'<dataset id="{i}">{"x" * (i * 100)}</dataset>' for i in range(5)}
+
+
+def write_archive(filename, previous_index=None, archived_exports=None, started_at=None):
+    archived_exports = archived_exports if archived_exports is not None else exports
+    with ExportArchive(filename, 'ddi', 'xml', previous_index, started_at=started_at) as archive:
+        return [archive.add(pid, export) for pid, export in archived_exports.items()]
+
+
+def archive_args(archive, previous_archive=None, skip_unmodified=False):
+    return argparse.Namespace(exporter='ddi', archive=str(archive),
+                              previous_archive=str(previous_archive) if previous_archive is not None else None,
+                              skip_unmodified=skip_unmodified, compression_level=None, dry_run=False)
+
+
+def read_export(directory, row):
+    with open(directory / row['Archive'], 'rb') as f:
+        f.seek(int(row['Offset']))
+        return f.read(int(row['Size'])).decode('utf-8')
+
+
+class TestExportArchive:
+
+    def test_archive_format_follows_suffix(self):
+        assert get_archive_format('exports.tar') == TAR
+        assert get_archive_format('exports.tar.zst') == TAR
+        assert get_archive_format('exports.jsonl.gz') == JSONL
+        with pytest.raises(ValueError):
+            get_archive_format('exports.zip')
+
+    def test_tar_archive_has_member_per_export_at_indexed_offset(self, tmp_path):
+        filename = str(tmp_path / 'exports.tar')
+        write_archive(filename)
+        index = read_index(filename)
+        with tarfile.open(filename) as tar:
+            assert tar.getnames() == [f"{pid.replace('/', '_')}.xml" for pid in exports.keys()]
+        with open(filename, 'rb') as f:
+            data = f.read()
+        for pid, export in exports.items():
+            offset, size = int(index[pid]['Offset']), int(index[pid]['Size'])
+            assert data[offset:offset + size].decode('utf-8') == export
+
+    def test_compressed_jsonl_archive_has_line_per_export_at_indexed_offset(self, tmp_path):
+        filename = str(tmp_path / 'exports.jsonl.gz')
+        write_archive(filename)
+        index = read_index(filename)
+        with gzip.open(filename, 'rb') as f:
+            data = f.read()
+        for pid, export in exports.items():
+            offset, size = int(index[pid]['Offset']), int(index[pid]['Size'])
+            assert json.loads(data[offset:offset + size]) == {'pid': pid, 'exporter': 'ddi', 'export': export}
+
+    def test_exports_unchanged_since_previous_archive_are_skipped(self, tmp_path):
+        previous = str(tmp_path / 'previous.tar')
+        write_archive(previous)
+        changed_exports = {**exports, 'doi:10.5072/FK2/002': '<dataset id="2">changed</dataset>'}
+        filename = str(tmp_path / 'exports.tar')
+        assert write_archive(filename, read_index(previous), changed_exports) == [False, False, True, False, False]
+        with tarfile.open(filename) as tar:
+            assert tar.getnames() == ['doi:10.5072_FK2_002.xml']
+            assert tar.extractfile('doi:10.5072_FK2_002.xml').read() == b'<dataset id="2">changed</dataset>'
+
+    def test_index_points_at_archive_that_holds_unchanged_export(self, tmp_path):
+        write_archive(str(tmp_path / 'first.tar'), started_at='2024-01-01T00:00:00Z')
+        changed_exports = {**exports, 'doi:10.5072/FK2/002': '<dataset id="2">changed</dataset>'}
+        write_archive(str(tmp_path / 'second.tar'), read_index(str(tmp_path / 'first.tar')), changed_exports,
+                      started_at='2024-02-01T00:00:00Z')
+        write_archive(str(tmp_path / 'third.tar'), read_index(str(tmp_path / 'second.tar')), changed_exports,
+                      started_at='2024-03-01T00:00:00Z')
+        index = read_index(str(tmp_path / 'third.tar'))
+        assert list(index.keys()) == list(exports.keys())
+        assert [row['Archive'] for row in index.values()] == ['first.tar', 'first.tar', 'second.tar', 'first.tar',
+                                                               'first.tar']
+        assert get_exported_since(index) == '2024-03-01T00:00:00Z'
+        for pid, export in changed_exports.items():
+            assert read_export(tmp_path, index[pid]) == export
+
+    def test_keep_copies_previous_row_without_export(self, tmp_path):
+        write_archive(str(tmp_path / 'first.tar'))
+        with ExportArchive(str(tmp_path / 'second.tar'), 'ddi', 'xml', read_index(str(tmp_path / 'first.tar')),
+                           started_at='2024-02-01T00:00:00Z') as archive:
+            assert archive.keep('doi:10.5072/FK2/001')
+            assert not archive.keep('doi:10.5072/FK2/999')
+        index = read_index(str(tmp_path / 'second.tar'))
+        assert list(index.keys()) == ['doi:10.5072/FK2/001']
+        assert index['doi:10.5072/FK2/001']['Archive'] == 'first.tar'
+        assert index['doi:10.5072/FK2/001']['Exported'] == '2024-02-01T00:00:00Z'
+        with tarfile.open(str(tmp_path / 'second.tar')) as tar:
+            assert tar.getnames() == []
+
+    def test_keep_remaining_keeps_exports_neither_added_nor_kept(self, tmp_path):
+        write_archive(str(tmp_path / 'first.tar'))
+        with ExportArchive(str(tmp_path / 'second.tar'), 'ddi', 'xml', read_index(str(tmp_path / 'first.tar'))) \
+                as archive:
+            archive.add('doi:10.5072/FK2/001', '<dataset id="1">changed</dataset>')
+            archive.keep_remaining()
+        index = read_index(str(tmp_path / 'second.tar'))
+        assert sorted(index.keys()) == list(exports.keys())
+        assert [pid for pid, row in index.items() if row['Archive'] == 'second.tar'] == ['doi:10.5072/FK2/001']
+
+    def test_index_without_archive_and_exported_columns_points_at_its_archive(self, tmp_path):
+        with open(get_index_filename(str(tmp_path / 'old.tar')), 'w') as f:
+            f.write('PID,Exporter,Name,Offset,Size,Sha256\n'
+                    'doi:10.5072/FK2/000,ddi,doi:10.5072_FK2_000.xml,512,10,abc\n')
+        index = read_index(str(tmp_path / 'old.tar'))
+        assert index['doi:10.5072/FK2/000']['Archive'] == 'old.tar'
+        assert get_exported_since(index) is None
+
+    def test_export_metadata_fetches_every_export_by_default(self, tmp_path):
+        pids = list(exports.keys())
+        client = FakeExportDataverseClient(pids, exports)
+        batch_processor = BatchProcessor(wait=0)
+        export_metadata(archive_args(tmp_path / 'first.tar'), client, batch_processor, pids)
+        client.fetched.clear()
+        export_metadata(archive_args(tmp_path / 'second.tar', tmp_path / 'first.tar'), client, batch_processor, pids)
+        assert sorted(client.fetched) == pids
+        assert client.search.calls == []
+        assert client.db.queries == []
+        assert list(read_index(str(tmp_path / 'second.tar')).keys()) == pids
+
+    def test_export_metadata_skips_datasets_not_modified_in_database(self, tmp_path):
+        pids = list(exports.keys())
+        client = FakeExportDataverseClient(pids, exports)
+        batch_processor = BatchProcessor(wait=0)
+        export_metadata(archive_args(tmp_path / 'first.tar'), client, batch_processor, pids)
+
+        client.fetched.clear()
+        client.db.rows = [('doi:10.5072/FK2/002',)]
+        export_metadata(archive_args(tmp_path / 'second.tar', tmp_path / 'first.tar', skip_unmodified=True), client,
+                        batch_processor, pids)
+        assert client.fetched == ['doi:10.5072/FK2/002']
+        since = get_exported_since(read_index(str(tmp_path / 'first.tar')))
+        assert client.db.queries[0][1] == (datetime.fromisoformat(since.replace('Z', '')),)
+        assert list(read_index(str(tmp_path / 'second.tar')).keys()) == pids
+
+    def test_export_metadata_keeps_unmodified_exports_only_if_previous_archive_is_current(self, tmp_path):
+        pids = list(exports.keys())
+        client = FakeExportDataverseClient(pids, exports)
+        batch_processor = BatchProcessor(wait=0)
+        export_metadata(archive_args(tmp_path / 'first.tar'), client, batch_processor, pids)
+        since = get_exported_since(read_index(str(tmp_path / 'first.tar')))
+
+        modified = ['doi:10.5072/FK2/002']
+        export_metadata(archive_args(tmp_path / 'second.tar', tmp_path / 'first.tar'), client, batch_processor,
+                        modified, unmodified_since=since)
+        assert list(read_index(str(tmp_path / 'second.tar')).keys()) == \
+               ['doi:10.5072/FK2/002'] + [pid for pid in pids if pid not in modified]
+
+        export_metadata(archive_args(tmp_path / 'third.tar', tmp_path / 'first.tar'), client, batch_processor,
+                        modified, unmodified_since='9999-01-01T00:00:00Z')
+        assert list(read_index(str(tmp_path / 'third.tar')).keys()) == modified
@@ -0,0 +1,64 @@
+import argparse
+from datetime import datetime
+
+from datastation.common.batch_processing import BatchProcessor
+from datastation.dataverse.export_manifest import ExportManifest, find_pids_modified_in_database, \
+    find_pids_modified_in_search, datasets_modified_since_query
+from datastation.dv_dataset_get_metadata_export import export_changed_metadata
+from tests.fakes import FakeDatabase, FakeSearchApi, FakeExportDataverseClient
+
+
+def export_args(output_dir):
+    return argparse.Namespace(exporter='ddi', changed='search', output_dir=str(output_dir), archive=None,
+                              previous_archive=None, compress=None, compression_level=None, dry_run=False)
+
+
+class TestExportManifest:
+
+    def test_record_returns_whether_export_changed(self, tmp_path):
+        with ExportManifest(str(tmp_path / 'manifest.db')) as manifest:
+            assert manifest.record('doi:10.5072/FK2/A', 'ddi', '<a/>')
+            assert not manifest.record('doi:10.5072/FK2/A', 'ddi', '<a/>')
+            assert manifest.record('doi:10.5072/FK2/A', 'ddi', '<b/>')
+            assert manifest.record('doi:10.5072/FK2/A', 'dataverse_json', '<b/>')
+
+    def test_last_run_is_kept_between_sessions(self, tmp_path):
+        with ExportManifest(str(tmp_path / 'manifest.db')) as manifest:
+            assert manifest.get_last_run('ddi') is None
+            manifest.record('doi:10.5072/FK2/A', 'ddi', '<a/>')
+            manifest.complete_run('ddi', '2024-01-01T00:00:00Z')
+        with ExportManifest(str(tmp_path / 'manifest.db')) as manifest:
+            assert manifest.get_last_run('ddi') == '2024-01-01T00:00:00Z'
+            assert manifest.get_hash('doi:10.5072/FK2/A', 'ddi') is not None
+
+    def test_find_pids_modified_in_search_filters_on_date_sort(self):
+        search_api = FakeSearchApi(['doi:10.5072/FK2/A'])
+        assert list(find_pids_modified_in_search(search_api, '2024-01-01T00:00:00Z')) == ['doi:10.5072/FK2/A']
+        assert search_api.calls[0]['filter_queries'] == ['dateSort:[2024-01-01T00:00:00Z TO *]']
+        assert search_api.calls[0]['sort'] == 'date'
+
+    def test_find_pids_modified_in_database_queries_modification_time(self):
+        database = FakeDatabase([('doi:10.5072/FK2/A',)])
+        assert list(find_pids_modified_in_database(database, '2024-01-01T00:00:00Z')) == ['doi:10.5072/FK2/A']
+        assert database.queries == [(datasets_modified_since_query, (datetime(2024, 1, 1),))]
+        list(find_pids_modified_in_database(database, None))
+        assert database.queries[1][1] == (datetime.min,)
+
+    def test_export_changed_metadata_moves_watermark_only_if_complete(self, tmp_path):
+        pids = ['doi:10.5072/FK2/A', 'doi:10.5072/FK2/B']
+        client = FakeExportDataverseClient(pids, {'doi:10.5072/FK2/A': '<a/>'})
+        batch_processor = BatchProcessor(wait=0, fail_on_first_error=False)
+        with ExportManifest(str(tmp_path / 'manifest.db')) as manifest:
+            export_changed_metadata(export_args(tmp_path / 'out'), client, batch_processor, manifest)
+            assert manifest.get_last_run('ddi') is None
+            assert (tmp_path / 'out' / 'doi:10.5072_FK2_A.xml').read_text() == '<a/>'
+
+            client.exports['doi:10.5072/FK2/B'] = '<b/>'
+            export_changed_metadata(export_args(tmp_path / 'out'), client, batch_processor, manifest)
+            assert manifest.get_last_run('ddi') is not None
+            assert client.search.calls[1]['filter_queries'] is None
+            assert (tmp_path / 'out' / 'doi:10.5072_FK2_B.xml').read_text() == '<b/>'
+
+            last_run = manifest.get_last_run('ddi')
+            export_changed_metadata(export_args(tmp_path / 'out'), client, batch_processor, manifest)
+            assert client.search.calls[2]['filter_queries'] == [f"dateSort:[{last_run} TO *]"]
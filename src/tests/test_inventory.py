@@ -0,0 +1,90 @@
+from datetime import datetime
+
+from datastation.dataverse.search_api import SearchApi
+from datastation.inventory.inventory import Inventory, DATABASE, SEARCH
+from tests.fakes import FakeSearchSession, FakeDatabase
+
+
+def search_item(pid, state='RELEASED', alias='root', updated='2024-01-01T10:00:00Z'):
+    return {"global_id": pid, "entity_id": 1, "versionState": state, "majorVersion": 1, "minorVersion": 0,
+            "identifier_of_dataverse": alias, "updatedAt": updated, "description": "not stored"}
+
+
+def database_of(records):
+    return FakeDatabase(records, modified=lambda r: r[7])
+
+
+def record(pid, modified, state='RELEASED', size=100, alias='root'):
+    return pid, 1, state, 1, 0, size, alias, modified
+
+
+class TestInventory:
+
+    def test_sync_from_search_adds_and_removes_datasets(self, tmp_path):
+        search_api = SearchApi("http://localhost", "xxx", FakeSearchSession(
+            [search_item('doi:10.5072/FK2/A'), search_item('doi:10.5072/FK2/B', state='DRAFT')]))
+        with Inventory(str(tmp_path / 'inventory.db')) as inventory:
+            assert inventory.sync_from_search(search_api) == 2
+            assert list(inventory.select_pids()) == ['doi:10.5072/FK2/A', 'doi:10.5072/FK2/B']
+            assert list(inventory.select_pids(version_state='DRAFT')) == ['doi:10.5072/FK2/B']
+
+            search_api.session.items = [search_item('doi:10.5072/FK2/B')]
+            inventory.sync_from_search(search_api)
+            assert list(inventory.select_pids()) == ['doi:10.5072/FK2/B']
+            assert list(inventory.select_pids(version_state='DRAFT')) == []
+
+    def test_sync_from_search_crawls_all_datasets_every_time(self, tmp_path):
+        search_api = SearchApi("http://localhost", "xxx", FakeSearchSession([search_item('doi:10.5072/FK2/A')]))
+        with Inventory(str(tmp_path / 'inventory.db')) as inventory:
+            inventory.sync_from_search(search_api)
+            assert inventory.get_watermark(SEARCH) is None
+
+            # A draft of a released dataset does not move its date sort, so it is only found by a full crawl
+            search_api.session.items = [search_item('doi:10.5072/FK2/A', state='DRAFT')]
+            inventory.sync_from_search(search_api)
+            assert all('fq' not in params for params in search_api.session.params)
+            assert list(inventory.select_pids(version_state='DRAFT')) == ['doi:10.5072/FK2/A']
+
+    def test_sync_from_database_is_incremental(self, tmp_path):
+        database = database_of([record('doi:10.5072/FK2/A', datetime(2024, 1, 1)),
+                                 record('doi:10.5072/FK2/B', datetime(2024, 2, 1))])
+        with Inventory(str(tmp_path / 'inventory.db')) as inventory:
+            assert inventory.sync_from_database(database) == 2
+            assert inventory.get_watermark(DATABASE) == '2024-02-01T00:00:00'
+
+            database.rows.append(record('doi:10.5072/FK2/C', datetime(2024, 3, 1), size=5000))
+            assert inventory.sync_from_database(database) == 1
+            assert database.queries[-1][1] == (datetime(2024, 2, 1),)
+            assert list(inventory.select_pids(min_storage_size=1000)) == ['doi:10.5072/FK2/C']
+
+            # nothing changed: the watermark stays
+            assert inventory.sync_from_database(database) == 0
+            assert inventory.get_watermark(DATABASE) == '2024-03-01T00:00:00'
+
+    def test_full_sync_from_database_removes_deleted_datasets(self, tmp_path):
+        database = database_of([record('doi:10.5072/FK2/A', datetime(2024, 1, 1)),
+                                 record('doi:10.5072/FK2/B', datetime(2024, 2, 1))])
+        with Inventory(str(tmp_path / 'inventory.db')) as inventory:
+            inventory.sync_from_database(database)
+            database.rows.pop(0)
+            inventory.sync_from_database(database, full=True)
+            assert database.queries[-1][1] == (datetime.min,)
+            assert list(inventory.select_pids()) == ['doi:10.5072/FK2/B']
+
+    def test_search_sync_keeps_storage_size_from_database(self, tmp_path):
+        with Inventory(str(tmp_path / 'inventory.db')) as inventory:
+            inventory.sync_from_database(database_of([record('doi:10.5072/FK2/A', datetime(2024, 1, 1), size=5000)]))
+            inventory.sync_from_search(SearchApi("http://localhost", "xxx", FakeSearchSession(
+                [search_item('doi:10.5072/FK2/A')])))
+            assert list(inventory.select_pids(min_storage_size=1000)) == ['doi:10.5072/FK2/A']
+
+    def test_select_pids_combines_predicates(self, tmp_path):
+        database = database_of([record('doi:10.5072/FK2/A', datetime(2024, 1, 1), alias='a'),
+                                 record('doi:10.5072/FK2/B', datetime(2024, 2, 1), alias='a'),
+                                 record('doi:10.5072/FK2/C', datetime(2024, 3, 1), alias='b')])
+        with Inventory(str(tmp_path / 'inventory.db')) as inventory:
+            inventory.sync_from_database(database)
+            assert list(inventory.select_pids(dataverse_alias='a', modified_since='2024-01-15T00:00:00Z')) == [
+                'doi:10.5072/FK2/B']
+            assert list(inventory.select_pids(modified_since='2024-02-01')) == ['doi:10.5072/FK2/B',
+                                                                               'doi:10.5072/FK2/C']
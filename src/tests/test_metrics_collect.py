@@ -1,6 +1,100 @@
+import io
+import os
+import tempfile
 import unittest
 
-from datastation.dataverse.metrics_collect import extract_size_str
+from datastation.common.result_writer import CsvResultWriter
+from datastation.dataverse.metrics_collect import extract_size_str, MetricsCollect
+from tests.fakes import FakeConcurrentDataverseClient, FakeDatabase, FakeMetricsApi
+
+
+class FakeDataverseApi:
+
+    def __init__(self, client, alias):
+        self.client = client
+        self.alias = alias
+
+    def get_storage_size(self):
+        return self.client.call(f"Total size of the files stored in this dataverse: {len(self.alias)},000 bytes")
+
+
+class FakeTreeDataverseApi:
+    """ Answers from a tree in which the node with id n directly contains n datasets of n bytes each (none if n < 0). """
+
+    def __init__(self, client, alias):
+        self.client = client
+        self.node = client.nodes[alias]
+
+    def get_storage_size(self):
+        self.client.storage_size_calls.append(self.node['alias'])
+        return f"Total size of the files stored in this dataverse: {self.client.total(self.node):,} bytes"
+
+    def get_contents(self):
+        n = self.node['id']
+        return [{'type': 'dataverse', 'id': child['id'], 'title': child['name']} for child in
+                self.node.get('children', [])] + \
+            [{'type': 'dataset', 'id': 1000 * n + i, 'protocol': 'doi', 'authority': '10.5072',
+              'identifier': f'FK2/{n}-{i}'} for i in range(n)]
+
+
+class FakeTreeDataverseClient:
+
+    def __init__(self, tree):
+        self.server_url = 'http://localhost'
+        self.tree = tree
+        self.nodes = {}
+        self.storage_size_calls = []
+        for node in MetricsCollect(None, '-', 'csv').iter_post_order(tree):
+            self.nodes[node['alias']] = node
+            self.nodes[str(node['id'])] = node
+
+    def total(self, node):
+        return max(node['id'], 0) ** 2 + sum(self.total(child) for child in node.get('children', []))
+
+    def metrics(self):
+        return FakeMetricsApi(self.tree)
+
+    def database(self):
+        # The rows of the storage size query
+        return FakeDatabase([(node['id'], self.total(node))
+                             for node in MetricsCollect(None, '-', 'csv').iter_post_order(self.tree)
+                             if self.total(node) > 0])
+
+    def dataverse(self, alias):
+        return FakeTreeDataverseApi(self, alias)
+
+
+def create_tree(breadth, depth, alias='root'):
+    node = {'alias': alias, 'name': alias}
+    if depth > 0:
+        node['children'] = [create_tree(breadth, depth - 1, f'{alias}-{i}') for i in range(breadth)]
+    return node
+
+
+def number_tree(tree, next_id=0):
+    tree['id'] = next_id
+    next_id += 1
+    for child in tree.get('children', []):
+        next_id = number_tree(child, next_id)
+    return next_id
+
+
+def collect_usage(client, tmp_file, max_depth, bottom_up=False, workers=1, from_database=False, size_mixed=False):
+    collector = MetricsCollect(client, tmp_file, 'csv', workers=workers)
+    collector.collect_storage_usage(max_depth, include_grand_total=True, bottom_up=bottom_up,
+                                    from_database=from_database, size_mixed=size_mixed)
+    with open(tmp_file) as f:
+        return f.read().splitlines()
+
+
+def collect_rows(workers, tree, max_depth):
+    client = FakeConcurrentDataverseClient(FakeDataverseApi)
+    collector = MetricsCollect(client, '-', 'csv', workers=workers)
+    out = io.StringIO()
+    collector.writer = CsvResultWriter(headers=['depth', 'parentalias', 'alias', 'name', 'storagesize'],
+                                       out_stream=out)
+    collector.collect_children_sizes(tree, max_depth)
+    return out.getvalue().splitlines(), client.max_active
 
 
 class TestMetricsCollect(unittest.TestCase):
@@ -21,6 +115,70 @@ class TestMetricsCollect(unittest.TestCase):
         with self.assertRaises(AttributeError):
             extract_size_str("12345 bytes")
 
+    def test_concurrent_collection_writes_rows_in_tree_order(self):
+        tree = create_tree(breadth=4, depth=3)
+        sequential, _ = collect_rows(1, tree, max_depth=3)
+        concurrent, max_active = collect_rows(4, tree, max_depth=3)
+        self.assertEqual(len(sequential), 1 + 4 + 16 + 64)
+        self.assertEqual(concurrent, sequential)
+        self.assertLessEqual(max_active, 4)
+
+    def test_max_depth_limits_traversal(self):
+        rows, _ = collect_rows(3, create_tree(breadth=3, depth=3), max_depth=1)
+        self.assertEqual(rows[1:], [f'1,root,root-{i},root-{i},6000' for i in range(3)])
+
+    def test_bottom_up_gives_the_same_sizes_as_top_down(self):
+        tree = create_tree(breadth=3, depth=3)
+        number_tree(tree)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_file = os.path.join(tmp_dir, 'usage.csv')
+            top_down = collect_usage(FakeTreeDataverseClient(tree), tmp_file, max_depth=2, bottom_up=False)
+            bottom_up_client = FakeTreeDataverseClient(tree)
+            bottom_up = collect_usage(bottom_up_client, tmp_file, max_depth=2, bottom_up=True, workers=3,
+                                      size_mixed=True)
+        self.assertEqual(bottom_up, top_down)
+        # Every dataverse costs at most one storage size call, and the root, which directly contains no datasets,
+        # none at all
+        sized = [a for a, n in bottom_up_client.nodes.items() if n['id'] > 0 and not a.isdigit()]
+        self.assertEqual(sorted(bottom_up_client.storage_size_calls), sorted(sized))
+
+    def test_bottom_up_sizes_mixed_dataverses_only_on_request(self):
+        tree = {'alias': 'root', 'name': 'root', 'children': [create_tree(breadth=2, depth=1, alias='a')]}
+        number_tree(tree)
+        tree['id'] = 50  # the root directly contains 50 datasets
+        client = FakeTreeDataverseClient(tree)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with self.assertRaisesRegex(ValueError, 'contains datasets as well as dataverses'):
+                collect_usage(client, os.path.join(tmp_dir, 'usage.csv'), max_depth=2, bottom_up=True)
+            client.storage_size_calls.clear()
+            rows = collect_usage(client, os.path.join(tmp_dir, 'usage.csv'), max_depth=2, bottom_up=True,
+                                 size_mixed=True)
+        self.assertEqual(sorted(client.storage_size_calls), ['a', 'a-0', 'a-1', 'root'])
+        self.assertEqual(rows[1], f'0,-,root,root,{client.total(tree)}')
+
+    def test_bottom_up_sizes_only_the_leaves_if_no_dataverse_is_mixed(self):
+        tree = create_tree(breadth=2, depth=2)
+        number_tree(tree)
+        for node in MetricsCollect(None, '-', 'csv').iter_post_order(tree):
+            if 'children' in node:
+                node['id'] = -node['id']  # no datasets in the dataverses with children
+        client = FakeTreeDataverseClient(tree)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            rows = collect_usage(client, os.path.join(tmp_dir, 'usage.csv'), max_depth=2, bottom_up=True)
+        self.assertEqual(sorted(client.storage_size_calls), ['root-0-0', 'root-0-1', 'root-1-0', 'root-1-1'])
+        self.assertEqual(rows[1], f'0,-,root,root,{client.total(tree)}')
+
+    def test_database_gives_the_same_sizes_as_the_api(self):
+        tree = create_tree(breadth=3, depth=3)
+        number_tree(tree)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_file = os.path.join(tmp_dir, 'usage.csv')
+            from_api = collect_usage(FakeTreeDataverseClient(tree), tmp_file, max_depth=3)
+            client = FakeTreeDataverseClient(tree)
+            from_database = collect_usage(client, tmp_file, max_depth=3, from_database=True)
+        self.assertEqual(from_database, from_api)
+        self.assertEqual(client.storage_size_calls, [])
+
 
 if __name__ == '__main__':
     unittest.main()
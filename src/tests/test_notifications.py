@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import pytest
+
+from datastation.dataverse.notifications import Notifications, count_statement, next_batch_end_statement, \
+    delete_batch_statement
+
+
+class FakeNotificationsDatabase:
+    """ Answers the statements of the batched cleanup from a list of (id, senddate) notifications. """
+
+    def __init__(self, notifications, cutoff):
+        self.notifications = notifications
+        self.cutoff = cutoff
+        self.statements = []
+        self.prepared = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def query(self, query, params=None, prepare=None):
+        if prepare:
+            self.prepared.add(query)
+        if query == count_statement:
+            return [(len([n for n in self.notifications if n[1] < self.cutoff]), self.cutoff)]
+        if query == next_batch_end_statement:
+            cutoff, last_id, batch_size = params
+            ids = sorted(i for i, senddate in self.notifications if senddate < cutoff and i > last_id)[:batch_size]
+            return [(ids[-1] if ids else None,)]
+        raise ValueError(query)
+
+    def update(self, query, params, prepare=None):
+        assert query == delete_batch_statement
+        if prepare:
+            self.prepared.add(query)
+        cutoff, first, last = params
+        to_delete = [n for n in self.notifications if n[1] < cutoff and first < n[0] <= last]
+        self.notifications = [n for n in self.notifications if n not in to_delete]
+        self.statements.append(len(to_delete))
+        return len(to_delete)
+
+    def execute_outside_transaction(self, statement):
+        self.statements.append(statement)
+
+
+class FakeDataverseClient:
+
+    def __init__(self, database):
+        self.db = database
+
+    def database(self):
+        return self.db
+
+
+def notifications():
+    # odd ids are old
+    return [(i, datetime(2020, 1, 1) if i % 2 == 1 else datetime(2024, 1, 1)) for i in range(1, 26)]
+
+
+class TestNotifications:
+
+    def test_cleanup_in_batches_deletes_old_notifications(self):
+        database = FakeNotificationsDatabase(notifications(), cutoff=datetime(2023, 1, 1))
+        Notifications(FakeDataverseClient(database)).cleanup_in_batches(30, batch_size=5, pause=0, vacuum=True)
+        assert [i for i, _ in database.notifications] == list(range(2, 26, 2))
+        assert database.statements == [5, 5, 3, "VACUUM (ANALYZE) usernotification"]
+        assert database.prepared == {next_batch_end_statement, delete_batch_statement}
+
+    def test_cleanup_in_batches_can_be_run_again_after_interrupt(self, monkeypatch):
+        database = FakeNotificationsDatabase(notifications(), cutoff=datetime(2023, 1, 1))
+
+        def interrupt(seconds):
+            raise KeyboardInterrupt()
+
+        monkeypatch.setattr('time.sleep', interrupt)
+        with pytest.raises(KeyboardInterrupt):
+            Notifications(FakeDataverseClient(database)).cleanup_in_batches(30, batch_size=5, pause=0)
+        assert len(database.notifications) == 20
+        monkeypatch.undo()
+        Notifications(FakeDataverseClient(database)).cleanup_in_batches(30, batch_size=5, pause=0)
+        assert [i for i, _ in database.notifications] == list(range(2, 26, 2))
+
+    def test_dry_run_deletes_nothing(self):
+        database = FakeNotificationsDatabase(notifications(), cutoff=datetime(2023, 1, 1))
+        Notifications(FakeDataverseClient(database), dry_run=True).cleanup_in_batches(30, batch_size=5, pause=0)
+        assert len(database.notifications) == 25
+        assert database.statements == []
@@ -0,0 +1,148 @@
+import io
+import os
+import tempfile
+import unittest
+
+from datastation.common.result_writer import CsvResultWriter
+from datastation.dataverse.permissions_collect import PermissionsCollect, groups_query, roles_query, \
+    assignments_query
+from tests.fakes import FakeConcurrentDataverseClient, FakeMetricsApi
+
+
+class FakeDataverseApi:
+
+    def __init__(self, client, alias):
+        self.client = client
+        self.alias = alias
+
+    def get_groups(self):
+        return self.client.call([{'identifier': f'{self.alias}-group', 'containedRoleAssignees': ['@user1']}])
+
+    def get_roles(self):
+        return self.client.call([{'alias': f'{self.alias}-role', 'permissions': ['EditDataset', 'PublishDataset']}])
+
+    def get_role_assignments(self):
+        return self.client.call([{'assignee': f'@{self.alias}-user', '_roleAlias': 'curator'}])
+
+
+class FakeIdDataverseApi:
+    """ Answers with permission info derived from the id of the dataverse; dataverses with an odd id have none. """
+
+    def __init__(self, dataverse_id):
+        self.id = dataverse_id
+
+    def get_groups(self):
+        if self.id % 2 == 1:
+            return []
+        return [{'identifier': f'&explicit/{self.id}-a', 'containedRoleAssignees': ['@user1', '&explicit/1-b']},
+                {'identifier': f'&explicit/{self.id}-b', 'containedRoleAssignees': []}]
+
+    def get_roles(self):
+        return [] if self.id % 2 == 1 else [{'alias': f'role{self.id}', 'permissions': ['A', 'B', 'C']}]
+
+    def get_role_assignments(self):
+        return [] if self.id % 2 == 1 else [{'assignee': f'@user{self.id}', '_roleAlias': 'curator'},
+                                             {'assignee': ':authenticated-users', '_roleAlias': 'member'}]
+
+
+class FakePermissionsDatabase:
+    """ Answers the permission queries with the same info as FakeIdDataverseApi. """
+
+    def __init__(self, ids):
+        self.ids = [i for i in ids if i % 2 == 0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def stream_query(self, query, params=None, fetch_size=1000):
+        for i in self.ids:
+            if query == groups_query:
+                yield from [(i, f'&explicit/{i}-a', 2), (i, f'&explicit/{i}-b', 0)]
+            elif query == roles_query:
+                yield i, f'role{i}', 0b10011
+            elif query == assignments_query:
+                yield from [(i, f'@user{i}', 'curator'), (i, ':authenticated-users', 'member')]
+
+
+class FakeTreeDataverseClient:
+
+    def __init__(self, tree):
+        self.server_url = 'http://localhost'
+        self.tree = tree
+        self.ids = {}
+        self.api_calls = 0
+
+        def index(node):
+            self.ids[node['alias']] = node['id']
+            for child in node.get('children', []):
+                index(child)
+
+        index(tree)
+
+    def metrics(self):
+        return FakeMetricsApi(self.tree)
+
+    def dataverse(self, alias):
+        self.api_calls += 1
+        return FakeIdDataverseApi(self.ids[alias])
+
+    def database(self):
+        return FakePermissionsDatabase(self.ids.values())
+
+
+def create_tree(breadth, depth, alias='root', ids=None):
+    ids = ids if ids is not None else iter(range(10000))
+    node = {'alias': alias, 'name': alias, 'id': next(ids)}
+    if depth > 0:
+        node['children'] = [create_tree(breadth, depth - 1, f'{alias}-{i}', ids) for i in range(breadth)]
+    return node
+
+
+def collect_rows(workers, tree):
+    client = FakeConcurrentDataverseClient(FakeDataverseApi, max_delay=0.005)
+    collector = PermissionsCollect(client, '-', 'csv', workers=workers)
+    out = io.StringIO()
+    collector.writer = CsvResultWriter(headers=['depth', 'parentalias', 'alias', 'name', 'id', 'vpath', 'groups',
+                                                'roles', 'assignments'], out_stream=out)
+    collector.collect_permissions_info(tree, tree['alias'], tree['alias'], 1)
+    return out.getvalue().splitlines(), client.max_active
+
+
+class TestPermissionsCollect(unittest.TestCase):
+
+    def test_concurrent_collection_writes_rows_in_vpath_order(self):
+        tree = create_tree(breadth=3, depth=3)
+        sequential, _ = collect_rows(1, tree)
+        concurrent, max_active = collect_rows(4, tree)
+        self.assertEqual(len(sequential), 1 + 1 + 3 + 9 + 27)
+        self.assertEqual(concurrent, sequential)
+        self.assertLessEqual(max_active, 4)
+
+    def test_row_contents(self):
+        rows, _ = collect_rows(2, create_tree(breadth=1, depth=1))
+        self.assertEqual(rows[2], '2,root,root-0,root-0,1,root > root > root-0,root-0-group (1),root-0-role (2),'
+                                  '@root-0-user (curator)')
+
+    def test_database_gives_the_same_rows_as_the_api(self):
+        tree = create_tree(breadth=3, depth=2)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_file = os.path.join(tmp_dir, 'overview.csv')
+            PermissionsCollect(FakeTreeDataverseClient(tree), tmp_file, 'csv').collect_permissions_info_overview()
+            with open(tmp_file) as f:
+                from_api = f.read()
+            client = FakeTreeDataverseClient(tree)
+            PermissionsCollect(client, tmp_file, 'csv', workers=4).collect_permissions_info_overview(
+                from_database=True)
+            with open(tmp_file) as f:
+                from_database = f.read()
+        self.assertEqual(from_database, from_api)
+        self.assertIn('"&explicit/0-a (2), &explicit/0-b (0)",role0 (3),'
+                      '"@user0 (curator), :authenticated-users (member)"', from_database)
+        self.assertEqual(client.api_calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
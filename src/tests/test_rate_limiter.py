@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from datastation.common.rate_limiter import TokenBucket, FileTokenBucket, create_rate_limiter
+
+
+class TestTokenBucket:
+
+    def test_burst_is_not_throttled(self):
+        bucket = TokenBucket(rate=1, burst=5)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        assert time.monotonic() - start < 0.1
+
+    def test_throttles_after_burst(self):
+        bucket = TokenBucket(rate=20, burst=1)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        # the first token is free, the other four take 1/20 s each
+        assert time.monotonic() - start >= 0.19
+
+    def test_is_shared_by_threads(self):
+        bucket = TokenBucket(rate=50, burst=1)
+        start = time.monotonic()
+        threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(5)]) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # 20 requests, of which 19 are throttled at 50/s
+        assert time.monotonic() - start >= 0.37
+
+    def test_rejects_non_positive_rate(self):
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+
+
+class TestFileTokenBucket:
+
+    def test_buckets_with_same_file_share_the_rate(self, tmp_path):
+        state_file = str(tmp_path / "rate-limit")
+        first = FileTokenBucket(state_file, rate=20, burst=2)
+        second = FileTokenBucket(state_file, rate=20, burst=2)
+        start = time.monotonic()
+        for _ in range(3):
+            first.acquire()
+            second.acquire()
+        # the burst of two is shared, the other four take 1/20 s each
+        assert time.monotonic() - start >= 0.19
+
+
+class TestCreateRateLimiter:
+
+    def test_returns_none_without_config(self):
+        assert create_rate_limiter(None) is None
+
+    def test_creates_file_bucket_if_state_file_configured(self, tmp_path):
+        limiter = create_rate_limiter({'requests_per_second': 5, 'shared_state_file': str(tmp_path / "state")})
+        assert isinstance(limiter, FileTokenBucket)
+        assert limiter.rate == 5
+
+    def test_creates_in_process_bucket(self):
+        limiter = create_rate_limiter({'requests_per_second': 5, 'burst': 10})
+        assert type(limiter) is TokenBucket
+        assert limiter.burst == 10
@@ -1,8 +1,10 @@
+import sys
 from io import StringIO
 
 import pytest
 
-from datastation.common.result_writer import JsonResultWriter, YamlResultWriter, CsvResultWriter
+from datastation.common.result_writer import JsonResultWriter, JsonLinesResultWriter, YamlResultWriter, \
+    CsvResultWriter, ParquetResultWriter
 
 
 class TestJsonResultWriter:
@@ -46,6 +48,57 @@ class TestJsonResultWriter:
         assert out_stream.getvalue() == '[]'
 
 
+class CountingStringIO(StringIO):
+
+    def __init__(self):
+        super().__init__()
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+
+class TestJsonLinesResultWriter:
+
+    def test_writes_result_per_line(self):
+        out_stream = StringIO()
+        writer = JsonLinesResultWriter(out_stream)
+        writer.write({"a": 1, "b": 2}, True)
+        writer.write({"a": 3, "b": 4}, False)
+        writer.close()
+        assert out_stream.getvalue() == '{"a": 1, "b": 2}\n{"a": 3, "b": 4}\n'
+
+    def test_writes_nothing_if_no_results(self):
+        out_stream = StringIO()
+        writer = JsonLinesResultWriter(out_stream)
+        writer.close()
+        assert out_stream.getvalue() == ''
+
+    def test_flushes_every_result_with_zero_interval(self):
+        out_stream = CountingStringIO()
+        writer = JsonLinesResultWriter(out_stream, flush_interval=0)
+        writer.write({"a": 1}, True)
+        writer.write({"a": 2}, False)
+        assert out_stream.flushes == 2
+
+    def test_flushes_at_most_once_per_interval(self):
+        out_stream = CountingStringIO()
+        writer = JsonLinesResultWriter(out_stream, flush_interval=3600)
+        for i in range(100):
+            writer.write({"a": i}, i == 0)
+        assert out_stream.flushes == 0
+        writer.close()
+        assert out_stream.flushes == 1
+
+    def test_flushes_only_on_close_without_interval(self):
+        out_stream = CountingStringIO()
+        writer = JsonLinesResultWriter(out_stream, flush_interval=None)
+        writer.write({"a": 1}, True)
+        assert out_stream.flushes == 0
+        writer.close()
+        assert out_stream.flushes == 1
+
+
 class TestYamlResultWriter:
 
     def test_writes_empty_object_for_empty_result(self):
@@ -100,3 +153,49 @@ class TestCsvResultWriter:
         writer.write({"a": 1, "b": 2}, False)
         assert out_stream.getvalue() == "a,b\n1,2\n"
 
+
+
+class TestParquetResultWriter:
+
+    columns = [("depth", "int64"), ("alias", "string"), ("storagesize", "int64")]
+
+    def test_writes_typed_columns(self, tmp_path):
+        pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+        writer = ParquetResultWriter(self.columns, str(tmp_path / "out.parquet"))
+        writer.write({"depth": 0, "alias": "root", "storagesize": "123456789012"}, True)
+        writer.write({}, False)
+        writer.write({"depth": "1", "alias": "sub", "storagesize": ""}, False)
+        writer.close()
+        table = pyarrow_parquet.read_table(tmp_path / "out.parquet")
+        assert [str(field.type) for field in table.schema] == ["int64", "string", "int64"]
+        assert table.to_pylist() == [{"depth": 0, "alias": "root", "storagesize": 123456789012},
+                                     {"depth": 1, "alias": "sub", "storagesize": None}]
+
+    def test_writes_row_groups(self, tmp_path):
+        pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+        writer = ParquetResultWriter(self.columns, str(tmp_path / "out.parquet"), row_group_size=10)
+        for i in range(25):
+            writer.write({"depth": 1, "alias": f"coll{i}", "storagesize": i}, i == 0)
+        writer.close()
+        parquet_file = pyarrow_parquet.ParquetFile(tmp_path / "out.parquet")
+        assert parquet_file.metadata.num_row_groups == 3
+        assert parquet_file.metadata.num_rows == 25
+        assert parquet_file.read(columns=["storagesize"]).column(0).to_pylist() == list(range(25))
+
+    def test_writes_schema_if_no_results(self, tmp_path):
+        pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+        ParquetResultWriter(self.columns, str(tmp_path / "out.parquet")).close()
+        table = pyarrow_parquet.read_table(tmp_path / "out.parquet")
+        assert table.num_rows == 0
+        assert table.column_names == ["depth", "alias", "storagesize"]
+
+    def test_rejects_unknown_keys(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        writer = ParquetResultWriter(self.columns, str(tmp_path / "out.parquet"))
+        with pytest.raises(ValueError):
+            writer.write({"depth": 0, "other": "x"}, True)
+
+    def test_missing_pyarrow_names_the_extra(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(sys.modules, "pyarrow", None)
+        with pytest.raises(ImportError, match=r"dans-datastation-tools\[parquet\]"):
+            ParquetResultWriter(self.columns, str(tmp_path / "out.parquet"))
@@ -0,0 +1,116 @@
+import io
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from datastation.common.rate_limiter import TokenBucket
+from datastation.common.retry import RetryPolicy, RetryStatistics, RetryingAdapter, parse_retry_after
+
+
+def response_with_status(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO(b'')
+    return response
+
+
+class FakeServer:
+    """ Replaces HTTPAdapter.send, answering with the given statuses (or raising the given exceptions) in turn. """
+
+    def __init__(self, monkeypatch, *outcomes):
+        self.outcomes = list(outcomes)
+        self.requests = []
+        monkeypatch.setattr(HTTPAdapter, 'send', lambda adapter, request, **kwargs: self.send(request))
+
+    def send(self, request):
+        self.requests.append(request)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return response_with_status(*outcome) if isinstance(outcome, tuple) else response_with_status(outcome)
+
+
+def send(adapter, method, url):
+    return adapter.send(requests.Request(method, url).prepare())
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr('datastation.common.retry.time.sleep', lambda seconds: sleeps.append(seconds))
+    return sleeps
+
+
+class TestRetryingAdapter:
+    url = 'https://demo.archaeology.datastations.nl/api'
+
+    def test_retries_get_after_server_error(self, monkeypatch, no_sleep):
+        server = FakeServer(monkeypatch, 502, 503, 200)
+        statistics = RetryStatistics()
+        response = send(RetryingAdapter(RetryPolicy(), statistics), 'GET', f'{self.url}/datasets/:persistentId')
+        assert response.status_code == 200
+        assert len(server.requests) == 3
+        assert statistics.retries == {'502': 1, '503': 1}
+
+    def test_retries_connection_errors(self, monkeypatch, no_sleep):
+        server = FakeServer(monkeypatch, requests.exceptions.ConnectionError("reset"), 200)
+        statistics = RetryStatistics()
+        response = send(RetryingAdapter(RetryPolicy(), statistics), 'GET', f'{self.url}/admin/index/dataset')
+        assert response.status_code == 200
+        assert statistics.retries == {'ConnectionError': 1}
+
+    def test_retries_idempotent_post(self, monkeypatch, no_sleep):
+        server = FakeServer(monkeypatch, 500, 200)
+        url = f'{self.url}/datasets/:persistentId/modifyRegistrationMetadata?persistentId=doi:10.5072/FK2/A'
+        assert send(RetryingAdapter(RetryPolicy(), RetryStatistics()), 'POST', url).status_code == 200
+        assert len(server.requests) == 2
+
+    def test_does_not_retry_other_post(self, monkeypatch, no_sleep):
+        server = FakeServer(monkeypatch, 503)
+        url = f'{self.url}/datasets/:persistentId/actions/:publish'
+        assert send(RetryingAdapter(RetryPolicy(), RetryStatistics()), 'POST', url).status_code == 503
+        assert len(server.requests) == 1
+
+    def test_does_not_retry_client_errors(self, monkeypatch, no_sleep):
+        server = FakeServer(monkeypatch, 404)
+        assert send(RetryingAdapter(RetryPolicy(), RetryStatistics()), 'GET', self.url).status_code == 404
+        assert len(server.requests) == 1
+
+    def test_gives_up_after_max_retries(self, monkeypatch, no_sleep):
+        FakeServer(monkeypatch, 500, 500, 500)
+        statistics = RetryStatistics()
+        response = send(RetryingAdapter(RetryPolicy(max_retries=2), statistics), 'GET', self.url)
+        assert response.status_code == 500
+        assert statistics.total_retries() == 2
+        assert statistics.gave_up == 1
+
+    def test_honors_retry_after(self, monkeypatch, no_sleep):
+        FakeServer(monkeypatch, (429, {'Retry-After': '7'}), 200)
+        send(RetryingAdapter(RetryPolicy(), RetryStatistics()), 'GET', self.url)
+        assert no_sleep == [7.0]
+
+    def test_backoff_is_exponential_with_jitter(self):
+        policy = RetryPolicy(backoff_factor=1.0, max_backoff=10.0)
+        for attempt in range(6):
+            assert 0 <= policy.get_backoff(attempt) <= min(10.0, 2 ** attempt)
+
+    def test_overload_slows_down_rate_limiter(self, monkeypatch, no_sleep):
+        FakeServer(monkeypatch, 503, 200)
+        rate_limiter = TokenBucket(rate=1000, burst=10)
+        send(RetryingAdapter(RetryPolicy(), RetryStatistics(), rate_limiter), 'GET', self.url)
+        assert rate_limiter.rate == 500 + 1000 * 0.05  # halved by the 503, then recovering after the 200
+
+
+class TestParseRetryAfter:
+
+    def test_parses_seconds(self):
+        assert parse_retry_after('120') == 120.0
+
+    def test_parses_http_date_in_the_past_as_zero(self):
+        assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+    def test_returns_none_for_missing_or_invalid(self):
+        assert parse_retry_after(None) is None
+        assert parse_retry_after('soon') is None
@@ -0,0 +1,55 @@
+from datastation.dataverse.search_api import SearchApi
+from tests.fakes import FakeSearchSession, numbered_items
+
+
+def pids(items):
+    return [item["global_id"] for item in items]
+
+
+class TestSearchApi:
+
+    def test_reads_pages_until_short_page(self):
+        session = FakeSearchSession(numbered_items(25))
+        result = pids(SearchApi("http://localhost", "xxx", session).search(per_page=10))
+        assert result == [f"doi:10.5072/FK2/{i}" for i in range(25)]
+        assert session.starts == [0, 10, 20]
+
+    def test_prefetch_yields_items_in_order(self):
+        session = FakeSearchSession(numbered_items(95))
+        result = pids(SearchApi("http://localhost", "xxx", session).search(per_page=10, prefetch=3))
+        assert result == [f"doi:10.5072/FK2/{i}" for i in range(95)]
+        assert sorted(session.starts) == list(range(0, 100, 10))
+
+    def test_prefetch_reads_at_most_prefetch_pages_ahead(self):
+        session = FakeSearchSession(numbered_items(1000))
+        result = SearchApi("http://localhost", "xxx", session).search(per_page=10, prefetch=2)
+        for _ in range(15):  # the first page and half of the second
+            next(result)
+        result.close()
+        assert len(session.starts) <= 4
+
+    def test_prefetch_with_exactly_full_pages(self):
+        session = FakeSearchSession(numbered_items(30))
+        result = pids(SearchApi("http://localhost", "xxx", session).search(per_page=10, prefetch=2))
+        assert len(result) == 30
+        # the last full page is followed by a check for more rows
+        assert sorted(session.starts) == [0, 10, 20, 30]
+
+    def test_single_page_with_rows(self):
+        session = FakeSearchSession(numbered_items(30))
+        result = pids(SearchApi("http://localhost", "xxx", session).search(rows=5, start=10, prefetch=2))
+        assert result == [f"doi:10.5072/FK2/{i}" for i in range(10, 15)]
+        assert session.starts == [10]
+
+    def test_passes_filter_queries_and_sort(self):
+        session = FakeSearchSession(numbered_items(3))
+        list(SearchApi("http://localhost", "xxx", session).search(
+            filter_queries=['publicationStatus:Draft', 'dvObjectType:datasets'], sort='date', order='desc'))
+        assert session.params[0]["fq"] == ['publicationStatus:Draft', 'dvObjectType:datasets']
+        assert session.params[0]["sort"] == 'date'
+        assert session.params[0]["order"] == 'desc'
+
+    def test_projects_items_on_fields(self):
+        session = FakeSearchSession(numbered_items(3))
+        result = list(SearchApi("http://localhost", "xxx", session).search(fields=['global_id', 'missing']))
+        assert result == [{"global_id": f"doi:10.5072/FK2/{i}"} for i in range(3)]
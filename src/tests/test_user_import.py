@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+
+from datastation.dataverse.user_import import UserImport, UserCsv, CREATED, SKIPPED, FAILED
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, message=None):
+        self.status_code = status_code
+        self.reason = 'Bad Request'
+        self.message = message
+
+    def json(self):
+        return {'status': 'ERROR', 'message': self.message}
+
+
+class FakeBuiltInUsersApi:
+
+    def __init__(self, client):
+        self.client = client
+
+    def create(self, user, send_email_notification=False, dry_run=False):
+        if user.username.startswith('interrupt'):
+            raise KeyboardInterrupt()
+        with self.client.lock:
+            self.client.created.append(user.username)
+        if dry_run:
+            return None
+        if user.username.startswith('existing'):
+            return FakeResponse(400, f"User with username {user.username} already exists")
+        if user.username.startswith('broken'):
+            return FakeResponse(400, "Invalid email")
+        return FakeResponse(200)
+
+
+class FakeDataverseClient:
+
+    def __init__(self, db_config=None):
+        self.db_config = db_config if db_config is not None else {}
+        self.created = []
+        self.lock = threading.Lock()
+
+    def built_in_users(self, builtin_users_key):
+        return FakeBuiltInUsersApi(self)
+
+
+class FakeDatabase:
+    """ Records the rows of every update of the passwords. """
+    updates = []
+
+    def __init__(self, config):
+        self.commit_batch_size = config.get('commit_batch_size', 1000)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def update_from_rows(self, query, table, columns, rows):
+        rows = list(rows)
+        FakeDatabase.updates.append(rows)
+        return len(rows)
+
+
+def write_users_csv(path, usernames):
+    with open(path, 'w') as f:
+        f.write('Username,GivenName,FamilyName,Email,Affiliation,Position,encryptedpassword\n')
+        for username in usernames:
+            f.write(f'{username},Given,Family,{username}@example.org,DANS,,hash-{username}\n')
+
+
+class TestUserImport:
+
+    def test_create_users_reports_outcome_in_order(self, tmp_path):
+        usernames = ['user1', 'existing1', 'user2', 'broken1', 'user3'] * 4
+        write_users_csv(tmp_path / 'users.csv', usernames)
+        client = FakeDataverseClient()
+        user_import = UserImport(client, is_easy_format=False, builtin_users_key='key', workers=3)
+        with UserCsv(str(tmp_path / 'users.csv'), is_easy_format=False) as users:
+            results = list(user_import.create_users(users))
+        assert [user.username for user, _, _ in results] == usernames
+        assert [status for _, status, _ in results] == [CREATED, SKIPPED, CREATED, FAILED, CREATED] * 4
+        assert results[3][2] == '400 Invalid email'
+
+    def test_import_users_updates_passwords_of_created_users_only(self, tmp_path, monkeypatch):
+        write_users_csv(tmp_path / 'users.csv', ['user1', 'existing1', 'broken1', 'user2'])
+        monkeypatch.setattr('datastation.dataverse.user_import.Database', FakeDatabase)
+        monkeypatch.setattr(FakeDatabase, 'updates', [])
+        user_import = UserImport(FakeDataverseClient(), is_easy_format=False, builtin_users_key='key', workers=2)
+        counts = user_import.import_users(str(tmp_path / 'users.csv'), report_file=str(tmp_path / 'report.csv'))
+        assert counts == {CREATED: 2, SKIPPED: 1, FAILED: 1}
+        assert FakeDatabase.updates == [[('user1', 'hash-user1', 1), ('user2', 'hash-user2', 1)]]
+        with open(tmp_path / 'report.csv') as f:
+            assert f.read().splitlines() == ['Username,Status,Message', 'user1,CREATED,',
+                                             'existing1,SKIPPED,User with username existing1 already exists',
+                                             'broken1,FAILED,400 Invalid email', 'user2,CREATED,']
+
+    def test_import_users_updates_passwords_per_batch(self, tmp_path, monkeypatch):
+        write_users_csv(tmp_path / 'users.csv', ['user1', 'user2', 'existing1', 'user3', 'user4', 'user5'])
+        monkeypatch.setattr('datastation.dataverse.user_import.Database', FakeDatabase)
+        monkeypatch.setattr(FakeDatabase, 'updates', [])
+        user_import = UserImport(FakeDataverseClient({'commit_batch_size': 2}), is_easy_format=False,
+                                 builtin_users_key='key')
+        user_import.import_users(str(tmp_path / 'users.csv'), report_file=str(tmp_path / 'report.csv'))
+        assert [[username for username, _, _ in rows] for rows in FakeDatabase.updates] == \
+               [['user1', 'user2'], ['user3', 'user4'], ['user5']]
+
+        FakeDatabase.updates.clear()
+        user_import.import_users(str(tmp_path / 'users.csv'), report_file=str(tmp_path / 'report.csv'),
+                                 commit_batch_size=3)
+        assert [len(rows) for rows in FakeDatabase.updates] == [3, 2]
+
+    def test_interrupted_import_updates_passwords_of_created_users(self, tmp_path, monkeypatch):
+        write_users_csv(tmp_path / 'users.csv', ['user1', 'user2', 'interrupt1', 'user3'])
+        monkeypatch.setattr('datastation.dataverse.user_import.Database', FakeDatabase)
+        monkeypatch.setattr(FakeDatabase, 'updates', [])
+        user_import = UserImport(FakeDataverseClient(), is_easy_format=False, builtin_users_key='key')
+        with pytest.raises(KeyboardInterrupt):
+            user_import.import_users(str(tmp_path / 'users.csv'), report_file=str(tmp_path / 'report.csv'))
+        assert FakeDatabase.updates == [[('user1', 'hash-user1', 1), ('user2', 'hash-user2', 1)]]
+
+    def test_dry_run_does_not_touch_database(self, tmp_path, monkeypatch):
+        write_users_csv(tmp_path / 'users.csv', ['user1'])
+        monkeypatch.setattr('datastation.dataverse.user_import.Database', None)
+        client = FakeDataverseClient()
+        user_import = UserImport(client, is_easy_format=False, builtin_users_key='key', dry_run=True)
+        counts = user_import.import_users(str(tmp_path / 'users.csv'), report_file=str(tmp_path / 'report.csv'))
+        assert counts == {CREATED: 0, SKIPPED: 0, FAILED: 0}
+        assert client.created == ['user1']
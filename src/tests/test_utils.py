@@ -1,9 +1,13 @@
+import io
 import os
 import argparse
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
 
 from datastation.common.utils import is_sub_path_of, has_dirtree_pred, set_permissions, positive_int_argument_converter, \
-    plural
+    plural, print_synchronized, add_batch_processor_args, check_batch_processor_args
 
 
 class TestIsSubPathOf:
@@ -107,9 +111,49 @@ class TestPositiveIntArgumentConverter(unittest.TestCase):
             positive_int_argument_converter("abc")
 
 
+class TestAddBatchProcessorArgs:
+    def parse(self, argv, config=None):
+        parser = argparse.ArgumentParser()
+        add_batch_processor_args(parser, config=config)
+        return parser.parse_args(argv)
+
+    def test_wait_is_left_to_the_batch_processor_by_default(self):
+        assert self.parse([]).wait is None
+
+    def test_wait_is_zero_with_rate_limit(self):
+        config = {'dataverse': {'rate_limit': {'requests_per_second': 5}}}
+        assert self.parse([], config).wait == 0
+        assert self.parse(['-w', '1.5'], config).wait == 1.5
+
+    def test_resume_needs_journal_file(self, capsys):
+        parser = argparse.ArgumentParser()
+        add_batch_processor_args(parser)
+        with pytest.raises(SystemExit):
+            check_batch_processor_args(parser, parser.parse_args(['--resume']))
+        assert '--resume needs --journal-file' in capsys.readouterr().err
+        check_batch_processor_args(parser, parser.parse_args(['--resume', '-j', 'journal.txt']))
+
+    def test_wait_without_rate_limit(self):
+        assert self.parse([], {'dataverse': {}}).wait is None
+        assert self.parse(['-w', '1.5']).wait == 1.5
+
+
 class TestPlural(unittest.TestCase):
     def test_plural(self):
         self.assertEqual(plural("pid"), "pids")
         self.assertEqual(plural("alias"), "aliases")
         self.assertEqual(plural(":-)lolly"), ":-)lollies")
 
+
+
+class TestPrintSynchronized:
+    def test_lines_of_concurrent_workers_do_not_interleave(self):
+        out = io.StringIO()
+        lines = [f'line {i} ' + 'x' * 1000 for i in range(200)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda line: print_synchronized(line, out), lines))
+        assert sorted(out.getvalue().splitlines()) == sorted(lines)
+
+    def test_prints_to_stdout_by_default(self, capsys):
+        print_synchronized('{"pid": "doi:10.5072/FK2/ABC"}')
+        assert capsys.readouterr().out == '{"pid": "doi:10.5072/FK2/ABC"}\n'